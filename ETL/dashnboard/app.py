@@ -4,82 +4,255 @@ import pandas as pd
 import sqlite3
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime
+from datetime import datetime, timedelta
+import inspect
 import os
+import time
 
-def init_db_connection():
-    """Inicializa conexión a la base de datos"""
-    db_path = r"C:\Users\LENOVO\Downloads\ETL\data\sensor_data.db"
+from data_access import DashboardData
+from live_feed import LiveFeed
+
+DB_PATH = r"C:\Users\LENOVO\Downloads\ETL\data\sensor_data.db"
+
+@st.cache_resource
+def get_data_source(db_path: str) -> DashboardData:
+    """Capa de datos compartida por todas las sesiones y reruns"""
+    return DashboardData(db_path)
+
+# Cada feed guarda sus buffers: se conservan los usados en la última media hora
+# y a lo sumo 32 combinaciones de sensores
+@st.cache_resource(max_entries=32, ttl=1800)
+def get_live_feed(db_path: str, sensor_ids: tuple, capacity: int) -> LiveFeed:
+    """Feed en vivo compartido por las sesiones que miran los mismos sensores (sensor_ids ordenados)"""
+    return LiveFeed(get_data_source(db_path), sensor_ids, capacity)
+
+def init_db_connection(show_counts: bool = True):
+    """
+    Inicializa la capa de datos y muestra el estado de la base
+
+    Con show_counts=False (vista en vivo) no se cuentan las filas de cada
+    tabla: ese COUNT(*) recorre sensor_readings completa y se repetiría con
+    cada escritura de la ingesta. Solo se verifica que sensor_readings exista.
+    """
+    db_path = DB_PATH
     
     st.sidebar.write("---")
     st.sidebar.subheader("Información de la Base de Datos")
     st.sidebar.write(f"**Ruta:** `{db_path}`")
     
+    data_source = get_data_source(db_path)
+    
     # Verificar si la base de datos existe
-    if not os.path.exists(db_path):
+    if not data_source.exists():
         st.sidebar.error("❌ Base de datos no encontrada")
         return None
     
     try:
-        conn = sqlite3.connect(db_path)
+        if not show_counts:
+            if not data_source.has_table('sensor_readings'):
+                st.sidebar.error("❌ Tabla 'sensor_readings' no existe")
+                return None
+            return data_source
         
-        # Verificar si la tabla existe
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = cursor.fetchall()
-        table_names = [table[0] for table in tables]
+        # Conteos guardados en caché hasta que el ETL vuelva a escribir
+        table_counts = data_source.table_counts()
         
-        st.sidebar.write(f"**Tablas encontradas:** {len(table_names)}")
-        for table in table_names:
-            cursor.execute(f"SELECT COUNT(*) FROM {table}")
-            count = cursor.fetchone()[0]
+        st.sidebar.write(f"**Tablas encontradas:** {len(table_counts)}")
+        for table, count in table_counts.items():
             st.sidebar.write(f"  - `{table}`: {count} registros")
         
-        if 'sensor_readings' not in table_names:
+        if 'sensor_readings' not in table_counts:
             st.sidebar.error("❌ Tabla 'sensor_readings' no existe")
-            conn.close()
             return None
             
-        return conn
+        return data_source
         
     except Exception as e:
         st.sidebar.error(f"❌ Error de conexión: {e}")
         return None
 
 def load_sensor_data():
-    """Carga datos de sensores desde SQLite"""
-    conn = init_db_connection()
+    """Carga las métricas principales desde SQLite (solo consulta si la base cambió)"""
+    data_source = init_db_connection()
     
-    if conn is None:
+    if data_source is None:
         return None
     
     try:
-        # Cargar datos principales
-        query = "SELECT * FROM sensor_readings LIMIT 1"  # Primero probamos con 1 registro
-        df_sample = pd.read_sql(query, conn)
-        
-        # Si funciona, cargar todos los datos
-        query_full = "SELECT * FROM sensor_readings"
-        df = pd.read_sql(query_full, conn)
+        summary = data_source.summary()
         
         # Verificar si hay datos
-        if df.empty:
+        if summary['total_readings'] == 0:
             st.warning("⚠️ La tabla existe pero no contiene datos")
-            return pd.DataFrame()
-        
-        # Convertir timestamp si existe
-        if 'timestamp' in df.columns:
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
+            return {}
         
-        st.sidebar.success(f"✅ {len(df)} registros cargados")
-        conn.close()
-        return df
+        st.sidebar.success(f"✅ {summary['total_readings']} registros disponibles")
+        return summary
         
     except Exception as e:
         st.error(f"❌ Error cargando datos: {e}")
-        conn.close()
         return None
 
+def render_live_chart(feed: LiveFeed):
+    """Trae solo las lecturas nuevas y redibuja el gráfico con los buffers del feed"""
+    try:
+        feed.poll()
+    except Exception as e:
+        st.error(f"❌ Error consultando lecturas nuevas: {e}")
+        return
+    
+    live = feed.frame()
+    if live.empty:
+        st.info("Esperando lecturas de los sensores seleccionados...")
+        return
+    
+    latest = live.groupby('sensor_id', sort=False).tail(1)
+    columns = st.columns(min(len(latest), 6))
+    for i, row in enumerate(latest.itertuples()):
+        with columns[i % len(columns)]:
+            st.metric(row.sensor_id, f"{row.voltage:.2f} V", help=f"{row.timestamp}")
+    
+    fig_live = px.line(live, x='timestamp', y='voltage', color='sensor_id',
+                       title="Últimas lecturas por sensor")
+    fig_live.update_layout(uirevision='live')  # conservar zoom y leyenda entre actualizaciones
+    st.plotly_chart(fig_live, use_container_width=True)
+    st.caption(f"Actualizado {datetime.now():%H:%M:%S}")
+
+def show_live_view(data_source: DashboardData):
+    """Vista en vivo: gráfico que se actualiza solo con las lecturas nuevas"""
+    st.header("🔴 Monitoreo en Vivo")
+    
+    sensor_ids = data_source.sensor_ids()
+    selected = st.multiselect("Sensores", sensor_ids, default=sensor_ids[:4])
+    interval = st.sidebar.slider("Actualizar cada (s)", 0.5, 10.0, 1.0, 0.5)
+    capacity = st.sidebar.select_slider("Lecturas por sensor", [100, 250, 500, 1000, 2000], value=500)
+    if not selected:
+        st.info("Selecciona al menos un sensor")
+        return
+    
+    # Ordenados: la misma selección en otro orden comparte el feed
+    feed = get_live_feed(DB_PATH, tuple(sorted(set(selected))), capacity)
+    
+    # st.fragment vuelve a ejecutar solo el gráfico, sin el resto de la página
+    fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None)
+    if fragment is not None:
+        fragment(run_every=interval)(render_live_chart)(feed)
+    else:
+        render_live_chart(feed)
+        time.sleep(interval)
+        (getattr(st, 'rerun', None) or st.experimental_rerun)()
+
+def show_sensor_series(data_source: DashboardData):
+    """Voltaje de un sensor en el tiempo, reducido en SQL al ancho del gráfico"""
+    col1, col2 = st.columns([3, 1])
+    sensor_id = col1.selectbox("Sensor", data_source.sensor_ids())
+    points = col2.select_slider("Ancho del gráfico (px)", [400, 800, 1200, 1600, 2400], value=1200)
+    if sensor_id is None:
+        return
+    first, last = data_source.series_extent(sensor_id)
+    if first is None:
+        st.info("El sensor no tiene lecturas")
+        return
+    
+    # Rango visible por sensor: lo cambia el slider o una selección de caja en el gráfico
+    first, last = pd.Timestamp(first, unit='s').to_pydatetime(), pd.Timestamp(last, unit='s').to_pydatetime()
+    last = max(last, first + timedelta(minutes=1))  # el slider necesita un rango no vacío
+    range_key = f"series_range_{sensor_id}"
+    if range_key not in st.session_state:
+        st.session_state[range_key] = (first, last)
+    
+    def reset_zoom():
+        st.session_state[range_key] = (first, last)
+    
+    def zoom_to_selection():
+        boxes = st.session_state['series_chart'].selection.get('box') or []
+        if boxes:
+            x0, x1 = sorted(pd.Timestamp(x).to_pydatetime() for x in boxes[0]['x'][:2])
+            st.session_state[range_key] = (min(max(x0, first), last), max(min(x1, last), first))
+    
+    col1, col2 = st.columns([5, 1])
+    start, end = col1.slider("Rango", min_value=first, max_value=last, step=timedelta(minutes=1),
+                             format="YYYY-MM-DD HH:mm", key=range_key)
+    col2.button("🔍 Ver todo", on_click=reset_zoom)
+    
+    # Cada zoom vuelve a consultar el rango con la misma cantidad de buckets,
+    # así que se ve con más detalle hasta llegar a las lecturas crudas
+    start = int(pd.Timestamp(start).timestamp())
+    end = int(pd.Timestamp(end).timestamp()) + 1
+    series, description = data_source.sensor_series(sensor_id, start, end, points)
+    
+    fig_series = px.line(series, x='timestamp', y='voltage', title=f"Voltaje de {sensor_id}")
+    if 'on_select' in inspect.signature(st.plotly_chart).parameters:
+        fig_series.update_layout(dragmode='select')
+        st.plotly_chart(fig_series, use_container_width=True, key='series_chart',
+                        on_select=zoom_to_selection, selection_mode='box')
+        st.caption(f"{description} · arrastra sobre el gráfico para ampliar un intervalo")
+    else:
+        st.plotly_chart(fig_series, use_container_width=True)
+        st.caption(description)
+
+def parse_voltage_filter(label: str, column):
+    """Campo de texto opcional para un límite de voltaje (vacío: sin límite)"""
+    text = column.text_input(label, "").strip().replace(',', '.')
+    if not text:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        column.warning(f"⚠️ '{text}' no es un número")
+        return None
+
+def show_data_explorer(data_source: DashboardData, page_size: int = 100):
+    """Explorador de lecturas crudas con filtros en SQL y paginación por clave"""
+    with st.expander("🔎 Filtros", expanded=False):
+        col1, col2 = st.columns(2)
+        sheets = col1.multiselect("Hojas", data_source.sheet_names())
+        sensor_sheets = data_source.sensor_sheets()
+        options = [sensor_id for sensor_id, sheet in sensor_sheets.items() if not sheets or sheet in sheets]
+        sensors = col2.multiselect("Sensores", options)
+        
+        col1, col2, col3 = st.columns(3)
+        dates = col1.date_input("Rango de fechas", value=[])
+        min_voltage = parse_voltage_filter("Voltaje mínimo", col2)
+        max_voltage = parse_voltage_filter("Voltaje máximo", col3)
+    
+    dates = list(dates) if isinstance(dates, (list, tuple)) else [dates]
+    filters = {
+        'sheets': sheets,
+        'sensors': sensors,
+        'start': dates[0] if dates else None,
+        # El fin del rango incluye todo ese día
+        'end': pd.Timestamp(dates[-1]) + pd.Timedelta(days=1) if dates else None,
+        'min_voltage': min_voltage,
+        'max_voltage': max_voltage
+    }
+    
+    # Pila con la clave de inicio de cada página visitada; se reinicia si cambian los filtros
+    signature = repr(filters)
+    if st.session_state.get('explorer_filters') != signature:
+        st.session_state['explorer_filters'] = signature
+        st.session_state['explorer_pages'] = [None]
+    pages = st.session_state['explorer_pages']
+    
+    try:
+        page, next_key = data_source.reading_page(filters, pages[-1], page_size)
+    except Exception as e:
+        st.error(f"❌ Error consultando lecturas: {e}")
+        return
+    
+    # Los botones cambian la pila antes del rerun, así que la página nueva se ve al instante
+    def first_page():
+        del pages[1:]
+    
+    col1, col2, col3, col4 = st.columns([1, 1, 1, 3])
+    col1.button("⏮️ Inicio", disabled=len(pages) == 1, on_click=first_page)
+    col2.button("⬅️ Anterior", disabled=len(pages) == 1, on_click=pages.pop)
+    col3.button("Siguiente ➡️", disabled=next_key is None, on_click=pages.append, args=(next_key,))
+    col4.write(f"Página {len(pages)} · {len(page)} lecturas"
+               + ("" if next_key is not None else " · última página"))
+    
+    st.dataframe(page, use_container_width=True)
+
 def show_etl_instructions():
     """Muestra instrucciones para ejecutar el ETL"""
     st.error("""
@@ -127,12 +300,12 @@ def check_system_status():
         st.write(f"{icon} `{file_path}`")
     
     # Verificar base de datos
-    db_path = r"C:\Users\LENOVO\Downloads\ETL\data\sensor_data.db"
+    db_path = DB_PATH
     if os.path.exists(db_path):
         try:
             conn = sqlite3.connect(db_path)
             cursor = conn.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
+            cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view');")
             tables = cursor.fetchall()
             conn.close()
             
@@ -154,38 +327,50 @@ def main():
     
     # Sidebar con información
     st.sidebar.title("🔧 Configuración")
+    view = st.sidebar.radio("Vista", ["📊 Resumen", "🔴 En vivo"])
+    
+    if view == "🔴 En vivo":
+        # La vista en vivo no usa las métricas ni los conteos de toda la tabla
+        data_source = init_db_connection(show_counts=False)
+        if data_source is None:
+            show_etl_instructions()
+        else:
+            show_live_view(data_source)
+        return
     
     # Cargar datos
     with st.spinner("🔄 Cargando datos de sensores..."):
-        df = load_sensor_data()
+        summary = load_sensor_data()
     
-    if df is None:
+    if summary is None:
         show_etl_instructions()
         return
     
-    if df.empty:
+    if not summary:
         st.warning("⚠️ No hay datos disponibles para mostrar")
         return
     
+    data_source = get_data_source(DB_PATH)
+    
     # Si llegamos aquí, tenemos datos para mostrar
-    st.success(f"✅ Datos cargados correctamente: {len(df)} registros")
+    st.success(f"✅ Datos cargados correctamente: {summary['total_readings']} registros")
     
-    # Mostrar métricas principales
+    # Mostrar métricas principales (agregadas en SQL)
     st.header("📈 Métricas Principales")
     
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Total de Sensores", df['sensor_id'].nunique())
+        st.metric("Total de Sensores", summary['total_sensors'])
     
     with col2:
-        st.metric("Total de Lecturas", len(df))
+        st.metric("Total de Lecturas", summary['total_readings'])
     
     with col3:
-        st.metric("Voltaje Promedio", f"{df['voltage'].mean():.2f} V")
+        st.metric("Voltaje Promedio", f"{summary['mean_voltage']:.2f} V")
     
     with col4:
-        st.metric("Rango de Voltaje", f"{df['voltage'].min():.2f} - {df['voltage'].max():.2f} V")
+        st.metric("Rango de Voltaje", f"{summary['min_voltage']:.2f} - {summary['max_voltage']:.2f} V")
     
     # Gráficos
     st.header("📊 Visualizaciones")
@@ -194,20 +379,48 @@ def main():
     
     with col1:
         st.subheader("Distribución de Voltajes")
-        fig_hist = px.histogram(df, x='voltage', nbins=20, 
-                               title="Distribución de Lecturas de Voltaje")
+        histogram = data_source.voltage_histogram(bins=20)
+        fig_hist = go.Figure(go.Bar(
+            x=(histogram['bin_start'] + histogram['bin_end']) / 2,
+            y=histogram['count'],
+            width=histogram['bin_end'] - histogram['bin_start']
+        ))
+        fig_hist.update_layout(title="Distribución de Lecturas de Voltaje",
+                               xaxis_title="voltage", yaxis_title="count", bargap=0)
         st.plotly_chart(fig_hist, use_container_width=True)
     
     with col2:
         st.subheader("Voltaje por Sensor")
-        sensor_avg = df.groupby('sensor_id')['voltage'].mean().reset_index()
+        sensor_avg = data_source.sensor_means()
         fig_bar = px.bar(sensor_avg, x='sensor_id', y='voltage',
                         title="Voltaje Promedio por Sensor")
         st.plotly_chart(fig_bar, use_container_width=True)
     
+    st.subheader("Serie de Tiempo por Sensor")
+    show_sensor_series(data_source)
+    
+    # Anomalías (solo si el ETL corrió con --anomalies)
+    if data_source.has_table('anomalies'):
+        st.header("🚨 Anomalías")
+        anomalies = data_source.anomalies(5000)
+        if anomalies.empty:
+            st.info("No se detectaron anomalías")
+        else:
+            counts = anomalies['detector'].value_counts()
+            columns = st.columns(len(counts))
+            for column, (detector, count) in zip(columns, counts.items()):
+                with column:
+                    st.metric(f"Detector {detector}", count)
+            
+            fig_anomalies = px.scatter(anomalies, x='timestamp', y='sensor_id', color='detector',
+                                       hover_data=['voltage', 'baseline', 'score'],
+                                       title="Anomalías más recientes por sensor")
+            st.plotly_chart(fig_anomalies, use_container_width=True)
+            st.dataframe(anomalies, use_container_width=True)
+    
     # Datos crudos
     st.header("📋 Datos Detallados")
-    st.dataframe(df.head(1000), use_container_width=True)
+    show_data_explorer(data_source)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
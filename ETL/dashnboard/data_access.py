@@ -0,0 +1,435 @@
+# data_access.py
+import math
+import os
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Las bases cargadas con DataFrame.to_sql (user_version 0) guardan el timestamp
+# como texto; esta expresión lo lleva a segundos desde epoch
+TEXT_TIMESTAMP_SQL = 'CAST(strftime(\'%s\', "timestamp") AS INTEGER)'
+
+# Clave de paginación del explorador de datos (índice idx_readings_sensor_ts).
+# (sensor_id, timestamp) se repite en las tablas tipada y legada (lecturas
+# agregadas dos veces, load_generator --loops): ahí se desempata por rowid,
+# que el índice ya guarda al final de cada entrada. En la vista del esquema
+# normalizado el par es la clave primaria de readings y alcanza.
+PAGE_KEY = ('sensor_id', 'timestamp')
+PAGE_TIEBREAKER = 'rowid'
+
+def compile_filters(filters: Dict, text_timestamps: bool = False) -> Tuple[List[str], List]:
+    """
+    Traduce los filtros del explorador a condiciones SQL con parámetros
+
+    Args:
+        filters: Claves opcionales sheets y sensors (listas), start y end
+            (fechas; end excluido), min_voltage y max_voltage. Las vacías o
+            en None no filtran.
+        text_timestamps: La base guarda el timestamp como texto (to_sql)
+
+    Returns:
+        Tupla (condiciones para unir con AND, parámetros en el mismo orden)
+    """
+    def timestamp_param(value):
+        value = pd.Timestamp(value)
+        return value.strftime('%Y-%m-%d %H:%M:%S') if text_timestamps else int(value.timestamp())
+
+    clauses, params = [], []
+    for key, column in (('sheets', 'sheet_name'), ('sensors', 'sensor_id')):
+        values = list(filters.get(key) or [])
+        if values:
+            clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+    for key, condition, convert in (('start', '"timestamp" >= ?', timestamp_param),
+                                    ('end', '"timestamp" < ?', timestamp_param),
+                                    ('min_voltage', 'voltage >= ?', float),
+                                    ('max_voltage', 'voltage <= ?', float)):
+        if filters.get(key) is not None:
+            clauses.append(condition)
+            params.append(convert(filters[key]))
+    return clauses, params
+
+def uses_text_timestamps(conn: sqlite3.Connection) -> bool:
+    return conn.execute('PRAGMA user_version').fetchone()[0] == 0
+
+def readings_have_rowid(conn: sqlite3.Connection) -> bool:
+    """sensor_readings es una tabla (tipada o legada) y no la vista del esquema normalizado"""
+    kind = conn.execute("SELECT type FROM sqlite_master WHERE name = 'sensor_readings'").fetchone()
+    return kind is not None and kind[0] == 'table'
+
+class DashboardData:
+    """
+    Capa de acceso a datos del dashboard con caché por versión de la base
+
+    - Una sola conexión SQLite de solo lectura, compartida entre reruns y
+      sesiones (protegida con un lock porque Streamlit usa varios hilos).
+    - Los resultados se guardan en memoria y solo se vuelven a consultar
+      cuando el ETL escribe datos nuevos (ver version), así que un rerun
+      sin cambios solo ejecuta un PRAGMA.
+
+    Los DataFrames devueltos son compartidos: no deben modificarse.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = None
+        self._conn_inode = None
+        self._version = None
+        self._cache = {}
+
+    def version(self) -> Optional[Tuple[int, int]]:
+        """
+        Versión de los datos: (inode de la base, PRAGMA data_version), o None si no existe
+
+        data_version cambia cada vez que otra conexión (el ETL) confirma una
+        escritura, y no cambia por los checkpoints del WAL ni por las lecturas
+        del propio dashboard. Consultarlo no lee ninguna tabla.
+        """
+        try:
+            inode = os.stat(self.db_path).st_ino
+        except FileNotFoundError:
+            return None
+
+        conn = self._connection(inode)
+        return inode, conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def exists(self) -> bool:
+        return os.path.exists(self.db_path)
+
+    def _connection(self, inode: int) -> sqlite3.Connection:
+        """Conexión de solo lectura; se reabre si el archivo fue reemplazado"""
+        if self._conn is None or self._conn_inode != inode:
+            if self._conn is not None:
+                self._conn.close()
+            uri = f"file:{self.db_path}?mode=ro"
+            self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            self._conn_inode = inode
+        return self._conn
+
+    def cached(self, key, loader: Callable[[sqlite3.Connection], object]):
+        """
+        Devuelve el resultado guardado para key, o lo calcula con loader(conn)
+        si la base cambió desde la última consulta
+        """
+        with self._lock:
+            version = self.version()
+            if version is None:
+                raise FileNotFoundError(self.db_path)
+
+            if version != self._version:
+                self._cache.clear()
+                self._version = version
+
+            if key not in self._cache:
+                self._cache[key] = loader(self._conn)
+            return self._cache[key]
+
+    def query(self, sql: str, params=()) -> pd.DataFrame:
+        """Consulta sin caché sobre la conexión compartida"""
+        with self._lock:
+            if self.version() is None:
+                raise FileNotFoundError(self.db_path)
+            return pd.read_sql(sql, self._conn, params=params)
+
+    def read(self, reader: Callable[[sqlite3.Connection, Tuple[int, int]], object]):
+        """Ejecuta reader(conn, version) sin caché, con el lock de la conexión tomado"""
+        with self._lock:
+            version = self.version()
+            if version is None:
+                raise FileNotFoundError(self.db_path)
+            return reader(self._conn, version)
+
+    def table_counts(self) -> Dict[str, int]:
+        """Tablas y vistas de la base con su número de registros"""
+        def load(conn):
+            names = [row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type IN ('table', 'view');")]
+            return {name: conn.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0] for name in names}
+
+        return self.cached('table_counts', load)
+
+    def has_table(self, name: str) -> bool:
+        """La tabla o vista existe (solo lee sqlite_master, sin recorrer datos)"""
+        def load(conn):
+            return conn.execute("SELECT 1 FROM sqlite_master WHERE name = ? AND type IN ('table', 'view')",
+                                (name,)).fetchone() is not None
+
+        return self.read(lambda conn, version: load(conn))
+
+    def summary(self) -> Dict:
+        """Métricas principales calculadas en SQL (una sola fila)"""
+        def load(conn):
+            total_sensors, total_readings, mean, v_min, v_max = conn.execute(
+                "SELECT COUNT(DISTINCT sensor_id), COUNT(*), AVG(voltage), MIN(voltage), MAX(voltage) "
+                "FROM sensor_readings"
+            ).fetchone()
+            return {
+                'total_sensors': total_sensors,
+                'total_readings': total_readings,
+                'mean_voltage': mean,
+                'min_voltage': v_min,
+                'max_voltage': v_max
+            }
+
+        return self.cached('summary', load)
+
+    def voltage_histogram(self, bins: int = 20) -> pd.DataFrame:
+        """
+        Histograma de voltajes con bins de igual ancho entre el mínimo y el máximo
+
+        Returns:
+            DataFrame con bin_start, bin_end y count (una fila por bin)
+        """
+        summary = self.summary()
+        v_min, v_max = summary['min_voltage'], summary['max_voltage']
+        if v_min is None:
+            return pd.DataFrame(columns=['bin_start', 'bin_end', 'count'])
+
+        width = (v_max - v_min) / bins if v_max > v_min else 1.0
+
+        def load(conn):
+            # El máximo cae en el último bin, igual que en numpy.histogram
+            counts = dict(conn.execute(
+                "SELECT MIN(CAST((voltage - ?) / ? AS INTEGER), ?) AS bin, COUNT(*) "
+                "FROM sensor_readings WHERE voltage IS NOT NULL GROUP BY bin",
+                (v_min, width, bins - 1)
+            ))
+            starts = [v_min + i * width for i in range(bins)]
+            return pd.DataFrame({
+                'bin_start': starts,
+                'bin_end': [start + width for start in starts],
+                'count': [counts.get(i, 0) for i in range(bins)]
+            })
+
+        return self.cached(('voltage_histogram', bins), load)
+
+    def sensor_means(self) -> pd.DataFrame:
+        """Voltaje promedio por sensor (GROUP BY en SQL)"""
+        def load(conn):
+            return pd.read_sql(
+                "SELECT sensor_id, AVG(voltage) AS voltage FROM sensor_readings "
+                "GROUP BY sensor_id ORDER BY sensor_id", conn
+            )
+
+        return self.cached('sensor_means', load)
+
+    def sensor_ids(self) -> List[str]:
+        """Sensores con lecturas, ordenados (una búsqueda en el índice por sensor)"""
+        return self.cached('sensor_ids', lambda conn: self._distinct(conn, 'sensor_id'))
+
+    def sheet_names(self) -> List[str]:
+        """Hojas con lecturas, ordenadas"""
+        def load(conn):
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sheets'").fetchone():
+                # Esquema normalizado: las hojas tienen su propia tabla
+                return [row[0] for row in conn.execute('SELECT sheet_name FROM sheets ORDER BY sheet_name')]
+            return self._distinct(conn, 'sheet_name')
+
+        return self.cached('sheet_names', load)
+
+    def sensor_sheets(self) -> Dict[str, str]:
+        """Hoja de cada sensor, ordenado por sensor_id"""
+        def load(conn):
+            # Una búsqueda en el índice por sensor para su primera lectura
+            sensor_ids = self._distinct(conn, 'sensor_id')
+            return {sensor_id: conn.execute('SELECT sheet_name FROM sensor_readings WHERE sensor_id = ? LIMIT 1',
+                                            (sensor_id,)).fetchone()[0] for sensor_id in sensor_ids}
+
+        return self.cached('sensor_sheets', load)
+
+    @staticmethod
+    def _distinct(conn: sqlite3.Connection, column: str) -> List[str]:
+        # Skip-scan del índice que empieza por column en lugar de DISTINCT,
+        # que recorre todas las lecturas: una búsqueda por valor distinto
+        return [row[0] for row in conn.execute(
+            f'WITH RECURSIVE vals(v) AS ('
+            f'  SELECT MIN({column}) FROM sensor_readings'
+            f'  UNION ALL'
+            f'  SELECT (SELECT MIN({column}) FROM sensor_readings WHERE {column} > vals.v)'
+            f'  FROM vals WHERE vals.v IS NOT NULL'
+            f') SELECT v FROM vals WHERE v IS NOT NULL'
+        )]
+
+    def reading_page(self, filters: Dict, after: Optional[Tuple] = None,
+                     page_size: int = 100) -> Tuple[pd.DataFrame, Optional[Tuple]]:
+        """
+        Una página de lecturas crudas filtradas, ordenadas por (sensor_id, timestamp)
+
+        Paginación por clave: la página siguiente empieza después de la última
+        clave (sensor_id, timestamp[, rowid]) de la anterior (ver PAGE_KEY), así que cada página es una
+        búsqueda en el índice idx_readings_sensor_ts más page_size filas, sin
+        OFFSET, por más adentro de la tabla que esté. Sin caché: solo se lee
+        la página visible.
+
+        Args:
+            filters: Ver compile_filters
+            after: Clave de la última fila de la página anterior (None: primera página)
+            page_size: Filas por página
+
+        Returns:
+            Tupla (DataFrame de la página, clave para la página siguiente o None si es la última)
+        """
+        if filters.get('sheets') and not filters.get('sensors'):
+            # Recorrer el índice (sensor_id, timestamp) solo en los sensores de
+            # esas hojas, en vez de saltear las lecturas de todas las demás
+            sheets = set(filters['sheets'])
+            sensors = [sensor_id for sensor_id, sheet in self.sensor_sheets().items() if sheet in sheets]
+            if not sensors:
+                return self._parse_timestamps(self.query('SELECT * FROM sensor_readings LIMIT 0')), None
+            filters = {**filters, 'sensors': sensors}
+
+        def load(conn, version):
+            key = ['sensor_id', '"timestamp"'] + ([PAGE_TIEBREAKER] if readings_have_rowid(conn) else [])
+            clauses, params = compile_filters(filters, uses_text_timestamps(conn))
+            if after is not None:
+                # Una clave de otro esquema (la base se recargó entre páginas) se recorta
+                size = min(len(key), len(after))
+                clauses.append(f"({', '.join(key[:size])}) > ({', '.join('?' * size)})")
+                params.extend(after[:size])
+            where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+            columns = f'{PAGE_TIEBREAKER} AS "_page_rowid", *' if len(key) > len(PAGE_KEY) else '*'
+            df = pd.read_sql(f'SELECT {columns} FROM sensor_readings{where} ORDER BY {", ".join(key)} LIMIT ?',
+                             conn, params=params + [page_size + 1])
+
+            # Se pide una fila de más para saber si hay página siguiente
+            next_key = None
+            key_columns = list(PAGE_KEY) + (['_page_rowid'] if '_page_rowid' in df.columns else [])
+            if len(df) > page_size:
+                df = df.iloc[:page_size]
+                # Valores de Python (int o texto) para volver a usarlos como parámetros
+                next_key = tuple(df[key_columns].iloc[-1:].itertuples(index=False, name=None))[0]
+            return self._parse_timestamps(df.drop(columns='_page_rowid', errors='ignore')), next_key
+
+        return self.read(load)
+
+    def series_extent(self, sensor_id: str) -> Tuple[Optional[int], Optional[int]]:
+        """Primer y último timestamp del sensor en segundos desde epoch (dos búsquedas en el índice)"""
+        def load(conn):
+            first, last = conn.execute('SELECT MIN("timestamp"), MAX("timestamp") FROM sensor_readings '
+                                       'WHERE sensor_id = ?', (sensor_id,)).fetchone()
+            if first is None or not uses_text_timestamps(conn):
+                return first, last
+            return tuple(int(pd.Timestamp(value).timestamp()) for value in (first, last))
+
+        return self.cached(('series_extent', sensor_id), load)
+
+    def sensor_series(self, sensor_id: str, start: int, end: int, points: int = 1200) -> Tuple[pd.DataFrame, str]:
+        """
+        Serie de un sensor en [start, end) reducida a unos `points` buckets para graficar
+
+        Si el rango tiene hasta 2 · points lecturas se devuelven crudas. Si no,
+        se divide en `points` buckets iguales (uno por píxel del gráfico) y de
+        cada uno se devuelven el mínimo y el máximo, en SQL: la serie queda
+        con 2 · points filas sin importar cuántas lecturas tenga, y un pico
+        aislado sigue siendo el máximo de su bucket, así que no se pierde.
+        Cuando el bucket mide al menos lo mismo que un rollup de
+        sensor_rollups se lee el rollup más grueso que entra, no las lecturas
+        (salvo en los bordes del rango, donde un rollup queda cortado).
+
+        Args:
+            sensor_id: Sensor a graficar
+            start, end: Rango en segundos desde epoch (end excluido)
+            points: Buckets deseados (el ancho del gráfico en píxeles)
+
+        Returns:
+            Tupla (DataFrame con timestamp y voltage, descripción de la resolución)
+        """
+        def load(conn):
+            text_timestamps = uses_text_timestamps(conn)
+            timestamp = TEXT_TIMESTAMP_SQL if text_timestamps else '"timestamp"'
+            filters = {'sensors': [sensor_id], 'start': pd.Timestamp(start, unit='s'),
+                       'end': pd.Timestamp(end, unit='s')}
+            clauses, params = compile_filters(filters, text_timestamps)
+            where = ' AND '.join(clauses)
+
+            # COUNT recorre solo el índice (sensor_id, timestamp)
+            count = conn.execute(f'SELECT COUNT(*) FROM sensor_readings WHERE {where}', params).fetchone()[0]
+            if count <= 2 * points:
+                rows = conn.execute(f'SELECT {timestamp}, voltage FROM sensor_readings WHERE {where} '
+                                    f'ORDER BY "timestamp"', params).fetchall()
+                return self._series_frame(rows), f"{count:,} lecturas crudas"
+
+            width = max(math.ceil((end - start) / points), 1)
+            origin = start
+            rollup = None
+            if not text_timestamps and conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'sensor_rollups'").fetchone():
+                rollup = conn.execute('SELECT MAX(bucket_seconds) FROM sensor_rollups WHERE bucket_seconds <= ?',
+                                      (width,)).fetchone()[0]
+            if rollup:
+                # Buckets alineados a los del rollup: cada uno junta rollups enteros,
+                # así que el mínimo y el máximo son exactos. Solo se usan los rollups
+                # completamente dentro de [start, end); los bordes que cortan un
+                # rollup se leen de las lecturas
+                origin = start - start % rollup
+                width = math.ceil(width / rollup) * rollup
+                inner_start = min(-(-start // rollup) * rollup, end)
+                inner_end = max(end - end % rollup, inner_start)
+                rows = conn.execute(
+                    'SELECT bucket, MIN(low), MAX(high) FROM ('
+                    ' SELECT (bucket_start - :origin) / :width AS bucket, voltage_min AS low, voltage_max AS high'
+                    ' FROM sensor_rollups WHERE bucket_seconds = :rollup AND sensor_id = :sensor_id'
+                    ' AND bucket_start >= :inner_start AND bucket_start < :inner_end'
+                    ' UNION ALL'
+                    ' SELECT ("timestamp" - :origin) / :width, voltage, voltage FROM sensor_readings'
+                    ' WHERE sensor_id = :sensor_id AND "timestamp" >= :start AND "timestamp" < :inner_start'
+                    ' UNION ALL'
+                    ' SELECT ("timestamp" - :origin) / :width, voltage, voltage FROM sensor_readings'
+                    ' WHERE sensor_id = :sensor_id AND "timestamp" >= :inner_end AND "timestamp" < :end'
+                    ') GROUP BY bucket ORDER BY bucket',
+                    {'origin': origin, 'width': width, 'rollup': rollup, 'sensor_id': sensor_id, 'start': start,
+                     'end': end, 'inner_start': inner_start, 'inner_end': inner_end}
+                ).fetchall()
+                source = f"rollup de {rollup} s"
+            else:
+                rows = conn.execute(
+                    f'SELECT ({timestamp} - ?) / ? AS bucket, MIN(voltage), MAX(voltage) '
+                    f'FROM sensor_readings WHERE {where} GROUP BY bucket ORDER BY bucket', [start, width] + params
+                ).fetchall()
+                source = "lecturas"
+
+            # Mínimo y máximo en el centro de cada bucket: un trazo vertical por píxel
+            buckets = np.array(rows, dtype='float64').reshape(-1, 3)
+            centers = origin + (buckets[:, 0] + 0.5) * width
+            return self._series_frame(zip(np.repeat(centers, 2), buckets[:, 1:].ravel())), \
+                f"{count:,} lecturas en {len(rows):,} buckets de {width:,} s (mín/máx desde {source})"
+
+        return self.cached(('sensor_series', sensor_id, int(start), int(end), points), load)
+
+    @staticmethod
+    def _series_frame(rows) -> pd.DataFrame:
+        values = np.array(list(rows), dtype='float64').reshape(-1, 2)
+        return pd.DataFrame({'timestamp': pd.to_datetime(values[:, 0], unit='s'), 'voltage': values[:, 1]})
+
+    def anomalies(self, limit: int = 5000) -> pd.DataFrame:
+        """Anomalías más recientes (tabla anomalies, ver etl/anomalies.py)"""
+        def load(conn):
+            df = pd.read_sql(
+                "SELECT sensor_id, timestamp, detector, sheet_name, voltage, baseline, score "
+                "FROM anomalies ORDER BY timestamp DESC LIMIT ?", conn, params=(limit,)
+            )
+            return self._parse_timestamps(df)
+
+        return self.cached(('anomalies', limit), load)
+
+    @staticmethod
+    def _parse_timestamps(df: pd.DataFrame) -> pd.DataFrame:
+        # La carga masiva guarda el timestamp en segundos desde epoch
+        if 'timestamp' in df.columns:
+            if pd.api.types.is_integer_dtype(df['timestamp']):
+                df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
+            else:
+                df['timestamp'] = pd.to_datetime(df['timestamp'])
+        return df
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._cache.clear()
+            self._version = None
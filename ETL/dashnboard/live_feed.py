@@ -0,0 +1,204 @@
+# live_feed.py
+import sqlite3
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data_access import TEXT_TIMESTAMP_SQL, DashboardData, uses_text_timestamps
+
+class RingBuffer:
+    """Últimas `capacity` lecturas (timestamp, voltage) de un sensor, en arreglos de tamaño fijo"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype='int64')
+        self.voltage = np.zeros(capacity)
+        self._total = 0  # lecturas agregadas desde el último clear
+
+    def __len__(self) -> int:
+        return min(self._total, self.capacity)
+
+    def clear(self):
+        self._total = 0
+
+    def extend(self, timestamps: np.ndarray, voltage: np.ndarray):
+        """Agrega lecturas al final; las más viejas se pisan cuando el buffer está lleno"""
+        n = len(timestamps)
+        if n > self.capacity:
+            self._total += n - self.capacity
+            timestamps, voltage = timestamps[-self.capacity:], voltage[-self.capacity:]
+            n = self.capacity
+        positions = (self._total + np.arange(n)) % self.capacity
+        self.timestamps[positions] = timestamps
+        self.voltage[positions] = voltage
+        self._total += n
+
+    def last_timestamp(self) -> Optional[int]:
+        return int(self.timestamps[(self._total - 1) % self.capacity]) if self._total else None
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Copia de las lecturas guardadas, de la más vieja a la más nueva"""
+        order = (self._total - len(self) + np.arange(len(self))) % self.capacity
+        return self.timestamps[order], self.voltage[order]
+
+class LiveFeed:
+    """
+    Lecturas recientes de un grupo de sensores para la vista en vivo
+
+    Cada poll solo trae las filas confirmadas desde el anterior:
+
+    - Si PRAGMA data_version no cambió, no se consulta ninguna tabla.
+    - Con sensor_readings como tabla (esquema tipado y legado) la marca de
+      agua es el rowid: las lecturas nuevas son el rango rowid > marca, que
+      se lee directo del árbol de la tabla, así que el costo depende de las
+      filas nuevas y no del historial.
+    - Con la vista del esquema normalizado (sin rowid) cada sensor tiene su
+      marca, el último timestamp de su buffer, y la búsqueda usa la clave
+      (sensor, ts) de readings.
+
+    Las lecturas se agregan a un RingBuffer por sensor. Si el esquema cambió
+    (carga completa), el archivo fue reemplazado, hubo una escritura que no
+    agregó lecturas (borrados o reemplazos) o llega una lectura más
+    vieja que la última del buffer (datos atrasados o una hoja recargada),
+    el buffer afectado se vuelve a llenar desde el índice (sensor_id,
+    timestamp) con las últimas `capacity` lecturas.
+
+    Un LiveFeed puede compartirse entre sesiones: el primer poll después de
+    una escritura consulta la base y los demás solo leen data_version.
+    """
+
+    def __init__(self, data_source: DashboardData, sensor_ids: Iterable[str], capacity: int = 500):
+        self.data_source = data_source
+        self.sensor_ids = list(dict.fromkeys(sensor_ids))
+        self.buffers: Dict[str, RingBuffer] = {sensor_id: RingBuffer(capacity) for sensor_id in self.sensor_ids}
+        self.revision = 0  # aumenta cada vez que cambian los buffers
+        self._lock = threading.Lock()
+        self._version = None
+        self._schema = None
+        self._by_rowid = True
+        self._timestamp_sql = '"timestamp"'
+        self._mark = 0  # último rowid leído (solo con sensor_readings como tabla)
+        self._frame = (None, None)
+
+    def poll(self) -> int:
+        """Trae las lecturas nuevas de la base; devuelve cuántas se agregaron a los buffers"""
+        with self._lock:
+            added = self.data_source.read(self._poll)
+            if added:
+                self.revision += 1
+            return added
+
+    def _poll(self, conn: sqlite3.Connection, version: Tuple[int, int]) -> int:
+        if version == self._version:
+            return 0
+        self._version = version
+
+        schema = (version[0], conn.execute('PRAGMA schema_version').fetchone()[0])
+        if schema != self._schema:
+            self._schema = schema
+            return self._reload(conn)
+        return self._fetch_new(conn)
+
+    def _reload(self, conn: sqlite3.Connection) -> int:
+        """Vuelve a llenar todos los buffers y fija la marca de agua"""
+        kind = conn.execute("SELECT type FROM sqlite_master WHERE name = 'sensor_readings'").fetchone()
+        if kind is None:
+            raise sqlite3.OperationalError("no such table: sensor_readings")
+        self._by_rowid = kind[0] == 'table'
+        self._timestamp_sql = TEXT_TIMESTAMP_SQL if uses_text_timestamps(conn) else '"timestamp"'
+
+        if self._by_rowid:
+            self._mark = conn.execute('SELECT MAX(rowid) FROM sensor_readings').fetchone()[0] or 0
+        return sum(self._refill(conn, sensor_id) for sensor_id in self.sensor_ids)
+
+    def _refill(self, conn: sqlite3.Connection, sensor_id: str) -> int:
+        """Últimas `capacity` lecturas del sensor (hasta la marca de agua si es por rowid)"""
+        buffer = self.buffers[sensor_id]
+        bound, params = ('AND rowid <= ? ', (self._mark,)) if self._by_rowid else ('', ())
+        rows = conn.execute(
+            f'SELECT {self._timestamp_sql}, voltage FROM sensor_readings WHERE sensor_id = ? {bound}'
+            f'ORDER BY "timestamp" DESC LIMIT ?', (sensor_id, *params, buffer.capacity)
+        ).fetchall()
+        rows.reverse()
+        buffer.clear()
+        buffer.extend(np.fromiter((row[0] for row in rows), dtype='int64', count=len(rows)),
+                      np.fromiter((row[1] for row in rows), dtype='float64', count=len(rows)))
+        return len(rows)
+
+    def _fetch_new(self, conn: sqlite3.Connection) -> int:
+        """Lecturas de los sensores del feed posteriores a la marca de agua"""
+        placeholders = ', '.join('?' * len(self.sensor_ids))
+        if self._by_rowid:
+            top = conn.execute('SELECT MAX(rowid) FROM sensor_readings').fetchone()[0] or 0
+            if top <= self._mark:
+                # Hubo una escritura (data_version cambió) pero el rowid no avanzó:
+                # se borraron o reemplazaron lecturas. Sin AUTOINCREMENT los rowid
+                # borrados al final se reutilizan, así que una hoja recargada puede
+                # volver a la misma marca con otros valores: empezar de nuevo
+                return self._reload(conn)
+            # El + delante de sensor_id impide usar el índice (sensor_id, timestamp),
+            # que recorrería todo el historial de cada sensor: se lee solo el rango de rowid
+            rows = conn.execute(
+                f'SELECT sensor_id, {self._timestamp_sql}, voltage FROM sensor_readings '
+                f'WHERE rowid > ? AND rowid <= ? AND +sensor_id IN ({placeholders}) ORDER BY rowid',
+                (self._mark, top, *self.sensor_ids)
+            ).fetchall()
+            self._mark = top
+        else:
+            # Una marca por sensor (su última lectura en el buffer): una marca
+            # global dejaría afuera las lecturas de un sensor más viejas que la
+            # última de otro
+            rows = []
+            for sensor_id, buffer in self.buffers.items():
+                last = buffer.last_timestamp()
+                rows += conn.execute(
+                    'SELECT sensor_id, "timestamp", voltage FROM sensor_readings '
+                    'WHERE sensor_id = ? AND "timestamp" > ? ORDER BY "timestamp"',
+                    (sensor_id, last if last is not None else -2 ** 63)
+                ).fetchall()
+            if not rows:
+                # La escritura no agregó lecturas posteriores: se reemplazaron datos
+                return self._reload(conn)
+        if not rows:
+            return 0
+
+        sensors = np.array([row[0] for row in rows], dtype=object)
+        timestamps = np.fromiter((row[1] for row in rows), dtype='int64', count=len(rows))
+        voltage = np.fromiter((row[2] for row in rows), dtype='float64', count=len(rows))
+        added = 0
+        for sensor_id in self.sensor_ids:
+            mask = sensors == sensor_id
+            if not mask.any():
+                continue
+            buffer = self.buffers[sensor_id]
+            last = buffer.last_timestamp()
+            new_timestamps = timestamps[mask]
+            if (last is not None and new_timestamps.min() <= last) or (np.diff(new_timestamps) < 0).any():
+                # Lecturas fuera de orden: el índice las devuelve ordenadas
+                added += self._refill(conn, sensor_id)
+            else:
+                buffer.extend(new_timestamps, voltage[mask])
+                added += int(mask.sum())
+        return added
+
+    def frame(self) -> pd.DataFrame:
+        """
+        Contenido de los buffers como DataFrame (sensor_id, timestamp, voltage)
+
+        Se arma una vez por revisión y se comparte: no debe modificarse.
+        """
+        with self._lock:
+            revision, frame = self._frame
+            if revision == self.revision and frame is not None:
+                return frame
+            parts = [(sensor_id, *buffer.arrays()) for sensor_id, buffer in self.buffers.items()]
+            frame = pd.DataFrame({
+                'sensor_id': np.repeat([sensor_id for sensor_id, _, _ in parts],
+                                       [len(timestamps) for _, timestamps, _ in parts]),
+                'timestamp': pd.to_datetime(np.concatenate([timestamps for _, timestamps, _ in parts]), unit='s'),
+                'voltage': np.concatenate([voltage for _, _, voltage in parts])
+            })
+            self._frame = (self.revision, frame)
+            return frame
@@ -0,0 +1,37 @@
+# test_data_access.py
+import sqlite3
+
+from data_access import DashboardData
+
+def make_db(path, duplicates: int):
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        'CREATE TABLE sensor_readings (sensor_id TEXT NOT NULL, sensor_number INTEGER NOT NULL, '
+        'reading_number INTEGER NOT NULL, "timestamp" INTEGER NOT NULL, voltage REAL NOT NULL, '
+        'sheet_name TEXT NOT NULL, row_index INTEGER NOT NULL, column_index INTEGER NOT NULL);'
+        'CREATE INDEX idx_readings_sensor_ts ON sensor_readings (sensor_id, "timestamp");'
+        'PRAGMA user_version = 7;'
+    )
+    rows = [(f'A_S{s}', s, r, 1704067200 + 300 * r, float(r), 'A', r, s - 1) for s in (1, 2) for r in range(40)]
+    # Lecturas repetidas, como las de append_readings o load_generator --loops
+    rows += rows[:duplicates]
+    conn.executemany('INSERT INTO sensor_readings VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+    conn.commit()
+    conn.close()
+    return len(rows)
+
+def test_pages_keep_rows_with_repeated_keys(tmp_path):
+    path = str(tmp_path / 'readings.db')
+    total = make_db(path, duplicates=53)
+    data = DashboardData(path)
+
+    pages, after = [], None
+    while True:
+        page, after = data.reading_page({}, after, page_size=7)
+        pages.append(page)
+        if after is None:
+            break
+    data.close()
+
+    assert sum(len(page) for page in pages) == total
+    assert '_page_rowid' not in pages[0].columns
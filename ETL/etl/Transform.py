@@ -1,17 +1,163 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import logging
 from datetime import datetime, timedelta
+import math
 import re
 
+from instrumentation import stage
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Número con signo opcional y coma o punto decimal (ej: "1.23 V", "-0,5 V", ".7")
+VOLTAGE_REGEX = re.compile(r'([-+]?(?:\d+(?:[.,]\d+)?|[.,]\d+))')
+
+# Tiempo base y separación entre lecturas para los timestamps sintéticos
+BASE_TIMESTAMP = datetime(2024, 1, 1, 0, 0, 0)
+READING_INTERVAL_MINUTES = 5
+
+# Modo compacto: el voltaje de una hoja se guarda como float32 solo si todos
+# sus valores tienen a lo sumo esta cantidad de cifras significativas y se
+# recuperan exactos desde el float32 (ver voltage_array)
+COMPACT_VOLTAGE_DIGITS = 7
+
+# Estadísticas en línea: lecturas por lote al alimentar los acumuladores
+ONLINE_STATS_CHUNK = 50_000
+
+def voltage_array(values) -> np.ndarray:
+    """
+    Voltajes como float64, también desde la columna float32 del modo compacto
+    
+    Los float32 se redondean a COMPACT_VOLTAGE_DIGITS cifras significativas,
+    así que estadísticas, cargas y exportaciones ven los mismos valores que
+    sin modo compacto.
+    """
+    array = values.to_numpy() if isinstance(values, pd.Series) else np.asarray(values)
+    if array.dtype != np.float32:
+        return array.astype('float64', copy=False)
+    
+    wide = array.astype('float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        exponent = np.floor(np.log10(np.abs(wide)))
+    shift = COMPACT_VOLTAGE_DIGITS - 1 - np.where(np.isfinite(exponent), exponent, 0)
+    # Escalar por potencias de 10 enteras: el cociente final es el float64
+    # más cercano al decimal, igual que al parsear el texto original
+    up = np.power(10.0, np.maximum(shift, 0))
+    down = np.power(10.0, np.maximum(-shift, 0))
+    return np.rint(wide * up / down) * down / up
+
+def smallest_int_dtype(values: np.ndarray) -> np.dtype:
+    """Tipo entero con signo más chico que representa todos los valores"""
+    if len(values) == 0:
+        return np.dtype('int8')
+    low, high = values.min(), values.max()
+    for dtype in ('int8', 'int16', 'int32'):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return np.dtype(dtype)
+    return np.dtype('int64')
+
+def sheet_summary(df: pd.DataFrame) -> Dict:
+    """
+    Agregados combinables de las lecturas estructuradas de una hoja
+    
+    Conteo, media, suma de cuadrados de las desviaciones a la media (M2),
+    mínimo, máximo y conjunto de sensores: todo lo que necesita el análisis
+    cruzado, en memoria O(sensores). Las claves coinciden con las columnas
+    de sheet_partials (salvo sensors, que allí se guarda como conteo).
+    """
+    if df.empty:
+        return {'readings': 0, 'voltage_mean': 0.0, 'voltage_m2': 0.0,
+                'voltage_min': None, 'voltage_max': None, 'sensors': frozenset()}
+    voltage = voltage_array(df['voltage'])
+    mean = float(voltage.mean())
+    return {
+        'readings': int(len(voltage)),
+        'voltage_mean': mean,
+        'voltage_m2': float(np.square(voltage - mean).sum()),
+        'voltage_min': float(voltage.min()),
+        'voltage_max': float(voltage.max()),
+        'sensors': frozenset(df['sensor_id'].unique())
+    }
+
+def combine_moments(parts: List[Tuple[int, float, float]]) -> Tuple[int, float, float]:
+    """
+    Combina (conteo, media, M2) de varias partes con la fórmula de Chan
+
+    M2 = Σ M2_i + Σ n_i · (media_i - media)²: solo suma desviaciones, así
+    que no cancela como Σx² - n·media² cuando la media es grande frente a
+    la dispersión. fsum hace que el resultado no dependa del orden de las
+    partes.
+    """
+    readings = sum(count for count, _, _ in parts)
+    mean = math.fsum(count * part_mean for count, part_mean, _ in parts) / readings
+    m2 = math.fsum(part_m2 + count * (part_mean - mean) ** 2 for count, part_mean, part_m2 in parts)
+    return readings, mean, m2
+
+def global_voltage_stats(readings: int, mean: float, m2: float,
+                         voltage_min: float, voltage_max: float) -> Dict:
+    """Media, desviación estándar (muestral) y rango a partir de los agregados combinados"""
+    std = math.sqrt(m2 / (readings - 1)) if readings > 1 else math.nan
+    return {
+        'mean_voltage': mean,
+        'voltage_std': std,
+        'voltage_range': [voltage_min, voltage_max]
+    }
+
+def merge_summaries(summaries: Dict[str, Dict]) -> Dict:
+    """
+    Análisis cruzado a partir de los agregados de cada hoja (ver sheet_summary)
+    
+    Combina en O(hojas) sin juntar las lecturas. Devuelve la estructura de
+    DataTransformer.analysis_results['cross_sheet'], o {} si no hay lecturas.
+    """
+    summaries = {name: summary for name, summary in summaries.items() if summary['readings']}
+    if not summaries:
+        return {}
+    
+    readings, mean, m2 = combine_moments([(summary['readings'], summary['voltage_mean'], summary['voltage_m2'])
+                                          for summary in summaries.values()])
+    global_stats = global_voltage_stats(
+        readings, mean, m2,
+        min(summary['voltage_min'] for summary in summaries.values()),
+        max(summary['voltage_max'] for summary in summaries.values())
+    )
+    return {
+        'total_sensors': len(frozenset().union(*(summary['sensors'] for summary in summaries.values()))),
+        'total_readings': readings,
+        'global_stats': global_stats,
+        'sensors_by_sheet': {name: len(summaries[name]['sensors']) for name in sorted(summaries)}
+    }
+
 class DataTransformer:
-    def __init__(self):
+    def __init__(self, vectorized: bool = True, metrics=None, compact: bool = False,
+                 online_stats: bool = False):
+        """
+        Args:
+            vectorized: Si es True usa el motor vectorizado (NumPy/pandas) para
+                detectar filas de sensores y reestructurar los datos. Si es False
+                usa la implementación original fila por fila (útil para comparar).
+            metrics: PipelineMetrics opcional (ver instrumentation.py) donde se
+                registran los tiempos de cada paso por hoja
+            compact: Representación compacta de las lecturas estructuradas:
+                sensor_id y sheet_name categóricos, enteros del tipo más chico
+                que alcanza y voltage float32 cuando la hoja cumple
+                COMPACT_VOLTAGE_DIGITS (ver voltage_array)
+            online_stats: Calcular las estadísticas por sensor con acumuladores
+                combinables (Welford + t-digest, ver online_stats.py) por lotes de
+                ONLINE_STATS_CHUNK lecturas en lugar de ordenar la hoja completa.
+                Media, std, mínimo y máximo son exactos; cuantiles y outliers son
+                aproximados en sensores con más de 5 · compresión lecturas.
+        """
         self.transformed_data = {}
         self.analysis_results = {}
+        self.vectorized = vectorized
+        self.metrics = metrics
+        self.compact = compact
+        self.online_stats = online_stats
+        self.parse_report = {}
         
     def transform_sensor_data(self, raw_data: Dict) -> Dict:
         """Transforma los datos brutos en formato estructurado"""
@@ -19,35 +165,9 @@ class DataTransformer:
             logger.info(f"Iniciando transformación de {len(raw_data)} hojas")
             
             for sheet_name, sheet_data in raw_data.items():
-                logger.info(f"Transformando {sheet_name}")
-                df = sheet_data['data']
-                
-                # Log información del DataFrame
-                logger.info(f"  Dimensiones: {df.shape}")
-                logger.info(f"  Columnas: {df.columns.tolist()}")
-                
-                # Aplicar transformaciones
-                cleaned_df = self._clean_data(df)
-                structured_df = self._structure_sensor_data(cleaned_df, sheet_name)
-                
-                if not structured_df.empty:
-                    self.transformed_data[sheet_name] = {
-                        'data': structured_df,
-                        'statistics': self._calculate_statistics(structured_df),
-                        'quality_metrics': self._calculate_quality_metrics(structured_df)
-                    }
-                    logger.info(f"  ✓ {sheet_name}: {len(structured_df)} registros procesados")
-                else:
-                    self.transformed_data[sheet_name] = {
-                        'data': pd.DataFrame(),
-                        'statistics': {},
-                        'quality_metrics': {}
-                    }
-                    logger.warning(f"  ✗ {sheet_name}: Sin datos estructurados")
+                self.transformed_data[sheet_name] = self.transform_sheet(sheet_name, sheet_data)
             
-            # Análisis cruzado solo si hay datos
-            if any(not data['data'].empty for data in self.transformed_data.values()):
-                self._perform_cross_sheet_analysis()
+            self.finalize_transformation()
             
             logger.info("Transformación completada")
             return self.transformed_data
@@ -57,21 +177,76 @@ class DataTransformer:
             logger.exception("Detalles del error:")  # Esto da traceback completo
             raise
     
-    def _clean_data(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Limpia y prepara los datos"""
-        # Crear copia para no modificar el original
-        cleaned_df = df.copy()
+    def transform_sheet(self, sheet_name: str, sheet_data: Dict) -> Dict:
+        """
+        Transforma una sola hoja: limpieza, estructura, estadísticas y calidad.
+        
+        Cada hoja es independiente hasta el análisis cruzado, por lo que este
+        método puede ejecutarse en procesos separados (ver parallel.py).
+        """
+        logger.info(f"Transformando {sheet_name}")
+        df = sheet_data['data']
         
-        # Remover filas completamente vacías
-        cleaned_df = cleaned_df.dropna(how='all')
+        # Log información del DataFrame
+        logger.info(f"  Dimensiones: {df.shape}")
+        logger.info(f"  Columnas: {df.columns.tolist()}")
+        
+        # Aplicar transformaciones
+        with stage(self.metrics, f"transform/{sheet_name}", rows=len(df)):
+            with stage(self.metrics, f"transform/{sheet_name}/clean", rows=len(df)):
+                cleaned_df = self._clean_data(df, sheet_name)
+            with stage(self.metrics, f"transform/{sheet_name}/structure") as record:
+                structured_df = self._structure_sensor_data(cleaned_df, sheet_name)
+                record['rows'] = len(structured_df)
+            
+            if structured_df.empty:
+                logger.warning(f"  ✗ {sheet_name}: Sin datos estructurados")
+                return {
+                    'data': pd.DataFrame(),
+                    'statistics': {},
+                    'quality_metrics': {},
+                    'summary': sheet_summary(pd.DataFrame())
+                }
+            
+            with stage(self.metrics, f"transform/{sheet_name}/statistics", rows=len(structured_df)):
+                statistics = self._calculate_statistics(structured_df)
+            with stage(self.metrics, f"transform/{sheet_name}/quality", rows=len(structured_df)):
+                quality_metrics = self._calculate_quality_metrics(structured_df)
+                summary = sheet_summary(structured_df)
+        
+        logger.info(f"  ✓ {sheet_name}: {len(structured_df)} registros procesados")
+        return {
+            'data': structured_df,
+            'statistics': statistics,
+            'quality_metrics': quality_metrics,
+            'summary': summary
+        }
+    
+    def finalize_transformation(self):
+        """Ejecuta los pasos que necesitan todas las hojas ya transformadas"""
+        # Análisis cruzado solo si hay datos
+        if any(not data['data'].empty for data in self.transformed_data.values()):
+            with stage(self.metrics, "transform/cross_sheet"):
+                self._perform_cross_sheet_analysis()
+    
+    def _clean_data(self, df: pd.DataFrame, sheet_name: Optional[str] = None) -> pd.DataFrame:
+        """Limpia y prepara los datos"""
+        # Remover filas completamente vacías (dropna devuelve un DataFrame
+        # nuevo, así que el original no se modifica y no hace falta copiarlo)
+        cleaned_df = df.dropna(how='all')
         
         # Remover columnas completamente vacías
         cleaned_df = cleaned_df.dropna(axis=1, how='all')
         
-        # Convertir columnas con valores de voltaje a numéricos
-        for col in cleaned_df.columns:
-            if cleaned_df[col].dtype == 'object':
-                cleaned_df[col] = cleaned_df[col].apply(self._convert_voltage_to_numeric)
+        # Convertir columnas con valores de voltaje a numéricos. El resultado
+        # queda en float64, así que _structure_sensor_data no vuelve a parsearlo
+        cleaned_df, parse_failures = self._parse_voltage_frame(cleaned_df)
+
+        if sheet_name is not None:
+            self.parse_report[sheet_name] = parse_failures
+            failed_columns = {col: count for col, count in parse_failures.items() if count > 0}
+            if failed_columns:
+                logger.info(f"  Valores no convertibles por columna: {failed_columns}")
                 
         return cleaned_df
     
@@ -84,11 +259,11 @@ class DataTransformer:
             return float(value)
             
         if isinstance(value, str):
-            # Extraer número del string (ej: "1.23 V" -> 1.23)
-            match = re.search(r'([-+]?\d*\.\d+|\d+)', str(value))
+            # Extraer número del string (ej: "1.23 V" -> 1.23, "-0,5 V" -> -0.5)
+            match = VOLTAGE_REGEX.search(value)
             if match:
                 try:
-                    return float(match.group())
+                    return float(match.group(1).replace(',', '.'))
                 except ValueError:
                     return np.nan
         
@@ -101,9 +276,177 @@ class DataTransformer:
             return True
         except (ValueError, TypeError):
             return False
-    
-    def _find_sensor_rows(self, df: pd.DataFrame) -> List[int]:
+
+    def _parse_voltage_values(self, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Convierte un arreglo de objetos a float64 con la misma semántica que
+        _convert_voltage_to_numeric.
+
+        Los valores se factorizan primero, de modo que la expresión regular
+        compilada solo se evalúa una vez por valor distinto (str.extract) y el
+        resultado se expande a todo el arreglo con indexación NumPy.
+
+        Returns:
+            Tupla (valores numéricos, máscara de valores no vacíos que no se pudieron convertir)
+        """
+        codes, uniques = pd.factorize(values)
+        uniques = np.asarray(uniques, dtype=object)
+
+        parsed = np.full(len(uniques), np.nan)
+        is_text = np.fromiter((isinstance(value, str) for value in uniques), dtype=bool, count=len(uniques))
+        if is_text.any():
+            extracted = pd.Series(uniques[is_text]).str.extract(VOLTAGE_REGEX, expand=False)
+            parsed[is_text] = pd.to_numeric(extracted.str.replace(',', '.', regex=False), errors='coerce')
+        if not is_text.all():
+            # Valores numéricos mezclados en columnas de tipo object
+            parsed[~is_text] = pd.to_numeric(pd.Series(uniques[~is_text]), errors='coerce')
+
+        failed_uniques = np.isnan(parsed) & ~(is_text & (uniques == ''))
+
+        # Añadir una entrada final para los códigos -1 (valores nulos)
+        numeric = np.append(parsed, np.nan)[codes]
+        failed = np.append(failed_uniques, False)[codes]
+        return numeric, failed
+
+    def _parse_voltage_frame(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict]:
+        """
+        Convierte todas las columnas del DataFrame a float64.
+
+        Las columnas ya numéricas solo se reinterpretan; el resto se procesa en
+        un único paso sobre todas sus celdas.
+
+        Returns:
+            Tupla (DataFrame numérico, dict columna -> valores no convertibles)
+        """
+        numeric = np.full(df.shape, np.nan)
+        failures = np.zeros(df.shape[1], dtype='int64')
+
+        is_numeric = np.array([pd.api.types.is_numeric_dtype(dtype) for dtype in df.dtypes], dtype=bool)
+        if is_numeric.any():
+            numeric[:, is_numeric] = df.iloc[:, is_numeric].to_numpy(dtype='float64', na_value=np.nan)
+
+        if not is_numeric.all():
+            text_block = df.iloc[:, ~is_numeric].to_numpy(dtype=object)
+            values, failed = self._parse_voltage_values(text_block.ravel())
+            numeric[:, ~is_numeric] = values.reshape(text_block.shape)
+            failures[~is_numeric] = failed.reshape(text_block.shape).sum(axis=0)
+
+        numeric_df = pd.DataFrame(numeric, index=df.index, columns=df.columns)
+        return numeric_df, dict(zip(df.columns, failures.tolist()))
+
+    def _to_numeric_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Convierte todo el DataFrame a float64 columna por columna.
+
+        Las columnas ya convertidas por _clean_data solo se reinterpretan como
+        float64, por lo que cada valor se parsea una única vez.
+        """
+        return self._parse_voltage_frame(df)[0]
+
+    def _find_sensor_rows(self, df: pd.DataFrame, numeric_df: Optional[pd.DataFrame] = None) -> List[int]:
         """Encuentra filas que contienen datos de sensores"""
+        # Verificar si el DataFrame está vacío
+        if df.empty:
+            return []
+
+        if numeric_df is None:
+            numeric_df = self._to_numeric_frame(df)
+
+        # Si tiene al menos 3 valores numéricos, probablemente es fila de sensores
+        mask = numeric_df.notna().sum(axis=1).to_numpy() >= 3
+        return df.index[mask].tolist()
+
+    def _structure_sensor_data(self, df: pd.DataFrame, sheet_name: str) -> pd.DataFrame:
+        """Estructura los datos de sensores en formato tidy"""
+        if not self.vectorized:
+            return self._structure_sensor_data_legacy(df, sheet_name)
+
+        # Verificar si el DataFrame está vacío
+        if df.empty:
+            logger.warning(f"DataFrame vacío para {sheet_name}")
+            return pd.DataFrame()
+
+        numeric_df = self._to_numeric_frame(df)
+        sensor_rows = self._find_sensor_rows(df, numeric_df)
+
+        if not sensor_rows:
+            logger.warning(f"No se encontraron filas de sensores en {sheet_name}")
+            logger.info(f"Dimensiones del DataFrame: {df.shape}")
+            logger.info(f"Primeras filas:\n{df.head(3)}")
+            return pd.DataFrame()
+
+        # Igual que la implementación original: las etiquetas de fila se usan
+        # como posiciones y las que quedan fuera de rango se descartan
+        start_row = min(sensor_rows)
+        rows = np.asarray(sensor_rows, dtype='int64')
+        out_of_range = rows >= len(df)
+        for row_idx in rows[out_of_range]:
+            logger.warning(f"Índice {row_idx} fuera de rango para DataFrame de tamaño {len(df)}")
+        rows = rows[~out_of_range]
+
+        # Melt ancho -> largo: todas las celdas válidas en orden fila/columna
+        block = numeric_df.to_numpy(dtype='float64')[rows]
+        row_pos, col_idx = np.nonzero(~np.isnan(block))
+        row_idx = rows[row_pos]
+        offsets = row_idx - start_row
+
+        sensor_labels = np.array([f"{sheet_name}_S{i + 1}" for i in range(block.shape[1])], dtype=object)
+
+        if self.compact:
+            return self._compact_sensor_frame(sheet_name, sensor_labels, block[row_pos, col_idx],
+                                              col_idx, row_idx, offsets)
+
+        result_df = pd.DataFrame({
+            'sensor_id': sensor_labels[col_idx],
+            'sensor_number': col_idx + 1,
+            'reading_number': offsets + 1,
+            'timestamp': pd.Timestamp(BASE_TIMESTAMP) + pd.to_timedelta(offsets * READING_INTERVAL_MINUTES, unit='min'),
+            'voltage': block[row_pos, col_idx],
+            'sheet_name': sheet_name,
+            'row_index': row_idx,
+            'column_index': col_idx
+        })
+        result_df = result_df.astype({
+            'sensor_number': 'int64',
+            'reading_number': 'int64',
+            'row_index': 'int64',
+            'column_index': 'int64'
+        })
+
+        logger.info(f"Estructurados {len(result_df)} registros para {sheet_name}")
+        return result_df
+
+    def _compact_sensor_frame(self, sheet_name: str, sensor_labels: np.ndarray, voltage: np.ndarray,
+                              col_idx: np.ndarray, row_idx: np.ndarray, offsets: np.ndarray) -> pd.DataFrame:
+        """Mismas lecturas que _structure_sensor_data con tipos compactos"""
+        # Los códigos de las categorías son directamente los índices de columna
+        sensor_id = pd.Categorical.from_codes(col_idx, categories=sensor_labels).remove_unused_categories()
+        sheet = pd.Categorical.from_codes(np.zeros(len(col_idx), dtype='int8'), categories=[sheet_name])
+
+        compact_voltage = voltage.astype('float32')
+        if not np.array_equal(voltage_array(compact_voltage), voltage):
+            logger.info(f"  {sheet_name}: voltajes con más de {COMPACT_VOLTAGE_DIGITS} cifras, se mantiene float64")
+            compact_voltage = voltage
+
+        sensor_number = col_idx + 1
+        reading_number = offsets + 1
+        result_df = pd.DataFrame({
+            'sensor_id': sensor_id,
+            'sensor_number': sensor_number.astype(smallest_int_dtype(sensor_number)),
+            'reading_number': reading_number.astype(smallest_int_dtype(reading_number)),
+            'timestamp': (np.datetime64(BASE_TIMESTAMP, 'ns')
+                          + offsets.astype('timedelta64[m]') * READING_INTERVAL_MINUTES).astype('datetime64[ns]'),
+            'voltage': compact_voltage,
+            'sheet_name': sheet,
+            'row_index': row_idx.astype(smallest_int_dtype(row_idx)),
+            'column_index': col_idx.astype(smallest_int_dtype(col_idx))
+        })
+
+        logger.info(f"Estructurados {len(result_df)} registros para {sheet_name} (compacto)")
+        return result_df
+
+    def _find_sensor_rows_legacy(self, df: pd.DataFrame) -> List[int]:
+        """Encuentra filas de sensores recorriendo el DataFrame fila por fila (implementación original)"""
         sensor_rows = []
         
         # Verificar si el DataFrame está vacío
@@ -127,15 +470,15 @@ class DataTransformer:
                 
         return sensor_rows
     
-    def _structure_sensor_data(self, df: pd.DataFrame, sheet_name: str) -> pd.DataFrame:
-        """Estructura los datos de sensores en formato tidy"""
+    def _structure_sensor_data_legacy(self, df: pd.DataFrame, sheet_name: str) -> pd.DataFrame:
+        """Estructura los datos de sensores en formato tidy celda por celda (implementación original)"""
         # Verificar si el DataFrame está vacío
         if df.empty:
             logger.warning(f"DataFrame vacío para {sheet_name}")
             return pd.DataFrame()
         
         # Encontrar fila que contiene los valores de sensores
-        sensor_rows = self._find_sensor_rows(df)
+        sensor_rows = self._find_sensor_rows_legacy(df)
         
         if not sensor_rows:
             logger.warning(f"No se encontraron filas de sensores en {sheet_name}")
@@ -177,11 +520,72 @@ class DataTransformer:
         logger.info(f"Estructurados {len(result_df)} registros para {sheet_name}")
         return result_df
     
+    def clean_live_readings(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, int]:
+        """
+        Limpia lecturas en vivo (con timestamp real) al formato de sensor_readings
+        
+        El voltaje se parsea igual que en las hojas (_parse_voltage_values) y el
+        timestamp acepta fechas en texto o segundos desde epoch. Las columnas
+        que no vengan en la entrada se derivan del sensor_id (<hoja>_S<número>).
+        
+        Args:
+            df: Lecturas con al menos sensor_id, timestamp y voltage
+            
+        Returns:
+            Tupla (DataFrame listo para DataLoader.append_readings, filas descartadas)
+        """
+        columns = ['sensor_id', 'sensor_number', 'reading_number', 'timestamp',
+                   'voltage', 'sheet_name', 'row_index', 'column_index']
+        if df.empty:
+            return pd.DataFrame(columns=columns), 0
+        
+        sensor_id = df['sensor_id'].astype(object).where(df['sensor_id'].notna(), None)
+        voltage, _ = self._parse_voltage_values(df['voltage'].to_numpy(dtype=object))
+        
+        # Segundos desde epoch o fechas en texto (se aceptan mezclados). Los
+        # textos con zona (Z, +02:00) se llevan a UTC sin zona, como el epoch
+        epoch = pd.to_numeric(df['timestamp'], errors='coerce')
+        timestamp = pd.to_datetime(epoch, unit='s', errors='coerce')
+        is_text = epoch.isna() & df['timestamp'].notna()
+        if is_text.any():
+            parsed = pd.to_datetime(df['timestamp'][is_text], errors='coerce', format='mixed', utc=True)
+            timestamp = timestamp.where(~is_text, parsed.dt.tz_convert(None).reindex(timestamp.index))
+        
+        valid = sensor_id.notna().to_numpy() & ~np.isnan(voltage) & timestamp.notna().to_numpy()
+        
+        clean = pd.DataFrame({
+            'sensor_id': sensor_id[valid].astype(str).to_numpy(),
+            'timestamp': timestamp[valid].to_numpy(dtype='datetime64[s]'),
+            'voltage': voltage[valid]
+        })
+        
+        def given(col: str) -> Optional[pd.Series]:
+            return df[col][valid].reset_index(drop=True) if col in df.columns else None
+        
+        def integer_column(col: str, fallback: pd.Series) -> pd.Series:
+            values = given(col)
+            if values is not None:
+                fallback = pd.to_numeric(values, errors='coerce').fillna(fallback)
+            return fallback.astype('int64')
+        
+        # Hoja y número de sensor a partir del sensor_id cuando no vienen en la entrada
+        parts = clean['sensor_id'].str.extract(r'^(?P<sheet>.*)_S(?P<number>\d+)$')
+        sheet_name = parts['sheet'].fillna('live')
+        if given('sheet_name') is not None:
+            sheet_name = given('sheet_name').where(given('sheet_name').fillna('') != '', sheet_name)
+        clean['sheet_name'] = sheet_name.astype(str)
+        
+        clean['sensor_number'] = integer_column('sensor_number', pd.to_numeric(parts['number']).fillna(0))
+        clean['reading_number'] = integer_column('reading_number', pd.Series(0, index=clean.index))
+        clean['row_index'] = integer_column('row_index', pd.Series(-1, index=clean.index))
+        clean['column_index'] = integer_column('column_index', clean['sensor_number'] - 1)
+        
+        return clean[columns], int((~valid).sum())
+    
     def _generate_timestamp(self, row_idx: int, start_row: int) -> datetime:
         """Genera timestamp basado en índice de fila"""
-        base_time = datetime(2024, 1, 1, 0, 0, 0)
-        time_delta = timedelta(minutes=(row_idx - start_row) * 5)  # 5 minutos entre lecturas
-        return base_time + time_delta
+        time_delta = timedelta(minutes=(row_idx - start_row) * READING_INTERVAL_MINUTES)  # 5 minutos entre lecturas
+        return BASE_TIMESTAMP + time_delta
     
     def _calculate_statistics(self, df: pd.DataFrame) -> Dict:
         """Calcula estadísticas por sensor"""
@@ -195,39 +599,89 @@ class DataTransformer:
             return {}
             
         try:
-            stats = df.groupby('sensor_id')['voltage'].agg([
-                'count', 'mean', 'median', 'std', 'min', 'max', 
-                lambda x: x.quantile(0.25), lambda x: x.quantile(0.75)
-            ]).rename(columns={
-                '<lambda_0>': 'q25', 
-                '<lambda_1>': 'q75'
-            })
-            
-            # Detectar outliers usando IQR
-            stats['outliers_count'] = df.groupby('sensor_id').apply(
-                lambda x: self._count_outliers(x['voltage'])
-            )
-            
+            if self.online_stats:
+                return self._online_statistics(df)
+            stats = self._grouped_statistics(df['sensor_id'], df['voltage'])
             return stats.to_dict('index')
         except Exception as e:
             logger.error(f"Error calculando estadísticas: {e}")
             return {}
-    
-    def _count_outliers(self, series: pd.Series) -> int:
-        """Cuenta outliers usando método IQR"""
-        if len(series) < 4:
-            return 0
-            
-        try:
-            Q1 = series.quantile(0.25)
-            Q3 = series.quantile(0.75)
-            IQR = Q3 - Q1
-            lower_bound = Q1 - 1.5 * IQR
-            upper_bound = Q3 + 1.5 * IQR
-            
-            return ((series < lower_bound) | (series > upper_bound)).sum()
-        except:
-            return 0
+
+    def _online_statistics(self, df: pd.DataFrame) -> Dict:
+        """Estadísticas por sensor con acumuladores en línea, lote a lote"""
+        # online_stats importa este módulo (voltage_array)
+        from online_stats import StatisticsAccumulator
+
+        accumulator = StatisticsAccumulator()
+        for offset in range(0, len(df), ONLINE_STATS_CHUNK):
+            accumulator.update_frame(df.iloc[offset:offset + ONLINE_STATS_CHUNK])
+        return accumulator.to_dict()
+
+    def _grouped_statistics(self, keys: pd.Series, values: pd.Series) -> pd.DataFrame:
+        """
+        Calcula count/mean/median/std/min/max/q25/q75 y outliers IQR de todos
+        los sensores en una sola pasada.
+
+        Los valores se ordenan una vez por (sensor, voltaje); a partir de ahí
+        cada grupo es un tramo contiguo del arreglo, así que los cuantiles se
+        leen por posición (interpolación lineal, igual que Series.quantile) y
+        las sumas se hacen con np.add.reduceat sin volver a agrupar.
+        """
+        valid = values.notna().to_numpy()
+        if isinstance(keys.dtype, pd.CategoricalDtype):
+            # Las categorías vienen en orden de columna: ordenarlas para que el
+            # resultado quede por sensor_id igual que con texto
+            keys = keys.cat.reorder_categories(sorted(keys.cat.categories))
+        codes, sensor_ids = pd.factorize(keys[valid], sort=True)
+        voltages = voltage_array(values[valid])
+
+        columns = ['count', 'mean', 'median', 'std', 'min', 'max', 'q25', 'q75', 'outliers_count']
+        if len(sensor_ids) == 0:
+            return pd.DataFrame(columns=columns, index=pd.Index([], name='sensor_id'))
+
+        order = np.lexsort((voltages, codes))
+        voltages = voltages[order]
+        counts = np.bincount(codes, minlength=len(sensor_ids))
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        group_of = np.repeat(np.arange(len(sensor_ids)), counts)
+
+        def quantile(q: float) -> np.ndarray:
+            position = q * (counts - 1)
+            lower = np.floor(position).astype('int64')
+            upper = np.minimum(lower + 1, counts - 1)
+            fraction = position - lower
+            low_values = voltages[starts + lower]
+            high_values = voltages[starts + upper]
+            return low_values + (high_values - low_values) * fraction
+
+        sums = np.add.reduceat(voltages, starts)
+        means = sums / counts
+        squared = np.add.reduceat((voltages - means[group_of]) ** 2, starts)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stds = np.where(counts > 1, np.sqrt(squared / (counts - 1)), np.nan)
+
+        q25 = quantile(0.25)
+        q75 = quantile(0.75)
+
+        # Detectar outliers usando IQR (sensores con menos de 4 lecturas no cuentan)
+        iqr = q75 - q25
+        lower_bound = (q25 - 1.5 * iqr)[group_of]
+        upper_bound = (q75 + 1.5 * iqr)[group_of]
+        is_outlier = (voltages < lower_bound) | (voltages > upper_bound)
+        outliers = np.bincount(group_of[is_outlier], minlength=len(sensor_ids))
+        outliers[counts < 4] = 0
+
+        return pd.DataFrame({
+            'count': counts,
+            'mean': means,
+            'median': quantile(0.5),
+            'std': stds,
+            'min': voltages[starts],
+            'max': voltages[starts + counts - 1],
+            'q25': q25,
+            'q75': q75,
+            'outliers_count': outliers
+        }, index=pd.Index(sensor_ids, name='sensor_id'), columns=columns)
     
     def _calculate_quality_metrics(self, df: pd.DataFrame) -> Dict:
         """Calcula métricas de calidad de datos"""
@@ -235,8 +689,9 @@ class DataTransformer:
             return {}
             
         try:
+            voltage = pd.Series(voltage_array(df['voltage']))
             metrics = {
-                'completeness': df['voltage'].count() / len(df) if len(df) > 0 else 0,
+                'completeness': voltage.count() / len(df) if len(df) > 0 else 0,
                 'unique_sensors': df['sensor_id'].nunique(),
                 'total_readings': len(df),
             }
@@ -252,9 +707,9 @@ class DataTransformer:
             # Solo calcular si tenemos datos de voltage
             if 'voltage' in df.columns and not df['voltage'].empty:
                 metrics['value_range'] = {
-                    'min_voltage': df['voltage'].min(),
-                    'max_voltage': df['voltage'].max(),
-                    'mean_voltage': df['voltage'].mean()
+                    'min_voltage': voltage.min(),
+                    'max_voltage': voltage.max(),
+                    'mean_voltage': voltage.mean()
                 }
             
             return metrics
@@ -263,31 +718,21 @@ class DataTransformer:
             return {}
     
     def _perform_cross_sheet_analysis(self):
-        """Realiza análisis comparativo entre diferentes hojas"""
+        """
+        Realiza análisis comparativo entre diferentes hojas
+        
+        Se reduce desde el resumen de cada hoja (ver sheet_summary), sin
+        concatenar las lecturas de todo el libro.
+        """
         try:
-            # Recolectar todos los DataFrames no vacíos
-            all_dfs = []
-            for sheet_name, data in self.transformed_data.items():
-                if not data['data'].empty:
-                    all_dfs.append(data['data'])
+            summaries = {sheet_name: data['summary'] for sheet_name, data in self.transformed_data.items()}
+            cross_sheet = merge_summaries(summaries)
             
-            if not all_dfs:
+            if not cross_sheet:
                 logger.warning("No hay datos para análisis cruzado")
                 return
-                
-            all_data = pd.concat(all_dfs, ignore_index=True)
-            
-            self.analysis_results['cross_sheet'] = {
-                'total_sensors': all_data['sensor_id'].nunique(),
-                'total_readings': len(all_data),
-                'global_stats': {
-                    'mean_voltage': all_data['voltage'].mean(),
-                    'voltage_std': all_data['voltage'].std(),
-                    'voltage_range': [all_data['voltage'].min(), all_data['voltage'].max()]
-                },
-                'sensors_by_sheet': all_data.groupby('sheet_name')['sensor_id'].nunique().to_dict()
-            }
             
+            self.analysis_results['cross_sheet'] = cross_sheet
             logger.info("Análisis cruzado completado")
         except Exception as e:
             logger.error(f"Error en análisis cruzado: {e}")
@@ -301,7 +746,6 @@ class DataTransformer:
             if sheet_data['data'].empty:
                 continue
                 
-            df = sheet_data['data']
             stats = sheet_data['statistics']
             
             sheet_anomalies = []
@@ -320,7 +764,7 @@ class DataTransformer:
                         'severity': 'MEDIUM'
                     })
                 
-                sensor_readings = len(df[df['sensor_id'] == sensor_id])
+                sensor_readings = sensor_stats.get('count', 0)
                 if sensor_readings > 0 and sensor_stats['outliers_count'] > sensor_readings * 0.1:
                     sheet_anomalies.append({
                         'sensor_id': sensor_id,
@@ -336,6 +780,13 @@ class DataTransformer:
                 
         return anomalies
 
+    def get_parse_report(self) -> Dict:
+        """Reporte por hoja y columna de los valores que no se pudieron convertir a voltaje"""
+        return {
+            sheet_name: {col: count for col, count in failures.items() if count > 0}
+            for sheet_name, failures in self.parse_report.items()
+        }
+
     def get_summary_report(self) -> Dict:
         """Genera un reporte resumen de la transformación"""
         summary = {
@@ -343,7 +794,8 @@ class DataTransformer:
             'sheets_with_data': sum(1 for data in self.transformed_data.values() if not data['data'].empty),
             'total_transformed_records': 0,
             'sheets_processed': list(self.transformed_data.keys()),
-            'processing_errors': []
+            'processing_errors': [],
+            'parse_failures': self.get_parse_report()
         }
         
         for sheet_name, data in self.transformed_data.items():
@@ -0,0 +1,383 @@
+# anomalies.py
+import logging
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from load import ANOMALY_COLUMNS, DataLoader
+from sensor_store import SensorStore
+from Transform import voltage_array
+
+logger = logging.getLogger(__name__)
+
+# Filas por bloque de linear_scan: acota los productos acumulados de los
+# factores de decaimiento para que no se vayan a cero con series largas
+EWMA_BLOCK = 64
+
+class AnomalyDetector:
+    """
+    Detección de anomalías en series de tiempo para todos los sensores a la vez
+
+    Cada lote de lecturas se ordena por sensor y tiempo y se arma una matriz
+    (lectura × sensor): la columna j tiene las lecturas sucesivas del sensor j
+    y las filas sobrantes quedan en NaN. Sobre esa matriz se calculan, sin
+    recorrer sensores en Python:
+
+    - z-score móvil: desvío de cada lectura respecto de la media y la
+      desviación estándar de las `window` lecturas anteriores del sensor
+      (sumas acumuladas). Evento 'zscore' en cada lectura con |z| > z_threshold.
+    - EWMA: media exponencial del residuo estandarizado (lectura menos el
+      nivel de referencia del sensor, dividido por la desviación de la
+      ventana), con límites de control ±ewma_limit · sqrt(alpha / (2 - alpha)).
+      Evento 'ewma' cuando sale de los límites.
+    - CUSUM de dos lados sobre el mismo residuo, para escalones y derivas:
+      evento 'cusum' cuando la suma supera cusum_h (score positivo hacia
+      arriba, negativo hacia abajo).
+
+    El nivel de referencia es una media exponencial lenta (level_alpha) de
+    las lecturas del sensor: a diferencia de la ventana móvil, no acompaña
+    enseguida un escalón o una deriva, que quedan como residuo sostenido.
+    EWMA y CUSUM solo registran la primera lectura de cada alarma, que
+    sigue activa hasta que el estadístico baja a la mitad del umbral.
+
+    El estado entre lotes es de tamaño fijo por sensor (las últimas `window`
+    lecturas, el nivel, la EWMA, las dos sumas CUSUM y qué alarmas siguen
+    activas), así que procesar las lecturas en un solo lote o en muchos
+    micro-lotes da los mismos eventos. Las lecturas de cada sensor deben
+    llegar en orden de tiempo entre lotes; dentro de un lote se ordenan.
+    Las primeras min_periods lecturas de cada sensor solo calientan la
+    ventana (no generan eventos).
+    """
+
+    def __init__(self, window: int = 30, z_threshold: float = 5.0, level_alpha: float = 0.02,
+                 ewma_alpha: float = 0.05, ewma_limit: float = 4.0, cusum_k: float = 0.5,
+                 cusum_h: float = 12.0, min_periods: Optional[int] = None):
+        """
+        Args:
+            window: Lecturas anteriores que forman la línea base del z-score
+            z_threshold: |z| a partir del cual una lectura es un pico
+            level_alpha: Peso de cada lectura en el nivel de referencia
+            ewma_alpha: Peso de cada residuo en la EWMA (0 < alpha < 1)
+            ewma_limit: Ancho de los límites de control de la EWMA, en sigmas
+            cusum_k: Holgura del CUSUM (desvío tolerado, en sigmas)
+            cusum_h: Umbral de alarma del CUSUM
+            min_periods: Lecturas mínimas en la ventana (por defecto window)
+        """
+        if not (0 < ewma_alpha < 1 and 0 < level_alpha < 1):
+            raise ValueError("ewma_alpha y level_alpha deben estar entre 0 y 1")
+        self.window = window
+        self.z_threshold = z_threshold
+        self.level_alpha = level_alpha
+        self.ewma_alpha = ewma_alpha
+        self.ewma_bound = ewma_limit * np.sqrt(ewma_alpha / (2 - ewma_alpha))
+        self.cusum_k = cusum_k
+        self.cusum_h = cusum_h
+        self.min_periods = max(min(min_periods or window, window), 2)
+
+        # Estado por sensor: columna `slot` de cada arreglo
+        self._slots: Dict[str, int] = {}
+        self._sheets: List[str] = []
+        self._buffer = np.full((window, 0), np.nan)     # últimas lecturas, alineadas abajo
+        self._count = np.zeros(0, dtype='int64')        # lecturas vistas
+        self._level = np.zeros(0)                       # nivel de referencia
+        self._ewma = np.zeros(0)
+        self._cusum = np.zeros((2, 0))                  # arriba, abajo
+        self._alarms = np.zeros((3, 0), dtype=bool)     # ewma, cusum arriba, cusum abajo
+
+    @property
+    def sensors(self) -> int:
+        return len(self._slots)
+
+    def update(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Procesa un lote de lecturas y devuelve los eventos detectados
+
+        Args:
+            df: Lecturas con sensor_id, timestamp (datetime o segundos desde
+                epoch), voltage y opcionalmente sheet_name
+
+        Returns:
+            DataFrame con ANOMALY_COLUMNS (timestamp como datetime64[s])
+        """
+        if df.empty:
+            return self._events([], None, None, None)
+
+        codes, sensor_ids = pd.factorize(df['sensor_id'], sort=False)
+        timestamps = df['timestamp']
+        if pd.api.types.is_datetime64_any_dtype(timestamps):
+            timestamps = timestamps.to_numpy(dtype='datetime64[s]').astype('int64')
+        else:
+            timestamps = timestamps.to_numpy(dtype='int64')
+        voltage = voltage_array(df['voltage'])
+
+        # Orden por sensor y tiempo (estable: los empates conservan el orden de llegada)
+        order = np.lexsort((timestamps, codes))
+        codes, timestamps, voltage = codes[order], timestamps[order], voltage[order]
+        if 'sheet_name' in df.columns:
+            first = np.unique(codes, return_index=True)[1]
+            sheets = df['sheet_name'].to_numpy(dtype=object)[order][first]
+        else:
+            sheets = [''] * len(sensor_ids)
+        counts = np.bincount(codes, minlength=len(sensor_ids))
+        return self._detect(sensor_ids, sheets, counts, timestamps, voltage)
+
+    def update_series(self, series: Dict[str, Dict[str, np.ndarray]],
+                      sheets: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+        """
+        Igual que update, con las lecturas ya separadas por sensor y ordenadas
+        por tiempo (el formato de SensorStore.get_series)
+
+        Args:
+            series: {sensor_id: {'timestamp': int64[n], 'voltage': float64[n]}}
+            sheets: Hoja de cada sensor (opcional)
+        """
+        series = {sensor_id: arrays for sensor_id, arrays in series.items() if len(arrays['voltage'])}
+        if not series:
+            return self._events([], None, None, None)
+        sensor_ids = pd.Index(list(series), dtype=object)
+        counts = np.fromiter((len(arrays['voltage']) for arrays in series.values()), dtype='int64',
+                             count=len(series))
+        timestamps = np.concatenate([arrays['timestamp'] for arrays in series.values()])
+        voltage = np.concatenate([arrays['voltage'] for arrays in series.values()])
+        sheet_names = [(sheets or {}).get(sensor_id, '') for sensor_id in sensor_ids]
+        return self._detect(sensor_ids, sheet_names, counts, timestamps, voltage)
+
+    def _detect(self, sensor_ids: pd.Index, sheets, counts: np.ndarray, timestamps: np.ndarray,
+                voltage: np.ndarray) -> pd.DataFrame:
+        """Detección sobre lecturas ordenadas por sensor y tiempo (counts lecturas por sensor)"""
+        slots = self._assign_slots(sensor_ids, sheets)
+
+        # Matriz (lectura × sensor): fila = posición de la lectura dentro de su sensor
+        codes = np.repeat(np.arange(len(sensor_ids)), counts)
+        rank = np.arange(len(codes)) - np.repeat(np.cumsum(counts) - counts, counts)
+        shape = (int(counts.max()), len(sensor_ids))
+        values = np.full(shape, np.nan)
+        values[rank, codes] = voltage
+        times = np.zeros(shape, dtype='int64')
+        times[rank, codes] = timestamps
+
+        z, window_mean, window_std = self._rolling_window(values, slots, counts)
+        level = self._reference_level(values, slots)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            residual = np.where(np.isnan(z), np.nan, (values - level) / window_std)
+        ewma = self._ewma_scores(residual, slots)
+        cusum_up, cusum_down = self._cusum_scores(residual, slots)
+
+        statistics = [(np.abs(ewma), self.ewma_bound), (cusum_up, self.cusum_h), (cusum_down, self.cusum_h)]
+        onsets = []
+        for i, (statistic, bound) in enumerate(statistics):
+            active = latch(statistic > bound, statistic < bound / 2, self._alarms[i, slots])
+            previous = np.vstack((self._alarms[i, slots][None, :], active[:-1]))
+            onsets.append(active & ~previous)
+            self._alarms[i, slots] = active[-1]
+
+        with np.errstate(invalid='ignore'):
+            spikes = np.abs(z) > self.z_threshold
+        detections = [
+            ('zscore', spikes, z, window_mean),
+            ('ewma', onsets[0], ewma, level),
+            ('cusum', onsets[1], cusum_up, level),
+            ('cusum', onsets[2], -cusum_down, level),
+        ]
+        return self._events(detections, sensor_ids, values, times)
+
+    def _assign_slots(self, sensor_ids: pd.Index, sheets) -> np.ndarray:
+        """Columna de estado de cada sensor del lote (agrega los sensores nuevos)"""
+        new = [(sensor_id, sheet) for sensor_id, sheet in zip(sensor_ids, sheets) if sensor_id not in self._slots]
+        if new:
+            for sensor_id, sheet in new:
+                self._slots[sensor_id] = len(self._slots)
+                self._sheets.append(sheet)
+            grow = len(new)
+            self._buffer = np.hstack((self._buffer, np.full((self.window, grow), np.nan)))
+            self._count = np.concatenate((self._count, np.zeros(grow, dtype='int64')))
+            self._level = np.concatenate((self._level, np.zeros(grow)))
+            self._ewma = np.concatenate((self._ewma, np.zeros(grow)))
+            self._cusum = np.hstack((self._cusum, np.zeros((2, grow))))
+            self._alarms = np.hstack((self._alarms, np.zeros((3, grow), dtype=bool)))
+        return np.fromiter((self._slots[sensor_id] for sensor_id in sensor_ids), dtype='int64',
+                           count=len(sensor_ids))
+
+    def _rolling_window(self, values: np.ndarray, slots: np.ndarray, counts: np.ndarray):
+        """z-score, media y desviación de las `window` lecturas anteriores de cada lectura"""
+        rows, window = values.shape[0], self.window
+        stacked = np.vstack((self._buffer[:, slots], values))
+        valid = ~np.isnan(stacked)
+
+        # Desvíos respecto de una lectura del propio sensor: las sumas
+        # acumuladas quedan chicas y la varianza no pierde precisión
+        reference = stacked[valid.argmax(axis=0), np.arange(stacked.shape[1])]
+        deviation = np.where(valid, stacked - reference, 0.0)
+
+        def window_sums(matrix):
+            cumulative = np.vstack((np.zeros((1, matrix.shape[1])), np.cumsum(matrix, axis=0)))
+            # Ventana de la fila i de values: filas [i, i + window) de stacked
+            return cumulative[window:window + rows] - cumulative[:rows]
+
+        n = window_sums(valid.astype('float64'))
+        total = window_sums(deviation)
+        total_sq = window_sums(deviation * deviation)
+        # Cambios de valor entre lecturas consecutivas dentro de la ventana
+        # (conteo entero, exacto): una ventana constante no tiene z-score
+        # aunque el redondeo de las sumas deje una varianza mínima
+        changed = np.vstack((np.zeros((1, stacked.shape[1]), dtype=bool),
+                             valid[1:] & valid[:-1] & (stacked[1:] != stacked[:-1])))
+        changes = window_sums(changed.astype('float64')) - changed[:rows]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / n
+            std = np.sqrt(np.maximum((total_sq - total * mean) / (n - 1), 0.0))
+            mean += reference
+            ready = (n >= self.min_periods) & ~np.isnan(values) & (changes > 0) & (std > 0)
+            z = np.where(ready, (values - mean) / std, np.nan)
+
+        # Nuevo buffer: las últimas `window` lecturas válidas de cada sensor
+        # (las del buffer anterior y las del lote son contiguas en stacked)
+        take = counts[None, :] + np.arange(window)[:, None]
+        self._buffer[:, slots] = stacked[take, np.arange(stacked.shape[1])]
+        return z, mean, std
+
+    def _reference_level(self, values: np.ndarray, slots: np.ndarray) -> np.ndarray:
+        """
+        Nivel de referencia de cada sensor antes de cada lectura
+
+        Media exponencial con peso max(level_alpha, 1/n) para la n-ésima
+        lectura: al principio es la media acumulada y después olvida
+        lentamente. La primera lectura válida de un sensor nuevo solo lo
+        inicializa (un sensor sin lecturas válidas sigue sin nivel).
+        """
+        valid = ~np.isnan(values)
+        count = self._count[slots] + np.cumsum(valid, axis=0)
+        first_valid = values[valid.argmax(axis=0), np.arange(values.shape[1])]
+        state = np.where(self._count[slots] == 0, first_valid, self._level[slots])
+
+        with np.errstate(divide='ignore'):
+            weight = np.where(valid & (count >= 2), np.maximum(self.level_alpha, 1.0 / count), 0.0)
+        level = linear_scan(1.0 - weight, np.where(valid, weight * values, 0.0), state)
+
+        self._count[slots] = count[-1]
+        self._level[slots] = level[-1]
+        return np.vstack((state[None, :], level[:-1]))
+
+    def _ewma_scores(self, residual: np.ndarray, slots: np.ndarray) -> np.ndarray:
+        """EWMA del residuo estandarizado (las filas sin residuo no la actualizan)"""
+        valid = ~np.isnan(residual)
+        ewma = linear_scan(np.where(valid, 1.0 - self.ewma_alpha, 1.0),
+                           np.where(valid, self.ewma_alpha * residual, 0.0), self._ewma[slots])
+        self._ewma[slots] = ewma[-1]
+        return ewma
+
+    def _cusum_scores(self, residual: np.ndarray, slots: np.ndarray):
+        """
+        CUSUM de dos lados: S_t = max(0, S_{t-1} + r_t - k)
+
+        Con C_t = S_0 + Σ (r_k - k), la recursión es S_t = C_t - min(0, min_{k≤t} C_k),
+        así que se resuelve con una suma y un mínimo acumulados.
+        """
+        valid = ~np.isnan(residual)
+        result = []
+        for side, sign in enumerate((1.0, -1.0)):
+            steps = np.where(valid, sign * residual - self.cusum_k, 0.0)
+            cumulative = self._cusum[side, slots] + np.cumsum(steps, axis=0)
+            scores = cumulative - np.minimum(np.minimum.accumulate(cumulative, axis=0), 0.0)
+            self._cusum[side, slots] = scores[-1]
+            result.append(scores)
+        return result
+
+    def _events(self, detections, sensor_ids, values, times) -> pd.DataFrame:
+        frames = []
+        for detector, mask, scores, baseline in detections:
+            rows, cols = np.nonzero(mask)
+            if len(rows) == 0:
+                continue
+            frames.append(pd.DataFrame({
+                'sensor_id': sensor_ids[cols].to_numpy(dtype=object),
+                'timestamp': times[rows, cols].astype('datetime64[s]'),
+                'detector': detector,
+                'sheet_name': [self._sheets[self._slots[sensor_id]] for sensor_id in sensor_ids[cols]],
+                'voltage': values[rows, cols],
+                'baseline': baseline[rows, cols],
+                'score': scores[rows, cols]
+            }))
+
+        if not frames:
+            return pd.DataFrame({col: pd.Series(dtype='datetime64[s]' if col == 'timestamp' else
+                                                'float64' if col in ('voltage', 'baseline', 'score') else str)
+                                 for col in ANOMALY_COLUMNS})
+        return pd.concat(frames, ignore_index=True).sort_values(['timestamp', 'sensor_id'], kind='stable',
+                                                                ignore_index=True)
+
+def latch(set_rows: np.ndarray, reset_rows: np.ndarray, state: np.ndarray) -> np.ndarray:
+    """
+    Alarma con histéresis por columnas: se activa en las filas de set_rows y
+    queda activa hasta la siguiente fila de reset_rows
+
+    Cada fila está activa si la última activación es posterior a la última
+    desactivación (máximos acumulados de los índices de fila).
+    """
+    rows = np.arange(1, len(set_rows) + 1)[:, None]
+    last_set = np.maximum.accumulate(np.where(set_rows, rows, 0), axis=0)
+    last_reset = np.maximum.accumulate(np.where(reset_rows, rows, 0), axis=0)
+    # Estado previo como fila 0: activa gana a una desactivación que no ocurrió
+    return (last_set > last_reset) | (state[None, :] & (last_reset == 0))
+
+def linear_scan(decay: np.ndarray, inputs: np.ndarray, state: np.ndarray) -> np.ndarray:
+    """
+    y_t = decay_t · y_{t-1} + inputs_t por columnas, sin recorrer filas en Python
+
+    Forma cerrada y_t = P_t · (y_0 + Σ inputs_k / P_k), con P_t el producto
+    acumulado de decay. Se resuelve en bloques de EWMA_BLOCK filas para que
+    P_t no llegue a cero; decay debe ser > 0.
+    """
+    result = np.empty_like(inputs)
+    for start in range(0, len(inputs), EWMA_BLOCK):
+        block = slice(start, start + EWMA_BLOCK)
+        product = np.cumprod(decay[block], axis=0)
+        result[block] = product * (state + np.cumsum(inputs[block] / product, axis=0))
+        state = result[block][-1]
+    return result
+
+def detect_anomalies(db_path: str, detector: Optional[AnomalyDetector] = None,
+                     sensors_per_batch: int = 200) -> Dict:
+    """
+    Detección en lote sobre todas las lecturas de la base
+
+    Lee las series con SensorStore (una búsqueda por sensor en el índice
+    (sensor_id, timestamp), directo a arreglos NumPy) en grupos de
+    sensors_per_batch sensores, así que la memoria queda acotada por el
+    grupo y no por la base. Reemplaza el contenido de la tabla anomalies.
+
+    Args:
+        db_path: Base SQLite con el esquema tipado o normalizado
+        detector: AnomalyDetector con los parámetros a usar (por defecto los estándar)
+        sensors_per_batch: Sensores por matriz
+
+    Returns:
+        Dict con lecturas procesadas, sensores, eventos por detector y segundos
+    """
+    detector = detector or AnomalyDetector()
+    start = time.perf_counter()
+    readings = 0
+    events = []
+    with SensorStore(db_path) as store:
+        sensor_ids = store.sensors()
+        sheets = store.sensor_sheets(sensor_ids)
+        for first in range(0, len(sensor_ids), sensors_per_batch):
+            series = store.get_series(sensor_ids[first:first + sensors_per_batch])
+            readings += sum(len(arrays['voltage']) for arrays in series.values())
+            events.append(detector.update_series(series, sheets))
+
+    events = pd.concat(events, ignore_index=True) if events else detector.update(pd.DataFrame())
+    DataLoader().save_anomalies(events, db_path, replace=True)
+
+    result = {
+        'readings': readings,
+        'sensors': detector.sensors,
+        'events': events['detector'].value_counts().to_dict(),
+        'seconds': time.perf_counter() - start
+    }
+    logger.info(f"🚨 Anomalías: {len(events)} eventos en {detector.sensors} sensores "
+                f"({readings} lecturas, {result['seconds']:.2f} s)")
+    return result
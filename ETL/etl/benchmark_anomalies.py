@@ -0,0 +1,90 @@
+# benchmark_anomalies.py
+import argparse
+import logging
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from anomalies import AnomalyDetector
+
+DETECTORS = ('zscore', 'ewma', 'cusum')
+KINDS = ('ruido', 'pico', 'escalón', 'deriva')
+
+def synthetic_readings(sensors: int, readings: int, seed: int = 0):
+    """
+    Lecturas N(100, 1) cada 5 minutos; a partir de la mitad de la serie cada
+    cuarto de los sensores recibe una anomalía distinta (ver KINDS)
+
+    Returns:
+        Tupla (DataFrame de lecturas, tipo de anomalía de cada sensor, fila de inicio)
+    """
+    rng = np.random.default_rng(seed)
+    onset = readings // 2
+    kind = np.arange(sensors) % len(KINDS)
+    values = rng.normal(100.0, 1.0, (readings, sensors))
+    values[onset, kind == 1] += 8.0
+    values[onset:, kind == 2] += 3.0
+    values[onset:, kind == 3] += np.arange(readings - onset)[:, None] * 0.01
+
+    timestamps = np.datetime64('2024-01-01T00:00:00') + np.arange(readings) * np.timedelta64(300, 's')
+    df = pd.DataFrame({
+        'sensor_id': np.tile([f"SYN_S{i}" for i in range(sensors)], readings),
+        'timestamp': np.repeat(timestamps, sensors),
+        'voltage': values.ravel(),
+        'sheet_name': 'SYN'
+    })
+    return df, kind, onset
+
+def run_batches(df: pd.DataFrame, batch_size: int):
+    """Eventos y segundos de procesar df en lotes de batch_size lecturas"""
+    detector = AnomalyDetector()
+    start = time.perf_counter()
+    events = [detector.update(df.iloc[i:i + batch_size]) for i in range(0, len(df), batch_size)]
+    return pd.concat(events, ignore_index=True), time.perf_counter() - start
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Sensibilidad y rendimiento de AnomalyDetector")
+    parser.add_argument('--sensors', type=int, default=400)
+    parser.add_argument('--readings', type=int, default=2000, help="Lecturas por sensor")
+    parser.add_argument('--batch-size', type=int, default=5000, help="Lecturas por micro-lote")
+    args = parser.parse_args()
+
+    df, kind, onset = synthetic_readings(args.sensors, args.readings)
+    events, batch_seconds = run_batches(df, len(df))
+    stream_events, stream_seconds = run_batches(df, args.batch_size)
+
+    # Un solo lote o muchos micro-lotes deben dar los mismos eventos
+    key = ['sensor_id', 'timestamp', 'detector']
+    merged = events[key].merge(stream_events[key], how='outer', indicator=True)
+    assert (merged['_merge'] == 'both').all() and len(events) == len(stream_events)
+
+    print(f"\n{args.sensors} sensores x {args.readings} lecturas = {len(df)} lecturas\n")
+    print(f"un lote:    {batch_seconds:7.3f} s ({len(df) / batch_seconds:12,.0f} lecturas/s)")
+    print(f"micro-lotes: {stream_seconds:6.3f} s ({len(df) / stream_seconds:12,.0f} lecturas/s, "
+          f"{args.batch_size} por lote)")
+
+    sensor = events['sensor_id'].str.rsplit('_S', n=1).str[1].astype(int).to_numpy()
+    row = ((events['timestamp'] - np.datetime64('2024-01-01T00:00:00')) // pd.Timedelta(seconds=300)).to_numpy()
+    events = events.assign(kind=kind[sensor], row=row)
+
+    # Falsas alarmas: eventos antes del inicio (todos los sensores) y en los sensores de ruido
+    clean_rows = (onset * args.sensors + (args.readings - onset) * (kind == 0).sum()) / 1000
+    print(f"\n{'detector':<10} {'falsas/1000 lect.':>18} " + " ".join(f"{k + ' (retardo)':>20}" for k in KINDS[1:]))
+    for detector in DETECTORS:
+        found = events[events['detector'] == detector]
+        false_alarms = ((found['row'] < onset) | (found['kind'] == 0)).sum()
+        cells = []
+        for k in range(1, len(KINDS)):
+            hits = found[(found['kind'] == k) & (found['row'] >= onset)]
+            delay = (hits.groupby('sensor_id')['row'].min() - onset)
+            recall = len(delay) / (kind == k).sum()
+            median = f"{delay.median():.0f}" if len(delay) else '-'
+            cells.append(f"{recall:12.0%} ({median:>5})")
+        print(f"{detector:<10} {false_alarms / clean_rows:18.3f} " + " ".join(f"{c:>20}" for c in cells))
+    return 0
+
+if __name__ == "__main__":
+    logging.disable(logging.CRITICAL)
+    sys.exit(main())
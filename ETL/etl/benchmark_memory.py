@@ -0,0 +1,94 @@
+# benchmark_memory.py
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from collections import defaultdict
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from extract import DataExtractor
+from Transform import DataTransformer
+from instrumentation import PipelineMetrics
+from synthetic_data import generate_workbook
+
+def frame_mb(transformed_data: Dict) -> float:
+    """Memoria (deep) de todas las lecturas transformadas, en MB"""
+    return sum(data['data'].memory_usage(deep=True).sum() for data in transformed_data.values()) / (1024 * 1024)
+
+def stage_peaks(metrics: PipelineMetrics) -> Dict[str, float]:
+    """Pico de memoria asignada por paso de transformación (máximo entre hojas), en MB"""
+    peaks = defaultdict(float)
+    for record in metrics.stages:
+        parts = record['name'].split('/')
+        if parts[0] == 'transform' and len(parts) == 3:
+            peaks[parts[2]] = max(peaks[parts[2]], record.get('alloc_peak_mb', 0.0))
+        elif record['name'] == 'transform/cross_sheet':
+            peaks['cross_sheet'] = record.get('alloc_peak_mb', 0.0)
+    return dict(peaks)
+
+def run(raw_data: Dict, compact: bool):
+    metrics = PipelineMetrics(trace_memory=True)
+    metrics.start()
+    transformer = DataTransformer(metrics=metrics, compact=compact)
+    transformed_data = transformer.transform_sensor_data(raw_data)
+    metrics.write(os.devnull)
+    return transformer, transformed_data, stage_peaks(metrics)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Memoria de las lecturas transformadas con y sin modo compacto")
+    parser.add_argument('--workbook', help="Libro a usar (por defecto uno sintético)")
+    parser.add_argument('--sheets', type=int, default=17)
+    parser.add_argument('--sensors', type=int, default=60, help="Sensores por hoja")
+    parser.add_argument('--readings', type=int, default=1000, help="Lecturas por sensor")
+    args = parser.parse_args()
+
+    work_dir = None
+    workbook = args.workbook
+    if workbook is None:
+        work_dir = tempfile.mkdtemp(prefix='etl-memory-')
+        workbook = os.path.join(work_dir, 'memory.xlsx')
+        generate_workbook(workbook, sheets=args.sheets, sensors=args.sensors, readings=args.readings)
+
+    try:
+        raw_data = DataExtractor().extract_from_excel(workbook)
+        standard, standard_data, standard_peaks = run(raw_data, compact=False)
+        compact, compact_data, compact_peaks = run(raw_data, compact=True)
+    finally:
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    # Los resultados deben ser los mismos en ambos modos
+    for sheet_name, data in standard_data.items():
+        expected = pd.DataFrame.from_dict(data['statistics'], orient='index')
+        actual = pd.DataFrame.from_dict(compact_data[sheet_name]['statistics'], orient='index')
+        assert expected.equals(actual), sheet_name
+        assert data['quality_metrics'] == compact_data[sheet_name]['quality_metrics'], sheet_name
+    assert standard.analysis_results == compact.analysis_results
+
+    readings = sum(len(data['data']) for data in standard_data.values())
+    print(f"\n{workbook if args.workbook else 'libro sintético'}: {readings} lecturas\n")
+
+    sample = next(data['data'] for data in compact_data.values() if not data['data'].empty)
+    print("Tipos compactos: " + ", ".join(f"{col}={dtype}" for col, dtype in sample.dtypes.items()))
+    float64_sheets = [name for name, data in compact_data.items()
+                      if not data['data'].empty and data['data']['voltage'].dtype == np.float64]
+    if float64_sheets:
+        print(f"Hojas que conservan voltage float64: {float64_sheets}")
+
+    before, after = frame_mb(standard_data), frame_mb(compact_data)
+    print(f"\n{'etapa':<28} {'estándar':>10} {'compacto':>10} {'reducción':>10}")
+    print(f"{'lecturas estructuradas':<28} {before:8.2f}MB {after:8.2f}MB {before / after:9.1f}x")
+    for stage in ('clean', 'structure', 'statistics', 'quality', 'cross_sheet'):
+        base, small = standard_peaks.get(stage, 0.0), compact_peaks.get(stage, 0.0)
+        ratio = f"{base / small:9.1f}x" if small else f"{'-':>10}"
+        print(f"{'pico ' + stage:<28} {base:8.2f}MB {small:8.2f}MB {ratio}")
+    return 0
+
+if __name__ == "__main__":
+    logging.disable(logging.CRITICAL)
+    sys.exit(main())
@@ -0,0 +1,106 @@
+# benchmark_online_stats.py
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from extract import DataExtractor
+from Transform import DataTransformer
+from online_stats import StatisticsAccumulator, STATISTICS_COLUMNS
+
+DEFAULT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'BD_SENSORES.xlsx')
+
+def max_errors(exact: pd.DataFrame, online: pd.DataFrame) -> dict:
+    """Máximo error absoluto por columna (NaN en ambos lados cuenta como igual)"""
+    errors = {}
+    for col in STATISTICS_COLUMNS:
+        a = exact[col].to_numpy(dtype='float64')
+        b = online.loc[exact.index, col].to_numpy(dtype='float64')
+        diff = np.abs(a - b)
+        diff[np.isnan(a) & np.isnan(b)] = 0.0
+        errors[col] = float(np.nanmax(diff)) if len(diff) else 0.0
+    return errors
+
+# Cotas que se verifican con assert.
+# En el libro cada sensor tiene menos lecturas que el buffer del digest, así
+# que todo debe coincidir con pandas salvo redondeo.
+WORKBOOK_TOLERANCE = 1e-9
+# Serie sintética: error de rango de los cuartiles por debajo de 1 / compresión
+# y, desde la compresión por defecto, error relativo de outliers menor a 2%
+OUTLIER_TOLERANCE = 0.02
+OUTLIER_MIN_COMPRESSION = 200
+
+def check_workbook(file_path: str, chunk_size: int = 1000):
+    """Estadísticas exactas vs acumuladores combinados por fragmentos sobre el libro real"""
+    raw_data = DataExtractor().extract_from_excel(file_path)
+    transformer = DataTransformer()
+    transformer.transform_sensor_data(raw_data)
+
+    frames = [data['data'] for data in transformer.transformed_data.values() if not data['data'].empty]
+    readings = pd.concat(frames, ignore_index=True)
+    exact = transformer._grouped_statistics(readings['sensor_id'], readings['voltage'])
+
+    # Un acumulador por fragmento, combinados al final (como harían los procesos)
+    start = time.perf_counter()
+    total = StatisticsAccumulator()
+    for offset in range(0, len(readings), chunk_size):
+        partial = StatisticsAccumulator()
+        partial.update_frame(readings.iloc[offset:offset + chunk_size])
+        total.merge(partial)
+    online = total.to_frame()
+    elapsed = time.perf_counter() - start
+
+    errors = max_errors(exact, online)
+    print(f"Libro: {len(readings)} lecturas, {len(exact)} sensores, fragmentos de {chunk_size}")
+    print(f"  Acumuladores: {elapsed * 1000:.1f} ms, {total.nbytes / 1024:.1f} KB de estado")
+    print("  Error máximo vs pandas: " + ", ".join(f"{col}={err:.2e}" for col, err in errors.items()))
+    worst = max(errors, key=errors.get)
+    assert errors[worst] <= WORKBOOK_TOLERANCE, f"{worst}: error {errors[worst]:.2e} vs pandas"
+
+def accuracy_vs_memory(n: int = 1_000_000, chunks: int = 100, seed: int = 7):
+    """Error de cuantiles y outliers vs memoria del digest para una serie grande"""
+    rng = np.random.default_rng(seed)
+    values = np.concatenate((rng.lognormal(0.5, 0.4, n - n // 100), rng.uniform(10, 50, n // 100)))
+    rng.shuffle(values)
+    series = pd.Series(values)
+    keys = pd.Series(np.zeros(n, dtype='int64'))
+
+    exact = DataTransformer()._grouped_statistics(keys, series).iloc[0]
+    sorted_values = np.sort(values)
+
+    print(f"\nSerie sintética: {n} valores en {chunks} fragmentos combinados")
+    print(f"  {'compresión':>10} {'KB':>8} {'centroides':>10} {'err. rango q25/q50/q75':>24} "
+          f"{'err. outliers':>14} {'ms':>8}")
+    for compression in (50, 100, 200, 400):
+        start = time.perf_counter()
+        total = StatisticsAccumulator(compression)
+        for chunk in np.array_split(np.arange(n), chunks):
+            partial = StatisticsAccumulator(compression)
+            partial.update(keys.iloc[chunk[0]:chunk[-1] + 1], series.iloc[chunk[0]:chunk[-1] + 1])
+            total.merge(partial)
+        online = total.to_frame().iloc[0]
+        elapsed = time.perf_counter() - start
+
+        # Error de rango: distancia (en fracción de n) entre el rango real del cuantil estimado y q
+        rank_errors = [
+            abs(np.searchsorted(sorted_values, online[col]) / n - q)
+            for col, q in (('q25', 0.25), ('median', 0.5), ('q75', 0.75))
+        ]
+        outlier_error = abs(online['outliers_count'] - exact['outliers_count']) / max(exact['outliers_count'], 1)
+        digest = total.sensors[0].digest
+        print(f"  {compression:>10} {total.nbytes / 1024:>8.1f} {len(digest.means):>10} "
+              f"{max(rank_errors):>24.2e} {outlier_error:>14.2%} {elapsed * 1000:>8.1f}")
+        assert max(rank_errors) <= 1 / compression, f"compresión {compression}: error de rango {max(rank_errors):.2e}"
+        if compression >= OUTLIER_MIN_COMPRESSION:
+            assert outlier_error <= OUTLIER_TOLERANCE, f"compresión {compression}: error de outliers {outlier_error:.2%}"
+
+    print(f"  Referencia exacta: {values.nbytes / 1024:.1f} KB de valores en memoria")
+
+if __name__ == "__main__":
+    logging.disable(logging.CRITICAL)
+    file_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_FILE
+    check_workbook(file_path)
+    accuracy_vs_memory()
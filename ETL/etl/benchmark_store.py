@@ -0,0 +1,134 @@
+# benchmark_store.py
+import argparse
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from extract import DataExtractor
+from Transform import DataTransformer
+from load import DataLoader
+from sensor_store import SensorStore
+from synthetic_data import generate_workbook
+
+def latencies(func: Callable, repeat: int) -> np.ndarray:
+    """Latencia de cada una de `repeat` ejecuciones, en milisegundos"""
+    times = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        times[i] = (time.perf_counter() - start) * 1000
+    return times
+
+def build_database(db_path: str, sheets: int, sensors: int, readings: int, normalized: bool):
+    """Carga un libro sintético con el pipeline (esquema tipado o normalizado)"""
+    workbook = os.path.join(os.path.dirname(db_path), 'store.xlsx')
+    generate_workbook(workbook, sheets=sheets, sensors=sensors, readings=readings)
+    raw_data = DataExtractor().extract_from_excel(workbook)
+    transformed_data = DataTransformer().transform_sensor_data(raw_data)
+    DataLoader().bulk_load_to_sqlite(transformed_data, db_path, normalized=normalized)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Latencia de SensorStore frente a pd.read_sql")
+    parser.add_argument('--db', help="Base existente (por defecto se genera una sintética)")
+    parser.add_argument('--sheets', type=int, default=17)
+    parser.add_argument('--sensors', type=int, default=60, help="Sensores por hoja")
+    parser.add_argument('--readings', type=int, default=1000, help="Lecturas por sensor")
+    parser.add_argument('--normalized', action='store_true', help="Generar la base con el esquema normalizado")
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--multi', type=int, default=20, help="Sensores en la consulta multi-sensor")
+    args = parser.parse_args()
+
+    work_dir = None
+    db_path = args.db
+    if db_path is None:
+        work_dir = tempfile.mkdtemp(prefix='etl-store-')
+        db_path = os.path.join(work_dir, 'store.db')
+        print(f"Generando base sintética ({args.sheets} hojas x {args.sensors} sensores x {args.readings} lecturas)...")
+        build_database(db_path, args.sheets, args.sensors, args.readings, args.normalized)
+
+    try:
+        store = SensorStore(db_path)
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+
+        sensors = store.sensors()
+        rng = np.random.default_rng(0)
+        point_sensor = sensors[len(sensors) // 2]
+        multi_sensors = list(rng.choice(sensors, size=min(args.multi, len(sensors)), replace=False))
+        sheet = conn.execute('SELECT sheet_name FROM quality_metrics ORDER BY sheet_name LIMIT 1').fetchone()[0]
+
+        first, last = conn.execute('SELECT MIN("timestamp"), MAX("timestamp") FROM sensor_readings '
+                                   'WHERE sensor_id = ?', (point_sensor,)).fetchone()
+        # Un día en el medio de la serie
+        range_start = first + (last - first) // 2
+        range_end = range_start + 86400
+
+        def read_sql_series(sensor_ids, start=None, end=None):
+            sql = 'SELECT "timestamp", voltage FROM sensor_readings WHERE sensor_id = ?'
+            params = []
+            if start is not None:
+                sql += ' AND "timestamp" >= ? AND "timestamp" < ?'
+                params = [start, end]
+            sql += ' ORDER BY "timestamp"'
+            return {sensor_id: pd.read_sql(sql, conn, params=[sensor_id] + params) for sensor_id in sensor_ids}
+
+        cases = [
+            ('punto (latest, 1 sensor)',
+             lambda: store.latest([point_sensor]),
+             lambda: pd.read_sql('SELECT sensor_id, "timestamp", voltage FROM sensor_readings WHERE sensor_id = ? '
+                                 'ORDER BY "timestamp" DESC LIMIT 1', conn, params=[point_sensor])),
+            ('rango (1 sensor, 1 día)',
+             lambda: store.get_series([point_sensor], range_start, range_end),
+             lambda: read_sql_series([point_sensor], range_start, range_end)),
+            (f"multi-sensor ({len(multi_sensors)} sensores completos)",
+             lambda: store.get_series(multi_sensors),
+             lambda: read_sql_series(multi_sensors)),
+            (f"multi-sensor horario ({len(multi_sensors)} sensores)",
+             lambda: store.get_series(multi_sensors, first - first % 3600, last - last % 3600 + 3600, 3600),
+             None),
+            ('latest (todos los sensores)',
+             lambda: store.latest(),
+             lambda: pd.read_sql('SELECT sensor_id, MAX("timestamp"), voltage FROM sensor_readings '
+                                 'GROUP BY sensor_id', conn)),
+            (f"scan_sheet ({sheet})",
+             lambda: sum(len(block['voltage']) for block in store.scan_sheet(sheet)),
+             lambda: pd.read_sql('SELECT sensor_number, "timestamp", voltage FROM sensor_readings '
+                                 'WHERE sheet_name = ?', conn, params=[sheet])),
+        ]
+
+        # Los resultados de ambos caminos deben coincidir
+        expected = read_sql_series(multi_sensors)
+        for sensor_id, series in store.get_series(multi_sensors).items():
+            assert np.array_equal(series['timestamp'], expected[sensor_id]['timestamp'].to_numpy())
+            assert np.array_equal(series['voltage'], expected[sensor_id]['voltage'].to_numpy())
+
+        total = conn.execute('SELECT COUNT(*) FROM sensor_readings').fetchone()[0]
+        print(f"\n{db_path}: {total} lecturas, {len(sensors)} sensores, {args.repeat} repeticiones\n")
+        print(f"{'consulta':<38} {'store p50':>10} {'store p95':>10} {'read_sql p50':>13} {'speedup':>8}")
+        for name, store_query, pandas_query in cases:
+            store_times = latencies(store_query, args.repeat)
+            line = (f"{name:<38} {np.percentile(store_times, 50):8.2f}ms "
+                    f"{np.percentile(store_times, 95):8.2f}ms")
+            if pandas_query is not None:
+                pandas_times = latencies(pandas_query, args.repeat)
+                line += (f" {np.percentile(pandas_times, 50):11.2f}ms "
+                         f"{np.percentile(pandas_times, 50) / np.percentile(store_times, 50):7.1f}x")
+            print(line)
+
+        conn.close()
+        store.close()
+    finally:
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return 0
+
+if __name__ == "__main__":
+    logging.disable(logging.CRITICAL)
+    sys.exit(main())
@@ -0,0 +1,198 @@
+# benchmark_suite.py
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict
+
+import numpy as np
+import pandas as pd
+
+from extract import DataExtractor
+from Transform import DataTransformer
+from load import DataLoader
+from columnar import ColumnarDataset
+from synthetic_data import generate_workbook
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+# Tamaños de libro: hojas x sensores por hoja x lecturas por sensor
+TIERS = {
+    'small': {'sheets': 4, 'sensors': 20, 'readings': 50},
+    'medium': {'sheets': 17, 'sensors': 60, 'readings': 300},
+    'large': {'sheets': 17, 'sensors': 60, 'readings': 2000},
+}
+
+def best_time(func: Callable, repeat: int) -> float:
+    """Mejor tiempo de pared de `repeat` ejecuciones"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run_tier(name: str, params: Dict, work_dir: str, repeat: int, noise: float, outlier_rate: float) -> Dict:
+    """Genera el libro del tier y mide cada etapa por separado"""
+    workbook = os.path.join(work_dir, f"{name}.xlsx")
+    generate_workbook(workbook, noise=noise, outlier_rate=outlier_rate, **params)
+
+    timings = {}
+    extractor = DataExtractor()
+
+    # Extracción (sin caché de hojas)
+    timings['extract'] = best_time(lambda: extractor.extract_from_excel(workbook), repeat)
+    timings['extract_streaming'] = best_time(lambda: extractor.extract_from_excel(workbook, streaming=True), repeat)
+    raw_data = extractor.extract_from_excel(workbook)
+
+    # Transformación, etapa por etapa sobre todas las hojas
+    transformer = DataTransformer()
+    cleaned = {sheet: transformer._clean_data(data['data'], sheet) for sheet, data in raw_data.items()}
+    structured = {sheet: transformer._structure_sensor_data(df, sheet) for sheet, df in cleaned.items()}
+
+    timings['transform_clean'] = best_time(
+        lambda: [transformer._clean_data(data['data'], sheet) for sheet, data in raw_data.items()], repeat)
+    timings['transform_structure'] = best_time(
+        lambda: [transformer._structure_sensor_data(df, sheet) for sheet, df in cleaned.items()], repeat)
+    timings['transform_statistics'] = best_time(
+        lambda: [transformer._calculate_statistics(df) for df in structured.values()], repeat)
+    timings['transform_quality'] = best_time(
+        lambda: [transformer._calculate_quality_metrics(df) for df in structured.values()], repeat)
+
+    transformed_data = transformer.transform_sensor_data(raw_data)
+    timings['transform_cross_sheet'] = best_time(transformer.finalize_transformation, repeat)
+
+    # Carga, cada destino en una base/carpeta nueva
+    loader = DataLoader()
+    targets = {
+        'load_bulk_sqlite': lambda path: loader.bulk_load_to_sqlite(transformed_data, path + '.db'),
+        'load_normalized_sqlite': lambda path: loader.bulk_load_to_sqlite(transformed_data, path + '.db',
+                                                                          normalized=True),
+        'load_to_sql': lambda path: loader.load_to_sqlite(transformed_data, path + '.db'),
+        'load_csv': lambda path: loader.load_to_csv(transformed_data, path),
+        'load_columnar': lambda path: loader.load_to_columnar(transformed_data, path),
+    }
+    for target, load in targets.items():
+        counter = iter(range(repeat))
+        timings[target] = best_time(lambda: load(os.path.join(work_dir, f"{name}-{target}-{next(counter)}")), repeat)
+    
+    # Lectura de una sola columna desde cada exportación
+    csv_dir = os.path.join(work_dir, f"{name}-load_csv-0")
+    dataset = ColumnarDataset(os.path.join(work_dir, f"{name}-load_columnar-0"))
+    timings['read_csv_voltage'] = best_time(
+        lambda: [pd.read_csv(os.path.join(csv_dir, f), usecols=['voltage']) for f in os.listdir(csv_dir)], repeat)
+    timings['read_columnar_voltage'] = best_time(lambda: dataset.read(['voltage']), repeat)
+
+    readings = sum(len(data['data']) for data in transformed_data.values())
+    logging.getLogger(__name__).debug(f"{name}: {readings} lecturas")
+    return {'params': params, 'readings': readings, 'seconds': timings}
+
+def compare(results: Dict, baseline: Dict, threshold: float, min_seconds: float) -> list:
+    """Etapas cuyo tiempo supera al de la línea base en más de `threshold`"""
+    regressions = []
+    for tier, result in results['tiers'].items():
+        base_tier = baseline.get('tiers', {}).get(tier)
+        if not base_tier or base_tier.get('params') != result['params']:
+            continue
+        for stage, seconds in result['seconds'].items():
+            base_seconds = base_tier['seconds'].get(stage)
+            if base_seconds is None:
+                continue
+            # Ignorar diferencias absolutas muy chicas (ruido de medición)
+            if seconds > base_seconds * (1 + threshold) and seconds - base_seconds > min_seconds:
+                regressions.append((tier, stage, base_seconds, seconds))
+    return regressions
+
+def print_results(results: Dict, baseline: Dict):
+    for tier, result in results['tiers'].items():
+        base_tier = baseline.get('tiers', {}).get(tier, {}) if baseline else {}
+        print(f"\n[{tier}] {result['params']} -> {result['readings']} lecturas")
+        for stage, seconds in result['seconds'].items():
+            line = f"  {stage:<24} {seconds * 1000:10.1f} ms"
+            base_seconds = base_tier.get('seconds', {}).get(stage)
+            if base_seconds:
+                line += f"   ({seconds / base_seconds:5.2f}x vs línea base)"
+            print(line)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark por etapas del pipeline ETL sobre libros sintéticos")
+    parser.add_argument('--tiers', default='small,medium', help=f"Tiers a ejecutar ({', '.join(TIERS)})")
+    parser.add_argument('--repeat', type=int, default=3, help="Repeticiones por etapa (se toma la mejor)")
+    parser.add_argument('--noise', type=float, default=0.02, help="Fracción de celdas con formato problemático")
+    parser.add_argument('--outlier-rate', type=float, default=0.01, help="Fracción de lecturas fuera de rango")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Archivo JSON de línea base")
+    parser.add_argument('--save-baseline', action='store_true', help="Guardar los resultados como nueva línea base")
+    parser.add_argument('--output', help="Guardar también los resultados de esta ejecución en un JSON")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="Regresión permitida por etapa antes de fallar (0.25 = +25%%)")
+    parser.add_argument('--min-seconds', type=float, default=0.005,
+                        help="Diferencia absoluta mínima para considerar una regresión")
+    args = parser.parse_args()
+
+    tiers = [tier.strip() for tier in args.tiers.split(',') if tier.strip()]
+    unknown = [tier for tier in tiers if tier not in TIERS]
+    if unknown:
+        parser.error(f"tiers desconocidos: {unknown}")
+
+    results = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+        },
+        'settings': {'repeat': args.repeat, 'noise': args.noise, 'outlier_rate': args.outlier_rate},
+        'tiers': {}
+    }
+
+    work_dir = tempfile.mkdtemp(prefix='etl-bench-')
+    try:
+        for tier in tiers:
+            results['tiers'][tier] = run_tier(tier, TIERS[tier], work_dir, args.repeat,
+                                              args.noise, args.outlier_rate)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Línea base guardada en {args.baseline}")
+        return 0
+
+    if not baseline:
+        print(f"\nSin línea base en {args.baseline}; use --save-baseline para crearla")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold, args.min_seconds)
+    if regressions:
+        print(f"\n❌ {len(regressions)} etapas con regresión mayor a {args.threshold:.0%}:")
+        for tier, stage, base_seconds, seconds in regressions:
+            print(f"  [{tier}] {stage}: {base_seconds * 1000:.1f} ms -> {seconds * 1000:.1f} ms "
+                  f"({seconds / base_seconds:.2f}x)")
+        return 1
+
+    print(f"\n✅ Sin regresiones respecto a la línea base (umbral {args.threshold:.0%})")
+    return 0
+
+if __name__ == "__main__":
+    logging.disable(logging.CRITICAL)
+    sys.exit(main())
@@ -0,0 +1,55 @@
+# benchmark_transform.py
+import logging
+import os
+import sys
+import time
+
+import pandas as pd
+
+from extract import DataExtractor
+from Transform import DataTransformer
+
+DEFAULT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'BD_SENSORES.xlsx')
+
+def time_structure(transformer: DataTransformer, cleaned: dict, repeat: int = 3) -> tuple:
+    """Mide el mejor tiempo de _structure_sensor_data sobre todas las hojas"""
+    best = float('inf')
+    results = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = {
+            sheet_name: transformer._structure_sensor_data(df, sheet_name)
+            for sheet_name, df in cleaned.items()
+        }
+        best = min(best, time.perf_counter() - start)
+    return best, results
+
+def run_benchmark(file_path: str, repeat: int = 3):
+    extractor = DataExtractor()
+    raw_data = extractor.extract_from_excel(file_path)
+
+    legacy = DataTransformer(vectorized=False)
+    vectorized = DataTransformer(vectorized=True)
+
+    cleaned = {
+        sheet_name: legacy._clean_data(sheet_data['data'])
+        for sheet_name, sheet_data in raw_data.items()
+    }
+
+    legacy_time, legacy_results = time_structure(legacy, cleaned, repeat)
+    vectorized_time, vectorized_results = time_structure(vectorized, cleaned, repeat)
+
+    # Ambos motores deben producir exactamente los mismos registros
+    for sheet_name in cleaned:
+        pd.testing.assert_frame_equal(legacy_results[sheet_name], vectorized_results[sheet_name])
+
+    total_rows = sum(len(df) for df in vectorized_results.values())
+    print(f"Hojas: {len(cleaned)} | Registros: {total_rows}")
+    print(f"  Fila por fila (iterrows): {legacy_time * 1000:8.1f} ms")
+    print(f"  Vectorizado:              {vectorized_time * 1000:8.1f} ms")
+    print(f"  Speedup:                  {legacy_time / vectorized_time:8.1f}x")
+
+if __name__ == "__main__":
+    logging.disable(logging.CRITICAL)
+    file_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_FILE
+    run_benchmark(file_path)
@@ -0,0 +1,238 @@
+# cache.py
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Tipo de cada celda dentro del bundle
+CELL_EMPTY = 0
+CELL_FLOAT = 1
+CELL_INT = 2
+CELL_TEXT = 3
+
+class SheetCache:
+    """
+    Caché en disco de hojas extraídas, direccionada por contenido.
+
+    Cada hoja se guarda como un bundle de arreglos NumPy (.npy), en orden
+    de columnas, en <cache_dir>/<hash del libro y modo>/<hoja>/:
+
+        kind.npy     uint8 con el tipo de cada celda (vacía, float, int, texto)
+        numeric.npy  float64 con los valores numéricos
+        text.npy     unicode de ancho fijo con los valores de texto
+        meta.json    columnas y dtypes originales
+
+    Los .npy se abren con mmap_mode='r', así que una hoja sin cambios se
+    carga sin volver a parsear el XLSX y sus columnas float64 se leen
+    directo del archivo mapeado. El tamaño total se limita con una
+    política LRU (la fecha de modificación de meta.json marca el último uso).
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def file_hash(file_path: str, mode: str = '') -> str:
+        """
+        SHA-256 del contenido del archivo y del modo de extracción
+
+        pandas y openpyxl en modo read-only no devuelven exactamente las mismas
+        celdas (tipos, filas vacías al final), así que cada modo tiene su
+        propia entrada.
+        """
+        digest = hashlib.sha256(mode.encode('utf-8'))
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _workbook_dir(self, file_hash: str) -> str:
+        return os.path.join(self.cache_dir, file_hash)
+
+    def _sheet_dir(self, file_hash: str, sheet_name: str) -> str:
+        # Nombre de carpeta seguro y sin colisiones entre hojas parecidas
+        safe_name = re.sub(r'[^\w.-]', '_', sheet_name)
+        suffix = hashlib.sha1(sheet_name.encode('utf-8')).hexdigest()[:8]
+        return os.path.join(self._workbook_dir(file_hash), f"{safe_name}-{suffix}")
+
+    def get_sheet_names(self, file_hash: str) -> Optional[List[str]]:
+        """Lista de hojas guardada para el libro, o None si no está en caché"""
+        path = os.path.join(self._workbook_dir(file_hash), 'sheets.json')
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put_sheet_names(self, file_hash: str, sheet_names: List[str]):
+        """Guarda la lista de hojas del libro"""
+        os.makedirs(self._workbook_dir(file_hash), exist_ok=True)
+        path = os.path.join(self._workbook_dir(file_hash), 'sheets.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(sheet_names, f)
+
+    def contains(self, file_hash: str, sheet_name: str) -> bool:
+        """Indica si la hoja tiene una entrada completa en la caché (sin cargarla)"""
+        return os.path.exists(os.path.join(self._sheet_dir(file_hash, sheet_name), 'meta.json'))
+
+    def get(self, file_hash: str, sheet_name: str) -> Optional[pd.DataFrame]:
+        """Devuelve la hoja desde la caché o None si no existe"""
+        sheet_dir = self._sheet_dir(file_hash, sheet_name)
+        meta_path = os.path.join(sheet_dir, 'meta.json')
+
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            kind = np.load(os.path.join(sheet_dir, 'kind.npy'), mmap_mode='r')
+            numeric = np.load(os.path.join(sheet_dir, 'numeric.npy'), mmap_mode='r')
+            text = np.load(os.path.join(sheet_dir, 'text.npy'), mmap_mode='r')
+        except (OSError, ValueError) as e:
+            logger.debug(f"Entrada de caché no disponible para {sheet_name}: {e}")
+            return None
+
+        # Marcar como usada recientemente (LRU)
+        os.utime(meta_path)
+
+        return self._decode(kind, numeric, text, meta)
+
+    def put(self, file_hash: str, sheet_name: str, df: pd.DataFrame) -> bool:
+        """
+        Guarda la hoja en la caché.
+
+        Returns:
+            False si la hoja contiene tipos de celda que el bundle no soporta
+        """
+        encoded = self._encode(df)
+        if encoded is None:
+            logger.debug(f"{sheet_name}: tipos de celda no soportados, no se guarda en caché")
+            return False
+
+        kind, numeric, text, meta = encoded
+        sheet_dir = self._sheet_dir(file_hash, sheet_name)
+        os.makedirs(sheet_dir, exist_ok=True)
+
+        np.save(os.path.join(sheet_dir, 'kind.npy'), kind)
+        np.save(os.path.join(sheet_dir, 'numeric.npy'), numeric)
+        np.save(os.path.join(sheet_dir, 'text.npy'), text)
+        # meta.json se escribe al final: su presencia marca la entrada como completa
+        with open(os.path.join(sheet_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+        self.evict()
+        return True
+
+    def evict(self):
+        """Elimina las hojas usadas hace más tiempo hasta respetar max_bytes"""
+        entries = []
+        total = 0
+        for workbook in os.listdir(self.cache_dir):
+            workbook_dir = os.path.join(self.cache_dir, workbook)
+            if not os.path.isdir(workbook_dir):
+                continue
+            for sheet in os.listdir(workbook_dir):
+                sheet_dir = os.path.join(workbook_dir, sheet)
+                if not os.path.isdir(sheet_dir):
+                    continue
+                size = sum(entry.stat().st_size for entry in os.scandir(sheet_dir) if entry.is_file())
+                meta_path = os.path.join(sheet_dir, 'meta.json')
+                last_used = os.path.getmtime(meta_path) if os.path.exists(meta_path) else 0
+                entries.append((last_used, size, sheet_dir))
+                total += size
+
+        for last_used, size, sheet_dir in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(sheet_dir, ignore_errors=True)
+            total -= size
+            logger.info(f"Caché: eliminada {sheet_dir} ({size} bytes)")
+
+    def _encode(self, df: pd.DataFrame):
+        """Convierte el DataFrame en los arreglos del bundle, columna por columna"""
+        # Orden de columnas (Fortran): al abrir con mmap cada columna es un
+        # tramo contiguo del archivo y se puede usar sin copiarla
+        kind = np.zeros(df.shape, dtype='uint8', order='F')
+        numeric = np.full(df.shape, np.nan, order='F')
+        text = np.full(df.shape, '', dtype=object, order='F')
+
+        for j, (_, column) in enumerate(df.items()):
+            if pd.api.types.is_bool_dtype(column.dtype):
+                return None
+            if pd.api.types.is_numeric_dtype(column.dtype):
+                values = column.to_numpy(dtype='float64', na_value=np.nan)
+                cell = CELL_INT if pd.api.types.is_integer_dtype(column.dtype) else CELL_FLOAT
+                kind[:, j] = np.where(np.isnan(values), CELL_EMPTY, cell)
+                numeric[:, j] = values
+                continue
+
+            # Columnas object/texto: se clasifica cada tipo distinto una sola vez
+            # y las máscaras salen de los códigos de tipo de cada celda
+            values = column.to_numpy(dtype=object)
+            codes, cell_types = pd.factorize(pd.Series([type(value) for value in values], dtype=object))
+            cell_kinds = [_cell_kind(cell_type) for cell_type in cell_types]
+            if None in cell_kinds:
+                return None
+            column_kind = np.asarray(cell_kinds, dtype='uint8')[codes] if len(values) else kind[:, j]
+
+            is_numeric = (column_kind == CELL_FLOAT) | (column_kind == CELL_INT)
+            numeric[is_numeric, j] = values[is_numeric].astype('float64')
+            column_kind[is_numeric & np.isnan(numeric[:, j])] = CELL_EMPTY
+            is_text = column_kind == CELL_TEXT
+            text[is_text, j] = values[is_text]
+            kind[:, j] = column_kind
+
+        meta = {
+            'columns': [int(col) if isinstance(col, (int, np.integer)) else col for col in df.columns],
+            'dtypes': [str(dtype) for dtype in df.dtypes]
+        }
+        return kind, numeric, np.asfortranarray(text.astype(str)), meta
+
+    def _decode(self, kind: np.ndarray, numeric: np.ndarray, text: np.ndarray, meta: Dict) -> pd.DataFrame:
+        """
+        Reconstruye el DataFrame original a partir del bundle
+
+        Las columnas float64 son vistas de numeric.npy (mapeado en memoria,
+        solo lectura); las demás se arman columna por columna.
+        """
+        columns = {}
+        for j, (col, dtype) in enumerate(zip(meta['columns'], meta['dtypes'])):
+            if dtype == 'float64':
+                columns[col] = pd.Series(numeric[:, j], copy=False)
+                continue
+            if pd.api.types.is_float_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+                columns[col] = pd.Series(numeric[:, j].astype(dtype))
+                continue
+
+            column_kind = np.asarray(kind[:, j])
+            values = numeric[:, j].astype(object)
+            is_int = column_kind == CELL_INT
+            values[is_int] = numeric[is_int, j].astype('int64')
+            is_text = column_kind == CELL_TEXT
+            values[is_text] = text[is_text, j].astype(object)
+            series = pd.Series(values, dtype=object)
+            columns[col] = series if dtype == 'object' else series.astype(dtype)
+
+        return pd.DataFrame(columns, columns=meta['columns'], copy=False)
+
+def _cell_kind(cell_type: type) -> Optional[int]:
+    """Tipo de celda del bundle para un tipo de Python, o None si no está soportado"""
+    if cell_type is type(None):
+        return CELL_EMPTY
+    if issubclass(cell_type, (bool, np.bool_)):
+        return None
+    if issubclass(cell_type, (int, np.integer)):
+        return CELL_INT
+    if issubclass(cell_type, (float, np.floating)):
+        return CELL_FLOAT
+    if issubclass(cell_type, str):
+        return CELL_TEXT
+    return None
@@ -0,0 +1,207 @@
+# columnar.py
+import json
+import logging
+import os
+import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+import numpy as np
+import pandas as pd
+
+from Transform import voltage_array
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Tipos de las columnas guardadas. sheet_name y la fecha no se guardan:
+# son las claves de partición y salen de la ruta.
+COLUMN_TYPES = {
+    'sensor_id': 'str',
+    'sensor_number': 'int32',
+    'reading_number': 'int32',
+    'timestamp': 'datetime64[ns]',
+    'voltage': 'float64',
+    'row_index': 'int32',
+    'column_index': 'int32',
+}
+
+class ColumnarDataset:
+    """
+    Exportación columnar de lecturas, particionada por hoja y fecha
+
+    Estructura (particiones estilo Hive):
+
+        <root>/sheet_name=<hoja>/date=<AAAA-MM-DD>/part-<lote>.parquet
+        <root>/_schema.json
+
+    Con pyarrow instalado cada parte es un Parquet comprimido con zstd, que
+    pandas, pyarrow o DuckDB leen directamente como dataset particionado.
+    Sin pyarrow se guarda un .npz comprimido (zlib) con un arreglo tipado por
+    columna; np.load solo descomprime las columnas que se piden.
+
+    Cada escritura crea partes nuevas con un identificador de lote, así que
+    agregar lotes (append) nunca reescribe archivos existentes. Las partes
+    se escriben en paralelo con hilos (la compresión libera el GIL) y de
+    forma atómica (archivo temporal + os.replace).
+    """
+
+    def __init__(self, root: str, file_format: str = 'auto'):
+        """
+        Args:
+            root: Carpeta del dataset
+            file_format: 'parquet', 'npz' o 'auto' (parquet si pyarrow está instalado)
+        """
+        if file_format == 'auto':
+            file_format = 'parquet' if HAS_PYARROW else 'npz'
+        if file_format not in ('parquet', 'npz'):
+            raise ValueError(f"Formato no soportado: {file_format}")
+        if file_format == 'parquet' and not HAS_PYARROW:
+            raise ImportError("El formato parquet requiere pyarrow (pip install pyarrow)")
+        self.root = root
+        self.file_format = file_format
+
+    def clear(self):
+        """Elimina todas las particiones y el esquema del dataset"""
+        if not os.path.isdir(self.root):
+            return
+        for entry in os.scandir(self.root):
+            if entry.is_dir() and entry.name.startswith('sheet_name='):
+                shutil.rmtree(entry.path)
+            elif entry.name == '_schema.json':
+                os.remove(entry.path)
+
+    def write(self, frames: Iterable[pd.DataFrame], workers: int = 4) -> Dict:
+        """
+        Agrega las lecturas al dataset como un nuevo lote de partes
+
+        Args:
+            frames: DataFrames con las columnas de READINGS_COLUMNS (p. ej. uno por hoja)
+            workers: Hilos para escribir particiones en paralelo
+
+        Returns:
+            Dict con lote, partes y filas escritas
+        """
+        os.makedirs(self.root, exist_ok=True)
+        self._write_schema()
+
+        batch = f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        partitions = [item for df in frames if not df.empty for item in self._split(df)]
+
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            rows = list(executor.map(lambda item: self._write_part(*item, batch), partitions))
+
+        result = {'batch': batch, 'parts': len(partitions), 'rows': sum(rows)}
+        logger.info(f"Lote {batch}: {result['rows']} filas en {result['parts']} particiones ({self.file_format})")
+        return result
+
+    def partitions(self, sheets: Optional[Iterable[str]] = None, start=None, end=None) -> List[Tuple[str, str, str]]:
+        """
+        Partes del dataset que pueden tener lecturas de las hojas y fechas pedidas
+
+        La poda usa solo los nombres de carpeta, sin abrir ningún archivo.
+
+        Returns:
+            Lista de (hoja, fecha AAAA-MM-DD, ruta de la parte)
+        """
+        if not os.path.isdir(self.root):
+            return []
+        wanted = set(sheets) if sheets is not None else None
+        first_day = pd.Timestamp(start).strftime('%Y-%m-%d') if start is not None else None
+        last_day = pd.Timestamp(end).strftime('%Y-%m-%d') if end is not None else None
+
+        parts = []
+        for sheet_entry in sorted(os.scandir(self.root), key=lambda entry: entry.name):
+            if not sheet_entry.is_dir() or not sheet_entry.name.startswith('sheet_name='):
+                continue
+            sheet_name = unquote(sheet_entry.name.split('=', 1)[1])
+            if wanted is not None and sheet_name not in wanted:
+                continue
+            for date_entry in sorted(os.scandir(sheet_entry.path), key=lambda entry: entry.name):
+                if not date_entry.is_dir() or not date_entry.name.startswith('date='):
+                    continue
+                day = date_entry.name.split('=', 1)[1]
+                if (first_day and day < first_day) or (last_day and day > last_day):
+                    continue
+                for part in sorted(os.listdir(date_entry.path)):
+                    if part.startswith('part-') and part.endswith(('.parquet', '.npz')):
+                        parts.append((sheet_name, day, os.path.join(date_entry.path, part)))
+        return parts
+
+    def read(self, columns: Optional[List[str]] = None, sheets: Optional[Iterable[str]] = None,
+             start=None, end=None) -> pd.DataFrame:
+        """
+        Lee las lecturas del dataset leyendo solo las particiones y columnas necesarias
+
+        Args:
+            columns: Columnas a devolver (por defecto todas, incluida sheet_name)
+            sheets: Hojas a leer (por defecto todas)
+            start, end: Rango de timestamps (inclusive) a devolver
+
+        Returns:
+            DataFrame con las columnas pedidas, en el orden de las particiones
+        """
+        if columns is None:
+            columns = list(COLUMN_TYPES) + ['sheet_name']
+        stored = [col for col in columns if col in COLUMN_TYPES]
+        # El timestamp hace falta para filtrar el rango aunque no se pida
+        to_load = list(stored)
+        if (start is not None or end is not None) and 'timestamp' not in to_load:
+            to_load.append('timestamp')
+
+        frames = []
+        for sheet_name, _, path in self.partitions(sheets, start, end):
+            df = self._read_part(path, to_load)
+            if start is not None:
+                df = df[df['timestamp'] >= pd.Timestamp(start)]
+            if end is not None:
+                df = df[df['timestamp'] <= pd.Timestamp(end)]
+            if 'sheet_name' in columns:
+                df = df.assign(sheet_name=sheet_name)
+            frames.append(df[[col for col in columns if col in df.columns]])
+
+        if not frames:
+            return pd.DataFrame({col: pd.Series(dtype=COLUMN_TYPES.get(col, 'str')) for col in columns})
+        return pd.concat(frames, ignore_index=True)[columns]
+
+    def _split(self, df: pd.DataFrame) -> Iterable[Tuple[str, str, pd.DataFrame]]:
+        """Divide un DataFrame en (hoja, fecha, filas) por clave de partición"""
+        days = pd.to_datetime(df['timestamp']).dt.strftime('%Y-%m-%d')
+        for (sheet_name, day), index in df.groupby([df['sheet_name'], days], sort=False, observed=True).indices.items():
+            yield sheet_name, day, df.iloc[index]
+
+    def _write_part(self, sheet_name: str, day: str, df: pd.DataFrame, batch: str) -> int:
+        """Escribe una parte de forma atómica y devuelve sus filas"""
+        part_dir = os.path.join(self.root, f"sheet_name={quote(sheet_name, safe='')}", f"date={day}")
+        os.makedirs(part_dir, exist_ok=True)
+        path = os.path.join(part_dir, f"part-{batch}.{self.file_format}")
+        tmp_path = path + '.tmp'
+
+        typed = {col: voltage_array(df[col]) if col == 'voltage' else df[col].to_numpy(dtype=dtype)
+                 for col, dtype in COLUMN_TYPES.items()}
+        if self.file_format == 'parquet':
+            pd.DataFrame(typed).to_parquet(tmp_path, engine='pyarrow', compression='zstd', index=False)
+        else:
+            # np.savez_compressed agrega .npz si el nombre no lo tiene
+            with open(tmp_path, 'wb') as f:
+                np.savez_compressed(f, **typed)
+        os.replace(tmp_path, path)
+        return len(df)
+
+    def _read_part(self, path: str, columns: List[str]) -> pd.DataFrame:
+        if path.endswith('.parquet'):
+            return pd.read_parquet(path, columns=columns)
+        with np.load(path, allow_pickle=False) as npz:
+            return pd.DataFrame({col: npz[col] for col in columns}, columns=columns)
+
+    def _write_schema(self):
+        with open(os.path.join(self.root, '_schema.json'), 'w', encoding='utf-8') as f:
+            json.dump({'columns': COLUMN_TYPES, 'partitioning': ['sheet_name', 'date']}, f, indent=2)
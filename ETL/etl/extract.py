@@ -1,58 +1,50 @@
 # extract.py
 import pandas as pd
+import hashlib
 import logging
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from openpyxl import load_workbook
+
+from cache import SheetCache
+from instrumentation import stage
 
 logger = logging.getLogger(__name__)
 
 class DataExtractor:
-    def __init__(self):
-        """Inicializa el extractor de datos"""
+    def __init__(self, cache_dir: Optional[str] = None, cache_max_bytes: int = 256 * 1024 * 1024,
+                 metrics=None):
+        """
+        Inicializa el extractor de datos
+        
+        Args:
+            cache_dir: Carpeta para la caché de hojas ya extraídas (ver cache.py).
+                Si es None no se usa caché.
+            cache_max_bytes: Tamaño máximo de la caché antes de eliminar
+                las hojas usadas hace más tiempo
+            metrics: PipelineMetrics opcional (ver instrumentation.py) donde se
+                registra el tiempo de extracción de cada hoja
+        """
         # No necesita file_path en el constructor
-        pass
+        self.cache = SheetCache(cache_dir, cache_max_bytes) if cache_dir else None
+        self.metrics = metrics
     
-    def extract_from_excel(self, file_path: str) -> Dict:
+    def extract_from_excel(self, file_path: str, streaming: bool = False) -> Dict:
         """
         Extrae datos de un archivo Excel con múltiples hojas
         
+        El libro se abre una sola vez y todas las hojas se leen desde ese
+        mismo manejador, en lugar de volver a descomprimir el .xlsx por hoja.
+        
         Args:
             file_path: Ruta al archivo Excel
+            streaming: Si es True lee las filas con openpyxl en modo read-only
+                (ver iter_sheets), sin cargar el árbol XML completo del libro
             
         Returns:
             Dict con los datos de cada hoja
         """
         try:
-            logger.info(f"Leyendo archivo Excel: {file_path}")
-            
-            # Leer todas las hojas del Excel
-            excel_file = pd.ExcelFile(file_path)
-            sheet_names = excel_file.sheet_names
-            
-            logger.info(f"Hojas encontradas: {sheet_names}")
-            
-            raw_data = {}
-            
-            for sheet_name in sheet_names:
-                try:
-                    logger.info(f"Extrayendo datos de {sheet_name}")
-                    
-                    # Leer hoja completa
-                    df = pd.read_excel(file_path, sheet_name=sheet_name, header=None)
-                    
-                    raw_data[sheet_name] = {
-                        'data': df,
-                        'dimensions': df.shape,
-                        'columns': df.columns.tolist()
-                    }
-                    
-                    logger.info(f"  ✓ {sheet_name}: {df.shape[0]} filas, {df.shape[1]} columnas")
-                    
-                except Exception as e:
-                    logger.error(f"  ✗ Error extrayendo {sheet_name}: {e}")
-                    raw_data[sheet_name] = {
-                        'data': pd.DataFrame(),
-                        'error': str(e)
-                    }
+            raw_data = dict(self.iter_excel(file_path, streaming))
             
             logger.info(f"Extracción completada. {len([d for d in raw_data.values() if not d['data'].empty])} hojas procesadas")
             return raw_data
@@ -64,6 +56,187 @@ class DataExtractor:
             logger.error(f"Error en extracción: {e}")
             raise
     
+    def iter_excel(self, file_path: str, streaming: bool = False) -> Iterator[Tuple[str, Dict]]:
+        """
+        Extrae las hojas del archivo Excel de a una, como generador
+        
+        Cada hoja se lee (o se toma de la caché) recién cuando se pide, de modo
+        que quien consume el generador solo necesita tener una hoja en memoria.
+        
+        Args:
+            file_path: Ruta al archivo Excel
+            streaming: Leer las filas con openpyxl en modo read-only
+            
+        Yields:
+            Tupla (nombre de hoja, dict con los datos de la hoja)
+        """
+        logger.info(f"Leyendo archivo Excel: {file_path}")
+        
+        file_hash = self.cache.file_hash(file_path, 'streaming' if streaming else 'pandas') if self.cache else None
+        
+        # Si todas las hojas están en caché no hace falta abrir el XLSX
+        cached_names = self.cache.get_sheet_names(file_hash) if self.cache else None
+        if cached_names is not None and all(self.cache.contains(file_hash, name) for name in cached_names):
+            logger.info(f"Hojas cargadas desde caché: {cached_names}")
+            for sheet_name in cached_names:
+                with stage(self.metrics, f"extract/{sheet_name}") as record:
+                    sheet_data = self._extract_cached(file_hash, sheet_name)
+                    record['rows'] = len(sheet_data['data']) if sheet_data is not None else 0
+                if sheet_data is None:
+                    raise RuntimeError(f"La entrada de caché de {sheet_name} desapareció durante la lectura")
+                yield sheet_name, sheet_data
+            return
+        
+        sheet_names = []
+        if streaming:
+            logger.info("Modo streaming (openpyxl read-only)")
+            for sheet_name, rows in self.iter_sheets(file_path):
+                sheet_names.append(sheet_name)
+                with stage(self.metrics, f"extract/{sheet_name}") as record:
+                    sheet_data = (self._extract_cached(file_hash, sheet_name)
+                                  or self._store_cached(file_hash, sheet_name, self._extract_rows(rows, sheet_name)))
+                    record['rows'] = len(sheet_data['data'])
+                yield sheet_name, sheet_data
+        else:
+            # Leer todas las hojas del Excel desde un único manejador
+            with pd.ExcelFile(file_path) as excel_file:
+                logger.info(f"Hojas encontradas: {excel_file.sheet_names}")
+                
+                for sheet_name in excel_file.sheet_names:
+                    sheet_names.append(sheet_name)
+                    with stage(self.metrics, f"extract/{sheet_name}") as record:
+                        sheet_data = (self._extract_cached(file_hash, sheet_name)
+                                      or self._store_cached(file_hash, sheet_name,
+                                                            self.extract_sheet(excel_file, sheet_name)))
+                        record['rows'] = len(sheet_data['data'])
+                    yield sheet_name, sheet_data
+        
+        if self.cache:
+            self.cache.put_sheet_names(file_hash, sheet_names)
+    
+    def _extract_cached(self, file_hash: Optional[str], sheet_name: str) -> Optional[Dict]:
+        """Devuelve la hoja desde la caché o None (sin caché o si no está guardada)"""
+        if self.cache is None:
+            return None
+        
+        df = self.cache.get(file_hash, sheet_name)
+        if df is None:
+            logger.info(f"  Caché MISS: {sheet_name}")
+            return None
+        
+        logger.info(f"  Caché HIT: {sheet_name} ({df.shape[0]} filas, {df.shape[1]} columnas)")
+        return {
+            'data': df,
+            'dimensions': df.shape,
+            'columns': df.columns.tolist()
+        }
+    
+    def _store_cached(self, file_hash: Optional[str], sheet_name: str, sheet_data: Dict) -> Dict:
+        """Guarda en caché una hoja recién extraída (las hojas con error no se guardan)"""
+        if self.cache is not None and 'error' not in sheet_data:
+            self.cache.put(file_hash, sheet_name, sheet_data['data'])
+        return sheet_data
+    
+    def list_sheets(self, file_path: str) -> List[str]:
+        """Devuelve los nombres de las hojas del archivo Excel"""
+        with pd.ExcelFile(file_path) as excel_file:
+            return excel_file.sheet_names
+    
+    def iter_sheets(self, file_path: str) -> Iterator[Tuple[str, Iterator[tuple]]]:
+        """
+        Recorre el libro en modo streaming con openpyxl (read_only=True)
+        
+        El libro se abre una vez y, por cada hoja, se entrega un generador de
+        filas (tuplas de valores) que se leen del XML a medida que se consumen.
+        
+        Yields:
+            Tupla (nombre de hoja, generador de filas)
+        """
+        workbook = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+        try:
+            for worksheet in workbook.worksheets:
+                # Las dimensiones guardadas en el archivo pueden ser incorrectas
+                worksheet.reset_dimensions()
+                yield worksheet.title, worksheet.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+    
+    def _extract_rows(self, rows: Iterator[tuple], sheet_name: str) -> Dict:
+        """Construye los datos de una hoja a partir de sus filas (modo streaming)"""
+        try:
+            logger.info(f"Extrayendo datos de {sheet_name}")
+            
+            # Igual que pd.read_excel: descartar celdas y filas vacías al final
+            data = []
+            last_row_with_data = -1
+            for row in rows:
+                row = list(row)
+                while row and (row[-1] is None or row[-1] == ''):
+                    row.pop()
+                if row:
+                    last_row_with_data = len(data)
+                data.append(row)
+            
+            df = pd.DataFrame(data[:last_row_with_data + 1])
+            
+            logger.info(f"  ✓ {sheet_name}: {df.shape[0]} filas, {df.shape[1]} columnas")
+            return {
+                'data': df,
+                'dimensions': df.shape,
+                'columns': df.columns.tolist()
+            }
+            
+        except Exception as e:
+            logger.error(f"  ✗ Error extrayendo {sheet_name}: {e}")
+            return {
+                'data': pd.DataFrame(),
+                'error': str(e)
+            }
+    
+    def extract_sheet(self, source: Union[str, pd.ExcelFile], sheet_name: str) -> Dict:
+        """
+        Extrae una sola hoja del archivo Excel
+        
+        Args:
+            source: Ruta al archivo Excel o un pd.ExcelFile ya abierto
+            sheet_name: Nombre de la hoja
+            
+        Returns:
+            Dict con los datos de la hoja (o DataFrame vacío y el error)
+        """
+        try:
+            logger.info(f"Extrayendo datos de {sheet_name}")
+            
+            # Leer hoja completa
+            df = pd.read_excel(source, sheet_name=sheet_name, header=None)
+            
+            logger.info(f"  ✓ {sheet_name}: {df.shape[0]} filas, {df.shape[1]} columnas")
+            return {
+                'data': df,
+                'dimensions': df.shape,
+                'columns': df.columns.tolist()
+            }
+            
+        except Exception as e:
+            logger.error(f"  ✗ Error extrayendo {sheet_name}: {e}")
+            return {
+                'data': pd.DataFrame(),
+                'error': str(e)
+            }
+    
+    def fingerprint_sheet(self, df: pd.DataFrame) -> str:
+        """
+        Huella del contenido de una hoja (SHA-256 de los hashes de pandas por fila)
+        
+        Dos hojas con los mismos valores en las mismas posiciones producen la
+        misma huella; se usa para detectar hojas sin cambios en el modo incremental.
+        """
+        digest = hashlib.sha256()
+        digest.update(repr((df.shape, df.columns.tolist())).encode('utf-8'))
+        if not df.empty:
+            digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+        return digest.hexdigest()
+    
     def validate_data_structure(self, raw_data: Dict) -> bool:
         """
         Valida la estructura básica de los datos extraídos
@@ -0,0 +1,389 @@
+# ingest.py
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import queue
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+from anomalies import AnomalyDetector
+from Transform import DataTransformer
+from load import DataLoader
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'sensor_data.db')
+
+# Columnas asumidas para líneas CSV que llegan sin encabezado
+DEFAULT_CSV_HEADER = ('sensor_id', 'timestamp', 'voltage')
+
+# Marca de formato para los fragmentos NDJSON
+NDJSON = 'ndjson'
+
+# Cada cuánto una conexión TCP sin datos revisa si el servicio se detiene
+SOCKET_POLL_SECONDS = 0.2
+
+class LineSplitter:
+    """
+    Separa un flujo de bytes en líneas completas y detecta el formato
+
+    Las líneas que empiezan con '{' se tratan como NDJSON; el resto como CSV.
+    Si la primera línea CSV empieza con 'sensor_id' se toma como encabezado.
+    """
+
+    def __init__(self):
+        self._remainder = b''
+        self.header: Optional[Tuple[str, ...]] = None
+
+    def feed(self, data: bytes, final: bool = False) -> List[Tuple[object, List[str]]]:
+        """Devuelve fragmentos (formato, líneas) con las líneas completas recibidas"""
+        data = self._remainder + data
+        lines = data.split(b'\n')
+        self._remainder = b'' if final else lines.pop()
+        return self.split_lines(line.decode('utf-8', errors='replace').strip() for line in lines)
+
+    def split_lines(self, lines) -> List[Tuple[object, List[str]]]:
+        chunks = []
+        current_format, current = None, []
+        for line in lines:
+            if not line:
+                continue
+            if line.startswith('{'):
+                line_format = NDJSON
+            elif line.startswith('sensor_id'):
+                self.header = tuple(next(csv.reader([line])))
+                continue
+            else:
+                line_format = self.header or DEFAULT_CSV_HEADER
+
+            if line_format != current_format and current:
+                chunks.append((current_format, current))
+                current = []
+            current_format = line_format
+            current.append(line)
+        if current:
+            chunks.append((current_format, current))
+        return chunks
+
+class IngestionService:
+    """
+    Servicio de ingesta en vivo con escrituras SQLite en micro-lotes
+
+    Las fuentes (TCP, UDP o archivos seguidos con tail) ponen fragmentos de
+    líneas en una cola acotada. Un único hilo escritor junta fragmentos hasta
+    batch_size lecturas o batch_interval segundos, los limpia con
+    DataTransformer.clean_live_readings y los confirma con
+    DataLoader.append_readings (lecturas + rollups en una transacción).
+
+    Con detect_anomalies, cada lote confirmado pasa además por un
+    AnomalyDetector (estado fijo por sensor, en memoria) y los eventos se
+    guardan en la tabla anomalies. Tras reiniciar el servicio cada sensor
+    vuelve a calentar su ventana.
+
+    La base debe tener el esquema tipado (o no existir): start_writer falla
+    con ValueError si fue cargada con --normalized u otro esquema, en lugar
+    de descartar cada lote.
+
+    Contrapresión: cuando la cola está llena las fuentes TCP y tail se
+    bloquean (TCP deja de leer el socket y el emisor se frena por control de
+    flujo); UDP no puede frenar al emisor, así que descarta y cuenta.
+    """
+
+    def __init__(self, db_path: str, batch_size: int = 5000, batch_interval: float = 0.5,
+                 max_pending: int = 256, detect_anomalies: bool = False):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self.transformer = DataTransformer()
+        self.loader = DataLoader()
+        self.detector = AnomalyDetector() if detect_anomalies else None
+        self.stop_event = threading.Event()
+        self._sources_done = threading.Event()  # las fuentes ya no encolan nada
+        self.writer: Optional[threading.Thread] = None
+        self._stopped = False
+        self.threads: List[threading.Thread] = []
+        self.servers: List[socketserver.BaseServer] = []
+        self.metrics = {'received': 0, 'written': 0, 'rejected': 0, 'dropped': 0, 'batches': 0, 'anomalies': 0}
+        self._metrics_lock = threading.Lock()
+
+    def _count(self, key: str, value: int):
+        with self._metrics_lock:
+            self.metrics[key] += value
+
+    def submit(self, chunks: List[Tuple[object, List[str]]], block: bool = True) -> bool:
+        """Encola fragmentos de líneas; con block=False descarta si la cola está llena"""
+        for chunk in chunks:
+            try:
+                self.queue.put(chunk, block=block)
+            except queue.Full:
+                self._count('dropped', len(chunk[1]))
+                return False
+            self._count('received', len(chunk[1]))
+        return True
+
+    # --- Fuentes -----------------------------------------------------------
+
+    def serve_tcp(self, host: str, port: int):
+        service = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                splitter = LineSplitter()
+                # recv con timeout para ver stop_event aunque el emisor no mande nada
+                self.request.settimeout(SOCKET_POLL_SECONDS)
+                while not service.stop_event.is_set():
+                    try:
+                        data = self.request.recv(65536)
+                    except socket.timeout:
+                        continue
+                    if not data:
+                        break
+                    service.submit(splitter.feed(data))
+                service.submit(splitter.feed(b'', final=True))
+
+        # Hilos de conexión no daemon: server_close espera a que cada uno
+        # encole lo que le quedaba antes de que stop cierre el escritor
+        server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self._start_server(server, f"TCP {host}:{port}")
+
+    def serve_udp(self, host: str, port: int):
+        service = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                # Cada datagrama trae líneas completas; no se puede bloquear al emisor
+                service.submit(LineSplitter().feed(self.request[0], final=True), block=False)
+
+        server = socketserver.UDPServer((host, port), Handler)
+        server.max_packet_size = 65535
+        # Buffer del kernel más grande para absorber ráfagas mientras se encola
+        server.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 * 1024 * 1024)
+        self._start_server(server, f"UDP {host}:{port}")
+
+    def _start_server(self, server: socketserver.BaseServer, name: str):
+        self.servers.append(server)
+        thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.2},
+                                  name=name, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+        logger.info(f"📡 Escuchando {name}")
+
+    def tail_file(self, path: str, from_start: bool = False, poll_interval: float = 0.2):
+        thread = threading.Thread(target=self._tail, args=(path, from_start, poll_interval),
+                                  name=f"tail {path}", daemon=True)
+        thread.start()
+        self.threads.append(thread)
+        logger.info(f"📄 Siguiendo archivo {path}")
+
+    def _tail(self, path: str, from_start: bool, poll_interval: float):
+        splitter = LineSplitter()
+        handle, position = None, 0
+        while not self.stop_event.is_set():
+            if handle is None:
+                try:
+                    handle = open(path, 'rb')
+                except FileNotFoundError:
+                    # Un archivo creado después de arrancar se lee completo
+                    from_start = True
+                    time.sleep(poll_interval)
+                    continue
+                # El encabezado CSV está en la primera línea aunque se empiece por el final
+                first_line = handle.readline()
+                splitter.feed(first_line)
+                position = 0 if from_start else os.fstat(handle.fileno()).st_size
+                if from_start:
+                    splitter = LineSplitter()
+                handle.seek(position)
+
+            data = handle.read(1024 * 1024)
+            if data:
+                position += len(data)
+                self.submit(splitter.feed(data))
+                continue
+
+            # Archivo truncado o rotado: volver a abrir desde el inicio
+            try:
+                stat = os.stat(path)
+                rotated = stat.st_ino != os.fstat(handle.fileno()).st_ino or stat.st_size < position
+            except FileNotFoundError:
+                rotated = True
+            if rotated:
+                handle.close()
+                handle, from_start = None, True
+                continue
+            time.sleep(poll_interval)
+
+        if handle is not None:
+            handle.close()
+
+    # --- Escritura ---------------------------------------------------------
+
+    def start_writer(self):
+        """Arranca el hilo escritor; ValueError si la base no admite lecturas en vivo"""
+        self.loader.check_append_target(self.db_path)
+        thread = threading.Thread(target=self._write_loop, name='writer', daemon=True)
+        thread.start()
+        self.writer = thread
+
+    def _write_loop(self):
+        pending: List[Tuple[object, List[str]]] = []
+        pending_lines = 0
+        deadline = time.monotonic() + self.batch_interval
+
+        while True:
+            timeout = max(deadline - time.monotonic(), 0.0)
+            try:
+                chunk = self.queue.get(timeout=timeout)
+                pending.append(chunk)
+                pending_lines += len(chunk[1])
+            except queue.Empty:
+                pass
+
+            stopping = self._sources_done.is_set() and self.queue.empty()
+            if pending_lines >= self.batch_size or time.monotonic() >= deadline or stopping:
+                if pending:
+                    self._flush(pending)
+                pending, pending_lines = [], 0
+                deadline = time.monotonic() + self.batch_interval
+                if stopping:
+                    return
+
+    def _flush(self, chunks: List[Tuple[object, List[str]]]):
+        lines = sum(len(chunk_lines) for _, chunk_lines in chunks)
+        try:
+            frames = [self.parse_chunk(line_format, chunk_lines) for line_format, chunk_lines in chunks]
+            readings, rejected = self.transformer.clean_live_readings(pd.concat(frames, ignore_index=True))
+            written = self.loader.append_readings(readings, self.db_path)
+        except Exception as e:
+            # El lote se pierde pero el hilo de escritura sigue vivo: si muriera,
+            # la cola se llenaría y la contrapresión bloquearía a TCP y tail
+            logger.error(f"❌ Error procesando lote de {lines} líneas: {e}")
+            self._count('rejected', lines)
+            return
+
+        self._count('written', written)
+        self._count('rejected', rejected)
+        self._count('batches', 1)
+
+        if self.detector is not None and written:
+            try:
+                events = self.detector.update(readings)
+                if not events.empty:
+                    self._count('anomalies', self.loader.save_anomalies(events, self.db_path))
+            except Exception as e:
+                logger.error(f"❌ Error detectando anomalías del lote: {e}")
+
+    @staticmethod
+    def parse_chunk(line_format, lines: List[str]) -> pd.DataFrame:
+        """Convierte un fragmento de líneas NDJSON o CSV en un DataFrame de texto"""
+        if line_format == NDJSON:
+            records = []
+            for line in lines:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    records.append({})
+            df = pd.DataFrame.from_records(records)
+        else:
+            df = pd.read_csv(io.StringIO('\n'.join(lines)), header=None, names=list(line_format),
+                             dtype=str, on_bad_lines='skip')
+            # Igual que en NDJSON, cada línea mal formada queda como una fila
+            # vacía para que clean_live_readings la cuente como descartada
+            skipped = sum(1 for line in lines if line.strip()) - len(df)
+            if skipped > 0:
+                df = pd.concat([df, pd.DataFrame(index=range(skipped), columns=df.columns)], ignore_index=True)
+        for col in DEFAULT_CSV_HEADER:
+            if col not in df.columns:
+                df[col] = None
+        return df
+
+    # --- Ciclo de vida -----------------------------------------------------
+
+    def stop(self):
+        """Deja de recibir, escribe lo pendiente y cierra las fuentes"""
+        if self._stopped:
+            return
+        self._stopped = True
+        self.stop_event.set()
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        for thread in self.threads:
+            thread.join()
+        self._sources_done.set()
+        if self.writer is not None:
+            self.writer.join()
+
+    def run(self, report_interval: float = 5.0):
+        """Bucle principal: informa el rendimiento hasta recibir SIGINT/SIGTERM"""
+        signal.signal(signal.SIGTERM, lambda *_: self.stop_event.set())
+        last_written, last_time = 0, time.monotonic()
+        try:
+            while not self.stop_event.wait(report_interval):
+                now = time.monotonic()
+                with self._metrics_lock:
+                    metrics = dict(self.metrics)
+                rate = (metrics['written'] - last_written) / (now - last_time)
+                last_written, last_time = metrics['written'], now
+                logger.info(f"⚡ {rate:,.0f} lecturas/s | escritas {metrics['written']} | "
+                            f"lotes {metrics['batches']} | descartadas {metrics['rejected']} | "
+                            f"perdidas UDP {metrics['dropped']} | anomalías {metrics['anomalies']} | "
+                            f"cola {self.queue.qsize()}")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+            logger.info(f"🛑 Ingesta detenida: {self.metrics}")
+
+def parse_address(value: str) -> Tuple[str, int]:
+    """'9009' o 'host:9009' -> (host, puerto)"""
+    host, _, port = value.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                        handlers=[logging.StreamHandler(sys.stdout)])
+
+    parser = argparse.ArgumentParser(description="Servicio de ingesta en vivo de lecturas de sensores")
+    parser.add_argument('--db', default=DEFAULT_DB, help="Base SQLite de destino")
+    parser.add_argument('--tcp', type=parse_address, help="Escuchar líneas NDJSON/CSV por TCP ([host:]puerto)")
+    parser.add_argument('--udp', type=parse_address, help="Escuchar datagramas NDJSON/CSV por UDP ([host:]puerto)")
+    parser.add_argument('--tail', action='append', default=[], help="Seguir un archivo CSV/NDJSON (repetible)")
+    parser.add_argument('--from-start', action='store_true', help="Leer los archivos seguidos desde el inicio")
+    parser.add_argument('--batch-size', type=int, default=5000, help="Lecturas por transacción")
+    parser.add_argument('--batch-interval', type=float, default=0.5,
+                        help="Segundos máximos antes de confirmar un lote incompleto")
+    parser.add_argument('--max-pending', type=int, default=256,
+                        help="Fragmentos en cola antes de aplicar contrapresión")
+    parser.add_argument('--anomalies', action='store_true',
+                        help="Detectar anomalías en cada lote y guardarlas en la tabla anomalies")
+    args = parser.parse_args()
+
+    if not (args.tcp or args.udp or args.tail):
+        parser.error("indique al menos una fuente: --tcp, --udp o --tail")
+
+    service = IngestionService(args.db, args.batch_size, args.batch_interval, args.max_pending,
+                               detect_anomalies=args.anomalies)
+    try:
+        service.start_writer()
+    except ValueError as e:
+        logger.error(f"❌ {e}")
+        sys.exit(1)
+    if args.tcp:
+        service.serve_tcp(*args.tcp)
+    if args.udp:
+        service.serve_udp(*args.udp)
+    for path in args.tail:
+        service.tail_file(path, from_start=args.from_start)
+    service.run()
@@ -0,0 +1,136 @@
+# instrumentation.py
+import cProfile
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from memory_usage import peak_rss_mb
+
+logger = logging.getLogger(__name__)
+
+class PipelineMetrics:
+    """
+    Métricas por etapa de una ejecución del pipeline
+
+    Cada etapa registra tiempo de pared, tiempo de CPU, filas y filas/s,
+    pico de RSS del proceso al terminar y, si trace_memory está activo,
+    el pico y el neto de memoria asignada por Python durante la etapa
+    (tracemalloc). Las etapas pueden anidarse: los nombres usan '/' como
+    separador (p. ej. 'transform/SENP1/clean') y el tiempo de una etapa
+    incluye el de sus hijas.
+
+    Con profile=True además se captura un perfil cProfile de toda la
+    ejecución, que se guarda junto al archivo de métricas (.prof).
+    En info se pueden agregar datos libres de la ejecución (modo, rutas,
+    resultado) que se escriben junto con las etapas.
+    """
+
+    def __init__(self, trace_memory: bool = False, profile: bool = False):
+        self.trace_memory = trace_memory
+        self.profile = cProfile.Profile() if profile else None
+        self.stages: List[Dict] = []
+        self.info: Dict = {}
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self._start_cpu = time.process_time()
+        self._memory_stack: List[Dict] = []
+
+    def start(self):
+        """Activa tracemalloc y cProfile si fueron pedidos"""
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if self.profile is not None:
+            self.profile.enable()
+
+    @contextmanager
+    def stage(self, name: str, rows: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Mide una etapa. El diccionario devuelto permite fijar 'rows' (u otros
+        campos) dentro del bloque, cuando la cantidad de filas se conoce al final.
+        """
+        record = {'name': name, 'rows': rows}
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            for frame in self._memory_stack:
+                frame['max'] = max(frame['max'], peak)
+            tracemalloc.reset_peak()
+            self._memory_stack.append({'start': current, 'max': current})
+
+        offset = time.perf_counter() - self._start
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield record
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            record.update({
+                'start_offset_s': round(offset, 6),
+                'wall_s': round(wall, 6),
+                'cpu_s': round(cpu, 6),
+                'rows_per_s': round(record['rows'] / wall, 1) if record['rows'] and wall > 0 else None,
+                'peak_rss_mb': peak_rss_mb()
+            })
+            if tracing and self._memory_stack:
+                current, peak = tracemalloc.get_traced_memory()
+                frame = self._memory_stack.pop()
+                frame['max'] = max(frame['max'], peak)
+                if self._memory_stack:
+                    parent = self._memory_stack[-1]
+                    parent['max'] = max(parent['max'], frame['max'])
+                record['alloc_peak_mb'] = round((frame['max'] - frame['start']) / (1024 * 1024), 3)
+                record['alloc_net_mb'] = round((current - frame['start']) / (1024 * 1024), 3)
+            self.stages.append(record)
+
+    def summary(self) -> Dict:
+        """Métricas de la ejecución en un diccionario serializable a JSON"""
+        return {
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'wall_s': round(time.perf_counter() - self._start, 6),
+            'cpu_s': round(time.process_time() - self._start_cpu, 6),
+            'peak_rss_mb': peak_rss_mb(),
+            'trace_memory': self.trace_memory,
+            'info': self.info,
+            'environment': {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'argv': sys.argv,
+            },
+            'stages': sorted(self.stages, key=lambda record: record['start_offset_s'])
+        }
+
+    def write(self, path: str) -> str:
+        """Escribe el JSON de métricas (y el .prof si hay perfil) y detiene las capturas"""
+        if self.profile is not None:
+            self.profile.disable()
+        summary = self.summary()
+        if tracemalloc.is_tracing() and self.trace_memory:
+            tracemalloc.stop()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if self.profile is not None:
+            profile_path = os.path.splitext(path)[0] + '.prof'
+            self.profile.dump_stats(profile_path)
+            summary['profile'] = profile_path
+
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, default=str)
+        logger.info(f"📊 Métricas de la ejecución guardadas en {path}")
+        return path
+
+@contextmanager
+def stage(metrics: Optional[PipelineMetrics], name: str, rows: Optional[int] = None) -> Iterator[Dict]:
+    """metrics.stage(...) si hay métricas; si no, un bloque sin medición"""
+    if metrics is None:
+        yield {'name': name, 'rows': rows}
+    else:
+        with metrics.stage(name, rows) as record:
+            yield record
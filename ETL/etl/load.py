@@ -1,15 +1,227 @@
 # load.py
 import sqlite3
 import pandas as pd
+import numpy as np
 import logging
-from typing import Dict
+import itertools
+from contextlib import contextmanager
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
 import os
 
+from Transform import READING_INTERVAL_MINUTES, combine_moments, global_voltage_stats, voltage_array
+from instrumentation import stage
+
 logger = logging.getLogger(__name__)
 
+READINGS_COLUMNS = ['sensor_id', 'sensor_number', 'reading_number', 'timestamp',
+                    'voltage', 'sheet_name', 'row_index', 'column_index']
+STATISTICS_COLUMNS = ['sensor_id', 'sheet_name', 'count', 'mean', 'median', 'std',
+                      'min', 'max', 'q25', 'q75', 'outliers_count']
+QUALITY_COLUMNS = ['sheet_name', 'completeness', 'unique_sensors', 'total_readings',
+                   'min_voltage', 'max_voltage', 'mean_voltage']
+ANOMALY_COLUMNS = ['sensor_id', 'timestamp', 'detector', 'sheet_name', 'voltage', 'baseline', 'score']
+
+# Versión del esquema tipado (PRAGMA user_version). Las bases creadas con
+# DataFrame.to_sql guardan el timestamp como TEXT y tienen versión 0.
+# 1: esquema tipado inicial; 3: se agrega sensor_rollups;
+# 5: sheet_partials guarda media y M2 en lugar de suma y suma de cuadrados;
+# 7: sensor_rollups también guarda M2 en lugar de la suma de cuadrados
+SCHEMA_VERSION = 7
+
+# Esquema normalizado (carga masiva con normalized=True)
+# 2: esquema normalizado inicial; 4: se agrega sensor_rollups; 6 y 8: como la 5 y la 7
+NORMALIZED_SCHEMA_VERSION = 8
+
+# Granularidades de los rollups por sensor, en segundos (5 min, 1 h, 1 día)
+ROLLUP_BUCKETS = (300, 3600, 86400)
+
+# Esquema tipado compartido por la carga masiva y la incremental: ids enteros,
+# voltage REAL y timestamp como INTEGER (segundos desde epoch) en vez de TEXT
+READINGS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS "sensor_readings" (
+  "sensor_id" TEXT NOT NULL,
+  "sensor_number" INTEGER NOT NULL,
+  "reading_number" INTEGER NOT NULL,
+  "timestamp" INTEGER NOT NULL,
+  "voltage" REAL NOT NULL,
+  "sheet_name" TEXT NOT NULL,
+  "row_index" INTEGER NOT NULL,
+  "column_index" INTEGER NOT NULL
+);
+"""
+
+SUMMARY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS "sensor_statistics" (
+  "sensor_id" TEXT NOT NULL,
+  "sheet_name" TEXT NOT NULL,
+  "count" INTEGER,
+  "mean" REAL,
+  "median" REAL,
+  "std" REAL,
+  "min" REAL,
+  "max" REAL,
+  "q25" REAL,
+  "q75" REAL,
+  "outliers_count" INTEGER
+);
+CREATE TABLE IF NOT EXISTS "quality_metrics" (
+  "sheet_name" TEXT NOT NULL,
+  "completeness" REAL,
+  "unique_sensors" INTEGER,
+  "total_readings" INTEGER,
+  "min_voltage" REAL,
+  "max_voltage" REAL,
+  "mean_voltage" REAL
+);
+CREATE TABLE IF NOT EXISTS "sheet_fingerprints" (
+  "sheet_name" TEXT PRIMARY KEY,
+  "fingerprint" TEXT NOT NULL,
+  "loaded_at" TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS "sheet_partials" (
+  "sheet_name" TEXT PRIMARY KEY,
+  "readings" INTEGER NOT NULL,
+  "voltage_mean" REAL NOT NULL,
+  "voltage_m2" REAL NOT NULL,
+  "voltage_min" REAL,
+  "voltage_max" REAL,
+  "sensors" INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS "sensor_rollups" (
+  "bucket_seconds" INTEGER NOT NULL,
+  "sensor_id" TEXT NOT NULL,
+  "bucket_start" INTEGER NOT NULL,
+  "sheet_name" TEXT NOT NULL,
+  "readings" INTEGER NOT NULL,
+  "voltage_sum" REAL NOT NULL,
+  "voltage_m2" REAL NOT NULL,
+  "voltage_min" REAL NOT NULL,
+  "voltage_max" REAL NOT NULL,
+  PRIMARY KEY ("bucket_seconds", "sensor_id", "bucket_start")
+) WITHOUT ROWID;
+"""
+
+# Eventos del motor de anomalías (ver anomalies.py). score es el estadístico
+# que disparó el evento: z-score, EWMA del z-score o suma CUSUM (negativa
+# hacia abajo). baseline es la media de la ventana previa del sensor.
+ANOMALIES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS "anomalies" (
+  "sensor_id" TEXT NOT NULL,
+  "timestamp" INTEGER NOT NULL,
+  "detector" TEXT NOT NULL,
+  "sheet_name" TEXT NOT NULL,
+  "voltage" REAL NOT NULL,
+  "baseline" REAL,
+  "score" REAL NOT NULL,
+  PRIMARY KEY ("sensor_id", "timestamp", "detector")
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS "idx_anomalies_ts" ON "anomalies" ("timestamp");
+"""
+
+SCHEMA = READINGS_SCHEMA + SUMMARY_SCHEMA
+
+# Lecturas normalizadas: dimensiones de hojas y sensores con clave entera y una
+# tabla de hechos (sensor_key, ts, voltage) sin rowid, ordenada por su clave
+# primaria. sensor_number, reading_number, row_index y column_index se derivan
+# en la vista de compatibilidad sensor_readings.
+NORMALIZED_SCHEMA = """
+CREATE TABLE IF NOT EXISTS "sheets" (
+  "sheet_key" INTEGER PRIMARY KEY,
+  "sheet_name" TEXT NOT NULL UNIQUE,
+  "start_row" INTEGER NOT NULL,
+  "base_ts" INTEGER NOT NULL,
+  "interval_s" INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS "sensors" (
+  "sensor_key" INTEGER PRIMARY KEY,
+  "sensor_id" TEXT NOT NULL UNIQUE,
+  "sheet_key" INTEGER NOT NULL REFERENCES "sheets" ("sheet_key"),
+  "sensor_number" INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS "readings" (
+  "sensor_key" INTEGER NOT NULL,
+  "ts" INTEGER NOT NULL,
+  "voltage" REAL NOT NULL,
+  PRIMARY KEY ("sensor_key", "ts")
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS "idx_sensors_sheet" ON "sensors" ("sheet_key");
+CREATE VIEW IF NOT EXISTS "sensor_readings" AS
+SELECT
+  s.sensor_id AS sensor_id,
+  s.sensor_number AS sensor_number,
+  (r.ts - h.base_ts) / h.interval_s + 1 AS reading_number,
+  r.ts AS timestamp,
+  r.voltage AS voltage,
+  h.sheet_name AS sheet_name,
+  h.start_row + (r.ts - h.base_ts) / h.interval_s AS row_index,
+  s.sensor_number - 1 AS column_index
+FROM "readings" r
+JOIN "sensors" s ON s.sensor_key = r.sensor_key
+JOIN "sheets" h ON h.sheet_key = s.sheet_key;
+"""
+
+# Índices que se crean después de cargar los datos (más rápido que mantenerlos fila a fila)
+READINGS_INDEXES = """
+CREATE INDEX IF NOT EXISTS "idx_readings_sensor_ts" ON "sensor_readings" ("sensor_id", "timestamp");
+CREATE INDEX IF NOT EXISTS "idx_readings_sheet" ON "sensor_readings" ("sheet_name");
+"""
+
+SUMMARY_INDEXES = """
+CREATE INDEX IF NOT EXISTS "idx_statistics_sheet" ON "sensor_statistics" ("sheet_name");
+CREATE INDEX IF NOT EXISTS "idx_rollups_bucket" ON "sensor_rollups" ("bucket_seconds", "bucket_start");
+"""
+
+# Combina un bucket nuevo con el existente. Conteo, suma, mínimo y máximo se
+# suman; M2 (suma de cuadrados de las desviaciones a la media) se combina con
+# la fórmula de Chan. Todas las expresiones del SET ven la fila anterior.
+ROLLUP_UPSERT = """
+INSERT INTO "sensor_rollups" ("bucket_seconds", "sensor_id", "bucket_start", "sheet_name", "readings",
+                              "voltage_sum", "voltage_m2", "voltage_min", "voltage_max")
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT ("bucket_seconds", "sensor_id", "bucket_start") DO UPDATE SET
+  "readings" = "readings" + excluded."readings",
+  "voltage_sum" = "voltage_sum" + excluded."voltage_sum",
+  "voltage_m2" = "voltage_m2" + excluded."voltage_m2"
+    + ("voltage_sum" / "readings" - excluded."voltage_sum" / excluded."readings")
+    * ("voltage_sum" / "readings" - excluded."voltage_sum" / excluded."readings")
+    * "readings" * excluded."readings" / CAST("readings" + excluded."readings" AS REAL),
+  "voltage_min" = MIN("voltage_min", excluded."voltage_min"),
+  "voltage_max" = MAX("voltage_max", excluded."voltage_max")
+"""
+
+INDEXES = READINGS_INDEXES + SUMMARY_INDEXES
+
+def to_epoch(value) -> int:
+    """Segundos desde epoch para un entero, datetime o texto de fecha"""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    return int(pd.Timestamp(value).value // 10**9)
+
+def pick_rollup(start: Optional[int], end: Optional[int], resolution: int) -> Optional[int]:
+    """
+    Rollup más grueso que responde la consulta de forma exacta: su
+    granularidad debe dividir a la resolución y a los extremos del rango
+    (un extremo None significa rango abierto)
+    """
+    for bucket_seconds in sorted(ROLLUP_BUCKETS, reverse=True):
+        if (resolution % bucket_seconds == 0 and (start or 0) % bucket_seconds == 0
+                and (end or 0) % bucket_seconds == 0):
+            return bucket_seconds
+    return None
+
+DATA_TABLES = ('sensor_readings', 'sensor_statistics', 'quality_metrics', 'sheet_fingerprints', 'sheet_partials',
+               'sensor_rollups', 'anomalies', 'readings', 'sensors', 'sheets')
+
 class DataLoader:
-    def __init__(self):
-        pass
+    def __init__(self, metrics=None):
+        """
+        Args:
+            metrics: PipelineMetrics opcional (ver instrumentation.py) donde se
+                registran los tiempos de carga por hoja y tabla
+        """
+        self.metrics = metrics
     
     def load_to_sqlite(self, transformed_data: Dict, db_path: str):
         """Carga los datos transformados a SQLite"""
@@ -20,44 +232,39 @@ class DataLoader:
             conn = sqlite3.connect(db_path)
             logger.info(f"Conectado a base de datos: {db_path}")
             
-            # Combinar todos los datos en un solo DataFrame
-            all_data = []
-            for sheet_name, data in transformed_data.items():
-                if not data['data'].empty:
-                    df = data['data'].copy()
-                    all_data.append(df)
-                    logger.info(f"  ✓ {sheet_name}: {len(df)} registros para cargar")
+            # Una hoja por vez (sin concatenar el libro completo): la primera
+            # crea la tabla y las demás se agregan
+            sheets = [(sheet_name, data['data']) for sheet_name, data in transformed_data.items()
+                      if not data['data'].empty]
+            for sheet_name, df in sheets:
+                logger.info(f"  ✓ {sheet_name}: {len(df)} registros para cargar")
             
-            if not all_data:
+            if not sheets:
                 logger.error("No hay datos para cargar")
                 conn.close()
                 return
             
-            combined_df = pd.concat(all_data, ignore_index=True)
-            logger.info(f"Total de registros a cargar: {len(combined_df)}")
+            total_rows = sum(len(df) for _, df in sheets)
+            logger.info(f"Total de registros a cargar: {total_rows}")
+            
+            # to_sql(if_exists='replace') no puede reemplazar la vista sensor_readings
+            # del esquema normalizado, y las demás tablas (rollups, readings, etc.)
+            # quedarían desactualizadas: se eliminan como en bulk_load_to_sqlite
+            self._drop_data_objects(conn)
+            conn.commit()
             
             # Crear tabla principal de lecturas de sensores
-            combined_df.to_sql('sensor_readings', conn, if_exists='replace', index=False)
-            logger.info(f"Tabla 'sensor_readings' creada con {len(combined_df)} registros")
+            with stage(self.metrics, "load/to_sql", rows=total_rows):
+                for position, (sheet_name, df) in enumerate(sheets):
+                    df.assign(voltage=voltage_array(df['voltage'])).to_sql(
+                        'sensor_readings', conn, if_exists='replace' if position == 0 else 'append', index=False
+                    )
+            logger.info(f"Tabla 'sensor_readings' creada con {total_rows} registros")
             
             # Crear tabla de estadísticas
             stats_data = []
             for sheet_name, data in transformed_data.items():
-                if data['statistics']:
-                    for sensor_id, stats in data['statistics'].items():
-                        stats_data.append({
-                            'sensor_id': sensor_id,
-                            'sheet_name': sheet_name,
-                            'count': stats.get('count', 0),
-                            'mean': stats.get('mean', 0),
-                            'median': stats.get('median', 0),
-                            'std': stats.get('std', 0),
-                            'min': stats.get('min', 0),
-                            'max': stats.get('max', 0),
-                            'q25': stats.get('q25', 0),
-                            'q75': stats.get('q75', 0),
-                            'outliers_count': stats.get('outliers_count', 0)
-                        })
+                stats_data.extend(self._statistics_rows(sheet_name, data))
             
             if stats_data:
                 stats_df = pd.DataFrame(stats_data)
@@ -68,22 +275,18 @@ class DataLoader:
             quality_data = []
             for sheet_name, data in transformed_data.items():
                 if data['quality_metrics']:
-                    metrics = data['quality_metrics']
-                    quality_data.append({
-                        'sheet_name': sheet_name,
-                        'completeness': metrics.get('completeness', 0),
-                        'unique_sensors': metrics.get('unique_sensors', 0),
-                        'total_readings': metrics.get('total_readings', 0),
-                        'min_voltage': metrics.get('value_range', {}).get('min_voltage', 0),
-                        'max_voltage': metrics.get('value_range', {}).get('max_voltage', 0),
-                        'mean_voltage': metrics.get('value_range', {}).get('mean_voltage', 0)
-                    })
+                    quality_data.append(self._quality_row(sheet_name, data))
             
             if quality_data:
                 quality_df = pd.DataFrame(quality_data)
                 quality_df.to_sql('quality_metrics', conn, if_exists='replace', index=False)
                 logger.info(f"Tabla 'quality_metrics' creada con {len(quality_df)} registros")
             
+            # Una carga completa invalida el estado de la carga incremental
+            conn.execute('DROP TABLE IF EXISTS sheet_fingerprints')
+            conn.execute('DROP TABLE IF EXISTS sheet_partials')
+            conn.execute('PRAGMA user_version = 0')
+            
             conn.commit()
             conn.close()
             
@@ -93,6 +296,617 @@ class DataLoader:
             logger.error(f"❌ Error cargando datos a SQLite: {e}")
             raise
     
+    def bulk_load_to_sqlite(self, transformed_data: Dict, db_path: str, chunk_size: int = 50000,
+                            normalized: bool = False) -> Dict:
+        """
+        Carga masiva a SQLite con esquema tipado
+        
+        - journal_mode=WAL y synchronous=NORMAL
+        - INSERT preparados con executemany en lotes de chunk_size filas,
+          todos dentro de una única transacción
+        - índices (sensor_id, timestamp) y sheet_name creados al final
+        
+        Args:
+            transformed_data: Salida de DataTransformer.transform_sensor_data
+            db_path: Ruta a la base SQLite
+            chunk_size: Filas por llamada a executemany
+            normalized: Guardar las lecturas en el esquema normalizado
+                (sheets, sensors, readings) con la vista sensor_readings
+            
+        Returns:
+            Dict con filas cargadas, segundos y filas/segundo de sensor_readings
+        """
+        return self.load_stream(transformed_data.items(), db_path, chunk_size, normalized)
+    
+    def load_stream(self, sheets: Iterable[Tuple[str, Dict]], db_path: str, chunk_size: int = 50000,
+                    normalized: bool = False) -> Dict:
+        """
+        Carga masiva consumiendo las hojas transformadas de a una
+        
+        Igual que bulk_load_to_sqlite, pero recibe un iterable de
+        (nombre de hoja, datos transformados). Cada hoja se inserta y se
+        descarta antes de pedir la siguiente, así que si el iterable es un
+        generador la memoria queda acotada por la hoja más grande y no por
+        el libro completo.
+        
+        Args:
+            sheets: Iterable de (nombre de hoja, salida de transform_sheet)
+            db_path: Ruta a la base SQLite
+            chunk_size: Filas por llamada a executemany
+            normalized: Guardar las lecturas en el esquema normalizado
+            
+        Returns:
+            Dict con filas cargadas, segundos y filas/segundo de sensor_readings
+        """
+        try:
+            os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+            
+            conn = self._connect(db_path)
+            logger.info(f"Conectado a base de datos: {db_path}")
+            
+            start = time.perf_counter()
+            total_rows = 0
+            stats_count = 0
+            quality_count = 0
+            
+            # Reemplazo atómico: DDL, datos y estadísticas en la misma transacción
+            with self._transaction(conn):
+                self._drop_data_objects(conn)
+                if normalized:
+                    self._execute_script(conn, NORMALIZED_SCHEMA + SUMMARY_SCHEMA)
+                    conn.execute(f'PRAGMA user_version = {NORMALIZED_SCHEMA_VERSION}')
+                else:
+                    self._execute_script(conn, SCHEMA)
+                    conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+                
+                for sheet_name, data in sheets:
+                    df = data['data']
+                    if not df.empty:
+                        with stage(self.metrics, f"load/{sheet_name}/readings", rows=len(df)):
+                            if normalized:
+                                rows = self._insert_normalized_sheet(conn, sheet_name, df, chunk_size)
+                            else:
+                                rows = self._insert_rows(conn, 'sensor_readings', READINGS_COLUMNS,
+                                                         self._readings_rows(df), chunk_size)
+                        total_rows += rows
+                        with stage(self.metrics, f"load/{sheet_name}/rollups") as record:
+                            record['rows'] = self._merge_rollups(conn, df, chunk_size)
+                        logger.info(f"  ✓ {sheet_name}: {rows} registros cargados")
+                    
+                    with stage(self.metrics, f"load/{sheet_name}/summaries"):
+                        stats_rows = self._statistics_rows(sheet_name, data)
+                        stats_count += self._insert_rows(conn, 'sensor_statistics', STATISTICS_COLUMNS,
+                                                         ([row[col] for col in STATISTICS_COLUMNS]
+                                                          for row in stats_rows), chunk_size)
+                        
+                        if data['quality_metrics']:
+                            quality_row = self._quality_row(sheet_name, data)
+                            quality_count += self._insert_rows(conn, 'quality_metrics', QUALITY_COLUMNS,
+                                                               [[quality_row[col] for col in QUALITY_COLUMNS]])
+                        
+                        conn.execute(
+                            'INSERT OR REPLACE INTO sheet_partials VALUES (:sheet_name, :readings, :voltage_mean, '
+                            ':voltage_m2, :voltage_min, :voltage_max, :sensors)',
+                            self._sheet_partial(sheet_name, data)
+                        )
+                    
+                    # Soltar la hoja antes de pedir la siguiente al iterable
+                    del df, data, stats_rows
+            
+            insert_seconds = time.perf_counter() - start
+            
+            # Índices después de la carga (las lecturas normalizadas ya están ordenadas por su clave)
+            with stage(self.metrics, "load/indexes", rows=total_rows):
+                self._execute_script(conn, SUMMARY_INDEXES if normalized else INDEXES)
+                conn.execute('ANALYZE')
+            total_seconds = time.perf_counter() - start
+            conn.close()
+            
+            load_metrics = {
+                'rows': total_rows,
+                'insert_seconds': insert_seconds,
+                'total_seconds': total_seconds,
+                'rows_per_second': total_rows / insert_seconds if insert_seconds > 0 else 0.0
+            }
+            logger.info(f"Tabla 'sensor_readings' creada con {total_rows} registros")
+            logger.info(f"Tabla 'sensor_statistics' creada con {stats_count} registros")
+            logger.info(f"Tabla 'quality_metrics' creada con {quality_count} registros")
+            logger.info(f"⚡ Carga: {load_metrics['rows_per_second']:,.0f} filas/s "
+                        f"({insert_seconds:.2f} s inserción, {total_seconds:.2f} s con índices)")
+            logger.info("✅ Datos cargados exitosamente a SQLite")
+            return load_metrics
+            
+        except Exception as e:
+            logger.error(f"❌ Error cargando datos a SQLite: {e}")
+            raise
+    
+    def _drop_data_objects(self, conn: sqlite3.Connection):
+        """Elimina las tablas de datos y la vista sensor_readings del esquema normalizado"""
+        placeholders = ', '.join('?' for _ in DATA_TABLES)
+        existing = conn.execute(
+            f"SELECT type, name FROM sqlite_master WHERE type IN ('table', 'view') AND name IN ({placeholders})",
+            DATA_TABLES
+        ).fetchall()
+        for object_type, name in existing:
+            conn.execute(f'DROP {object_type.upper()} "{name}"')
+    
+    def _insert_normalized_sheet(self, conn: sqlite3.Connection, sheet_name: str, df: pd.DataFrame,
+                                 chunk_size: int = 50000) -> int:
+        """
+        Inserta una hoja en el esquema normalizado
+        
+        Las columnas que la vista deriva (reading_number, row_index,
+        column_index) se verifican antes de descartarlas, para que la vista
+        devuelva exactamente los mismos valores.
+        """
+        interval = READING_INTERVAL_MINUTES * 60
+        ts = df['timestamp'].to_numpy(dtype='datetime64[s]').astype('int64')
+        sensor_number = df['sensor_number'].to_numpy(dtype='int64')
+        reading_number = df['reading_number'].to_numpy(dtype='int64')
+        row_index = df['row_index'].to_numpy(dtype='int64')
+        column_index = df['column_index'].to_numpy(dtype='int64')
+        
+        start_row = int(row_index[0] - reading_number[0] + 1)
+        base_ts = int(ts[0] - (reading_number[0] - 1) * interval)
+        consistent = (
+            np.array_equal(column_index, sensor_number - 1)
+            and np.array_equal(row_index, start_row + reading_number - 1)
+            and np.array_equal(ts, base_ts + (reading_number - 1) * interval)
+        )
+        if not consistent:
+            raise ValueError(f"{sheet_name}: las lecturas no se pueden normalizar sin perder columnas derivadas")
+        
+        sheet_key = conn.execute(
+            'INSERT INTO sheets (sheet_name, start_row, base_ts, interval_s) VALUES (?, ?, ?, ?)',
+            (sheet_name, start_row, base_ts, interval)
+        ).lastrowid
+        
+        # Claves enteras consecutivas para los sensores de la hoja
+        codes, sensor_ids = pd.factorize(df['sensor_id'])
+        first_key = conn.execute('SELECT COALESCE(MAX(sensor_key), 0) + 1 FROM sensors').fetchone()[0]
+        first_row = np.unique(codes, return_index=True)[1]
+        self._insert_rows(conn, 'sensors', ['sensor_key', 'sensor_id', 'sheet_key', 'sensor_number'],
+                          zip(range(first_key, first_key + len(sensor_ids)), list(sensor_ids),
+                              itertools.repeat(sheet_key), sensor_number[first_row].tolist()), chunk_size)
+        
+        # Insertar en el orden de la clave primaria evita reordenar el árbol B
+        sensor_keys = codes + first_key
+        order = np.lexsort((ts, sensor_keys))
+        voltage = voltage_array(df['voltage'])
+        return self._insert_rows(conn, 'readings', ['sensor_key', 'ts', 'voltage'],
+                                 zip(sensor_keys[order].tolist(), ts[order].tolist(), voltage[order].tolist()),
+                                 chunk_size)
+    
+    def _connect(self, db_path: str) -> sqlite3.Connection:
+        """Conexión con los pragmas de escritura (WAL + synchronous=NORMAL)"""
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+    
+    def _execute_script(self, conn: sqlite3.Connection, script: str):
+        """Ejecuta varias sentencias sin confirmar la transacción (a diferencia de executescript)"""
+        for statement in script.split(';'):
+            if statement.strip():
+                conn.execute(statement)
+    
+    @contextmanager
+    def _transaction(self, conn: sqlite3.Connection):
+        """Transacción explícita sobre una conexión en modo autocommit"""
+        conn.execute('BEGIN')
+        try:
+            yield conn
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+    
+    def _readings_rows(self, df: pd.DataFrame) -> Iterable[tuple]:
+        """Tuplas de sensor_readings con el timestamp en segundos desde epoch"""
+        columns = []
+        for col in READINGS_COLUMNS:
+            if col == 'timestamp':
+                values = df[col].to_numpy(dtype='datetime64[s]').astype('int64')
+            elif col == 'voltage':
+                values = voltage_array(df[col])
+            else:
+                values = df[col].to_numpy()
+            # tolist() convierte a escalares de Python, que sqlite3 sabe enlazar
+            columns.append(values.tolist())
+        return zip(*columns)
+    
+    def _statistics_rows(self, sheet_name: str, data: Dict) -> List[Dict]:
+        """Filas de la tabla sensor_statistics para una hoja"""
+        stats_data = []
+        for sensor_id, stats in (data['statistics'] or {}).items():
+            stats_data.append({
+                'sensor_id': sensor_id,
+                'sheet_name': sheet_name,
+                'count': stats.get('count', 0),
+                'mean': stats.get('mean', 0),
+                'median': stats.get('median', 0),
+                'std': stats.get('std', 0),
+                'min': stats.get('min', 0),
+                'max': stats.get('max', 0),
+                'q25': stats.get('q25', 0),
+                'q75': stats.get('q75', 0),
+                'outliers_count': stats.get('outliers_count', 0)
+            })
+        return stats_data
+    
+    def _quality_row(self, sheet_name: str, data: Dict) -> Dict:
+        """Fila de la tabla quality_metrics para una hoja"""
+        metrics = data['quality_metrics']
+        return {
+            'sheet_name': sheet_name,
+            'completeness': metrics.get('completeness', 0),
+            'unique_sensors': metrics.get('unique_sensors', 0),
+            'total_readings': metrics.get('total_readings', 0),
+            'min_voltage': metrics.get('value_range', {}).get('min_voltage', 0),
+            'max_voltage': metrics.get('value_range', {}).get('max_voltage', 0),
+            'mean_voltage': metrics.get('value_range', {}).get('mean_voltage', 0)
+        }
+    
+    def _sheet_partial(self, sheet_name: str, data: Dict) -> Dict:
+        """Fila de sheet_partials desde el resumen combinable de la hoja (ver sheet_summary)"""
+        summary = data['summary']
+        return {
+            'sheet_name': sheet_name,
+            'readings': summary['readings'],
+            'voltage_mean': summary['voltage_mean'],
+            'voltage_m2': summary['voltage_m2'],
+            'voltage_min': summary['voltage_min'],
+            'voltage_max': summary['voltage_max'],
+            'sensors': len(summary['sensors'])
+        }
+    
+    def _insert_rows(self, conn: sqlite3.Connection, table: str, columns: List[str], rows: Iterable,
+                     chunk_size: int = 50000, verb: str = 'INSERT') -> int:
+        """INSERT preparado de varias filas en lotes (sin confirmar la transacción)"""
+        column_list = ', '.join(f'"{col}"' for col in columns)
+        placeholders = ', '.join('?' for _ in columns)
+        sql = f'{verb} INTO "{table}" ({column_list}) VALUES ({placeholders})'
+        
+        total = 0
+        rows = iter(rows)
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                return total
+            conn.executemany(sql, chunk)
+            total += len(chunk)
+    
+    def _rollup_rows(self, df: pd.DataFrame) -> Iterable[tuple]:
+        """Filas de sensor_rollups (todas las granularidades) para un lote de lecturas"""
+        voltage = voltage_array(df['voltage'])
+        frame = pd.DataFrame({
+            'sensor_id': df['sensor_id'].to_numpy(),
+            'sheet_name': df['sheet_name'].to_numpy(),
+            'timestamp': df['timestamp'].to_numpy(dtype='datetime64[s]').astype('int64'),
+            'voltage': voltage
+        })
+        
+        for bucket_seconds in ROLLUP_BUCKETS:
+            frame['bucket_start'] = frame['timestamp'] // bucket_seconds * bucket_seconds
+            rollup = frame.groupby(['sensor_id', 'bucket_start', 'sheet_name'], sort=False).agg(
+                readings=('voltage', 'size'),
+                voltage_sum=('voltage', 'sum'),
+                voltage_m2=('voltage', 'var'),
+                voltage_min=('voltage', 'min'),
+                voltage_max=('voltage', 'max')
+            ).reset_index()
+            # var (muestral) a M2; un bucket de una lectura no tiene dispersión
+            rollup['voltage_m2'] = (rollup['voltage_m2'] * (rollup['readings'] - 1)).fillna(0.0)
+            rollup.insert(0, 'bucket_seconds', bucket_seconds)
+            yield from zip(*(rollup[col].tolist() for col in rollup.columns))
+    
+    def _merge_rollups(self, conn: sqlite3.Connection, df: pd.DataFrame, chunk_size: int = 50000) -> int:
+        """Suma las lecturas a los buckets de sensor_rollups (sin confirmar la transacción)"""
+        total = 0
+        rows = self._rollup_rows(df)
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                return total
+            conn.executemany(ROLLUP_UPSERT, chunk)
+            total += len(chunk)
+    
+    def append_readings(self, df: pd.DataFrame, db_path: str, chunk_size: int = 50000) -> int:
+        """
+        Agrega lecturas nuevas a sensor_readings y las combina en sensor_rollups
+        
+        Lecturas y rollups se escriben en la misma transacción, así que los
+        buckets siempre corresponden a las lecturas guardadas. No recalcula
+        sensor_statistics ni quality_metrics (eso lo hace la carga por hoja).
+        Si la base no existe se crea con el esquema tipado.
+        
+        Args:
+            df: Lecturas con las columnas de READINGS_COLUMNS
+            db_path: Ruta a la base SQLite
+            chunk_size: Filas por llamada a executemany
+            
+        Returns:
+            Número de lecturas insertadas
+        """
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        
+        conn = self._connect(db_path)
+        try:
+            with self._transaction(conn):
+                if self._needs_typed_schema(conn, db_path):
+                    self._execute_script(conn, SCHEMA + INDEXES)
+                    conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+                
+                if df.empty:
+                    return 0
+                rows = self._insert_rows(conn, 'sensor_readings', READINGS_COLUMNS, self._readings_rows(df), chunk_size)
+                self._merge_rollups(conn, df, chunk_size)
+            return rows
+        finally:
+            conn.close()
+    
+    def check_append_target(self, db_path: str):
+        """
+        Verifica, sin modificar la base, que append_readings pueda escribir en ella
+        
+        Raises:
+            ValueError: La base existe con otro esquema (normalizado, to_sql
+                o una versión anterior del tipado)
+        """
+        if not os.path.exists(db_path):
+            return
+        conn = sqlite3.connect(db_path)
+        try:
+            self._needs_typed_schema(conn, db_path)
+        finally:
+            conn.close()
+    
+    def _needs_typed_schema(self, conn: sqlite3.Connection, db_path: str) -> bool:
+        """True si la base está vacía y hay que crear el esquema tipado; ValueError si usa otro"""
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version == 0 and not conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sensor_readings'").fetchone():
+            return True
+        if version == NORMALIZED_SCHEMA_VERSION:
+            raise ValueError(f"{db_path} usa el esquema normalizado (vista sensor_readings), donde no se "
+                             f"pueden agregar lecturas; ejecute una carga completa sin --normalized")
+        if version != SCHEMA_VERSION:
+            raise ValueError(f"{db_path} no usa el esquema tipado v{SCHEMA_VERSION} "
+                             f"(user_version={version}); ejecute una carga completa")
+        return False
+    
+    def save_anomalies(self, events: pd.DataFrame, db_path: str, replace: bool = False,
+                       chunk_size: int = 50000) -> int:
+        """
+        Guarda eventos de AnomalyDetector en la tabla anomalies
+        
+        Args:
+            events: DataFrame con las columnas de ANOMALY_COLUMNS
+            db_path: Ruta a la base SQLite
+            replace: Borrar antes los eventos existentes (detección en lote)
+            chunk_size: Filas por llamada a executemany
+            
+        Returns:
+            Número de eventos guardados
+        """
+        conn = self._connect(db_path)
+        try:
+            with self._transaction(conn):
+                self._execute_script(conn, ANOMALIES_SCHEMA)
+                if replace:
+                    conn.execute('DELETE FROM anomalies')
+                if events.empty:
+                    return 0
+                columns = [events[col].to_numpy(dtype='datetime64[s]').astype('int64').tolist() if col == 'timestamp'
+                           else events[col].tolist() for col in ANOMALY_COLUMNS]
+                # Un evento repetido (misma lectura recibida dos veces) reemplaza al anterior
+                return self._insert_rows(conn, 'anomalies', ANOMALY_COLUMNS, zip(*columns), chunk_size,
+                                         verb='INSERT OR REPLACE')
+        finally:
+            conn.close()
+    
+    def query_rollup(self, db_path: str, start, end, resolution: int,
+                     sensor_ids: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """
+        Agregados por sensor en buckets de `resolution` segundos dentro de [start, end)
+        
+        Usa el rollup más grueso que sirve para el rango y la resolución
+        pedidos; si ninguno sirve (p. ej. resolution menor a 5 minutos o un
+        rango no alineado) agrega directamente las lecturas crudas.
+        
+        Args:
+            db_path: Ruta a la base SQLite
+            start: Inicio del rango (incluido), datetime o segundos desde epoch
+            end: Fin del rango (excluido), datetime o segundos desde epoch
+            resolution: Ancho de cada bucket del resultado, en segundos
+            sensor_ids: Sensores a incluir (por defecto todos)
+            
+        Returns:
+            DataFrame con sensor_id, bucket_start (segundos desde epoch),
+            readings, mean, std, min y max
+        """
+        start, end, resolution = to_epoch(start), to_epoch(end), int(resolution)
+        bucket_seconds = pick_rollup(start, end, resolution)
+        
+        # Partes a combinar en cada bucket del resultado: rollups o lecturas sueltas
+        # (una lectura es una parte con M2 = 0)
+        if bucket_seconds is not None:
+            parts = ('SELECT sensor_id, bucket_start / :resolution * :resolution AS bucket, readings, '
+                     'voltage_sum, voltage_m2, voltage_min, voltage_max '
+                     'FROM sensor_rollups WHERE bucket_seconds = :bucket_seconds '
+                     'AND bucket_start >= :start AND bucket_start < :end')
+        else:
+            parts = ('SELECT sensor_id, "timestamp" / :resolution * :resolution AS bucket, 1 AS readings, '
+                     'voltage AS voltage_sum, 0.0 AS voltage_m2, voltage AS voltage_min, voltage AS voltage_max '
+                     'FROM sensor_readings WHERE "timestamp" >= :start AND "timestamp" < :end')
+        params = {'resolution': resolution, 'bucket_seconds': bucket_seconds, 'start': start, 'end': end}
+        
+        if sensor_ids is not None:
+            sensor_ids = list(sensor_ids)
+            names = [f'sensor_{i}' for i in range(len(sensor_ids))]
+            parts += f" AND sensor_id IN ({', '.join(':' + name for name in names)})"
+            params.update(zip(names, sensor_ids))
+        
+        # M2 del bucket con la fórmula de Chan: Σ M2_i + Σ n_i · (media_i - media)²,
+        # con la media del bucket calculada por una ventana sobre sus partes
+        sql = ('SELECT sensor_id, bucket, SUM(readings), SUM(voltage_sum), '
+               'SUM(voltage_m2 + readings * (voltage_sum / readings - bucket_mean) '
+               '* (voltage_sum / readings - bucket_mean)), MIN(voltage_min), MAX(voltage_max) '
+               f'FROM (SELECT *, SUM(voltage_sum) OVER bucket_parts / SUM(readings) OVER bucket_parts AS bucket_mean '
+               f'FROM ({parts}) WINDOW bucket_parts AS (PARTITION BY sensor_id, bucket)) '
+               'GROUP BY sensor_id, bucket ORDER BY sensor_id, bucket')
+        
+        conn = sqlite3.connect(db_path)
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+        source = f"rollup de {bucket_seconds} s" if bucket_seconds else "lecturas crudas"
+        logger.debug(f"query_rollup: {len(rows)} buckets desde {source}")
+        
+        result = pd.DataFrame(rows, columns=['sensor_id', 'bucket_start', 'readings', 'voltage_sum',
+                                             'voltage_m2', 'min', 'max'])
+        count = result['readings'].to_numpy(dtype='float64')
+        result['mean'] = result['voltage_sum'].to_numpy(dtype='float64') / count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variance = result['voltage_m2'].to_numpy(dtype='float64') / (count - 1)
+        result['std'] = np.where(count > 1, np.sqrt(np.maximum(variance, 0.0)), np.nan)
+        return result[['sensor_id', 'bucket_start', 'readings', 'mean', 'std', 'min', 'max']]
+    
+    def get_sheet_fingerprints(self, db_path: str) -> Dict[str, str]:
+        """Huellas de las hojas cargadas en la última ejecución incremental"""
+        if not os.path.exists(db_path):
+            return {}
+        
+        conn = sqlite3.connect(db_path)
+        try:
+            # Con otro esquema todas las hojas se consideran modificadas
+            if conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+                return {}
+            return dict(conn.execute('SELECT sheet_name, fingerprint FROM sheet_fingerprints'))
+        except sqlite3.OperationalError:
+            # La base fue creada por una carga completa, sin tablas de control
+            return {}
+        finally:
+            conn.close()
+    
+    def load_incremental(self, transformed_data: Dict, db_path: str, fingerprints: Dict[str, str],
+                         removed_sheets: Optional[Iterable[str]] = None):
+        """
+        Carga incremental: reemplaza solo las filas de las hojas recibidas
+        
+        Cada hoja se reemplaza en su propia transacción (DELETE por sheet_name
+        + INSERT) en sensor_readings, sensor_statistics y quality_metrics, y
+        se guardan su huella y sus agregados parciales en sheet_fingerprints
+        y sheet_partials. Las hojas que ya no existen en el libro se eliminan.
+        
+        Args:
+            transformed_data: Solo las hojas nuevas o modificadas
+            db_path: Ruta a la base SQLite
+            fingerprints: Huella de cada hoja de transformed_data
+            removed_sheets: Hojas que ya no están en el libro
+        """
+        try:
+            os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+            
+            conn = self._connect(db_path)
+            logger.info(f"Conectado a base de datos: {db_path}")
+            
+            with self._transaction(conn):
+                if conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+                    # Base creada con DataFrame.to_sql (timestamp TEXT) o normalizada:
+                    # se recrea con el esquema tipado
+                    logger.info("Esquema distinto detectado, se recrean las tablas")
+                    self._drop_data_objects(conn)
+                self._execute_script(conn, SCHEMA)
+                conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+            
+            for sheet_name in removed_sheets or []:
+                with self._transaction(conn):
+                    self._delete_sheet(conn, sheet_name)
+                    conn.execute('DELETE FROM sheet_fingerprints WHERE sheet_name = ?', (sheet_name,))
+                logger.info(f"  ✗ {sheet_name}: eliminada (ya no está en el libro)")
+            
+            loaded_at = datetime.now().isoformat()
+            for sheet_name, data in transformed_data.items():
+                df = data['data']
+                
+                # Todo o nada por hoja: si algo falla se conserva la versión anterior
+                with stage(self.metrics, f"load/{sheet_name}", rows=len(df)), self._transaction(conn):
+                    self._delete_sheet(conn, sheet_name)
+                    
+                    if not df.empty:
+                        self._insert_rows(conn, 'sensor_readings', READINGS_COLUMNS, self._readings_rows(df))
+                        self._merge_rollups(conn, df)
+                    
+                    stats_rows = self._statistics_rows(sheet_name, data)
+                    self._insert_rows(conn, 'sensor_statistics', STATISTICS_COLUMNS,
+                                      ([row[col] for col in STATISTICS_COLUMNS] for row in stats_rows))
+                    
+                    if data['quality_metrics']:
+                        quality_row = self._quality_row(sheet_name, data)
+                        self._insert_rows(conn, 'quality_metrics', QUALITY_COLUMNS,
+                                          [[quality_row[col] for col in QUALITY_COLUMNS]])
+                    
+                    partial = self._sheet_partial(sheet_name, data)
+                    conn.execute(
+                        'INSERT OR REPLACE INTO sheet_partials VALUES (:sheet_name, :readings, :voltage_mean, '
+                        ':voltage_m2, :voltage_min, :voltage_max, :sensors)', partial
+                    )
+                    conn.execute('INSERT OR REPLACE INTO sheet_fingerprints VALUES (?, ?, ?)',
+                                 (sheet_name, fingerprints[sheet_name], loaded_at))
+                
+                logger.info(f"  ✓ {sheet_name}: {len(df)} registros reemplazados")
+            
+            self._execute_script(conn, INDEXES)
+            conn.close()
+            logger.info(f"✅ Carga incremental completada ({len(transformed_data)} hojas actualizadas)")
+            
+        except Exception as e:
+            logger.error(f"❌ Error en carga incremental: {e}")
+            raise
+    
+    def _delete_sheet(self, conn: sqlite3.Connection, sheet_name: str):
+        """Elimina todas las filas de una hoja en las tablas de datos"""
+        self._execute_script(conn, ANOMALIES_SCHEMA)
+        for table in ('sensor_readings', 'sensor_statistics', 'quality_metrics', 'sheet_partials', 'sensor_rollups',
+                      'anomalies'):
+            conn.execute(f'DELETE FROM "{table}" WHERE sheet_name = ?', (sheet_name,))
+    
+    def get_cross_sheet_summary(self, db_path: str) -> Dict:
+        """
+        Resumen global calculado a partir de sheet_partials y sensor_statistics
+        
+        Devuelve la misma estructura que DataTransformer.analysis_results['cross_sheet']
+        sin volver a leer las lecturas individuales.
+        """
+        conn = sqlite3.connect(db_path)
+        try:
+            # Una fila por hoja: los momentos se combinan en Python (ver combine_moments)
+            partials = conn.execute(
+                'SELECT readings, voltage_mean, voltage_m2, voltage_min, voltage_max '
+                'FROM sheet_partials WHERE readings > 0'
+            ).fetchall()
+            sensors_by_sheet = dict(conn.execute(
+                'SELECT sheet_name, COUNT(DISTINCT sensor_id) FROM sensor_statistics GROUP BY sheet_name'
+            ))
+            total_sensors = conn.execute('SELECT COUNT(DISTINCT sensor_id) FROM sensor_statistics').fetchone()[0]
+        finally:
+            conn.close()
+        
+        if not partials:
+            return {}
+        
+        readings, mean, m2 = combine_moments([partial[:3] for partial in partials])
+        v_min = min(partial[3] for partial in partials)
+        v_max = max(partial[4] for partial in partials)
+        return {
+            'total_sensors': total_sensors,
+            'total_readings': readings,
+            'global_stats': global_voltage_stats(readings, mean, m2, v_min, v_max),
+            'sensors_by_sheet': sensors_by_sheet
+        }
+    
     def load_to_csv(self, transformed_data: Dict, output_dir: str):
         """Carga los datos transformados a archivos CSV"""
         try:
@@ -111,6 +925,43 @@ class DataLoader:
             logger.error(f"❌ Error exportando a CSV: {e}")
             raise
 
+    def load_to_columnar(self, transformed_data: Dict, output_dir: str, append: bool = False,
+                         workers: int = 4, file_format: str = 'auto') -> Dict:
+        """
+        Exporta las lecturas a un dataset columnar particionado por hoja y fecha
+        
+        Ver columnar.ColumnarDataset: Parquet con zstd si pyarrow está
+        instalado, o .npz comprimido por columna en caso contrario.
+        
+        Args:
+            transformed_data: Salida de DataTransformer.transform_sensor_data
+            output_dir: Carpeta del dataset
+            append: Agregar un lote nuevo en lugar de reemplazar el dataset
+            workers: Hilos para escribir particiones en paralelo
+            file_format: 'parquet', 'npz' o 'auto'
+            
+        Returns:
+            Dict con lote, partes y filas escritas
+        """
+        from columnar import ColumnarDataset
+        
+        try:
+            dataset = ColumnarDataset(output_dir, file_format)
+            if not append:
+                dataset.clear()
+            
+            frames = [data['data'] for data in transformed_data.values() if not data['data'].empty]
+            with stage(self.metrics, "load/columnar", rows=sum(len(df) for df in frames)):
+                result = dataset.write(frames, workers)
+            
+            logger.info(f"✅ Datos exportados a {output_dir} ({dataset.file_format}, "
+                        f"{result['parts']} particiones)")
+            return result
+            
+        except Exception as e:
+            logger.error(f"❌ Error exportando a formato columnar: {e}")
+            raise
+
 if __name__ == "__main__":
     # Ejemplo de uso
     loader = DataLoader()
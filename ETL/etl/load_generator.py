@@ -0,0 +1,132 @@
+# load_generator.py
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+from datetime import datetime
+from typing import Iterator, List
+
+import pandas as pd
+
+DEFAULT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'output', 'all_sensor_data.csv')
+
+def load_lines(file_path: str, line_format: str, live_timestamps: bool) -> List[str]:
+    """Lee all_sensor_data.csv y lo convierte en líneas NDJSON o CSV listas para enviar"""
+    df = pd.read_csv(file_path, dtype=str)
+    if live_timestamps:
+        # Desplazar los timestamps para que la primera lectura sea "ahora"
+        timestamps = pd.to_datetime(df['timestamp'])
+        df['timestamp'] = (timestamps - timestamps.min() + pd.Timestamp(datetime.now()).floor('s')).astype(str)
+
+    if line_format == 'ndjson':
+        return [json.dumps(record) for record in df.to_dict('records')]
+    return [','.join(df.columns)] + df.to_csv(index=False, header=False).splitlines()
+
+class Sender:
+    """Envía bloques de líneas a tcp://host:puerto, udp://host:puerto o a un archivo"""
+
+    def __init__(self, target: str, header: str = ''):
+        # Cada datagrama UDP se procesa por separado, así que lleva su propio encabezado CSV
+        self.header = header
+        scheme, _, address = target.partition('://')
+        self.scheme = scheme
+        if scheme in ('tcp', 'udp'):
+            host, _, port = address.rpartition(':')
+            self.address = (host or '127.0.0.1', int(port))
+            kind = socket.SOCK_STREAM if scheme == 'tcp' else socket.SOCK_DGRAM
+            self.sock = socket.socket(socket.AF_INET, kind)
+            if scheme == 'tcp':
+                self.sock.connect(self.address)
+        elif scheme == 'file':
+            self.file = open(address, 'a', encoding='utf-8')
+        else:
+            raise ValueError(f"Destino no soportado: {target} (use tcp://, udp:// o file://)")
+
+    def send(self, lines: List[str]):
+        payload = '\n'.join(lines) + '\n'
+        if self.scheme == 'tcp':
+            # sendall se bloquea si el servicio aplica contrapresión
+            self.sock.sendall(payload.encode('utf-8'))
+        elif self.scheme == 'udp':
+            # Datagramas de a lo sumo ~8 KB con líneas completas (sin fragmentación IP en loopback)
+            prefix = [self.header] if self.header else []
+            batch, size = list(prefix), 0
+            for line in lines:
+                if size + len(line) > 8000 and len(batch) > len(prefix):
+                    self.sock.sendto(('\n'.join(batch) + '\n').encode('utf-8'), self.address)
+                    batch, size = list(prefix), 0
+                batch.append(line)
+                size += len(line) + 1
+            if len(batch) > len(prefix):
+                self.sock.sendto(('\n'.join(batch) + '\n').encode('utf-8'), self.address)
+        else:
+            self.file.write(payload)
+            self.file.flush()
+
+    def close(self):
+        if self.scheme == 'file':
+            self.file.close()
+        else:
+            self.sock.close()
+
+def paced_batches(lines: List[str], rate: float, loops: int, tick: float = 0.01) -> Iterator[List[str]]:
+    """Reparte las líneas en bloques por tick para sostener `rate` líneas/s (0 = sin límite)"""
+    per_tick = max(int(rate * tick), 1) if rate > 0 else 5000
+    start = time.perf_counter()
+    sent = 0
+    for _ in range(loops):
+        for offset in range(0, len(lines), per_tick):
+            batch = lines[offset:offset + per_tick]
+            yield batch
+            sent += len(batch)
+            if rate > 0:
+                # Dormir hasta el instante en que deberían haberse enviado `sent` líneas
+                delay = sent / rate - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproduce all_sensor_data.csv contra el servicio de ingesta")
+    parser.add_argument('--target', default='tcp://127.0.0.1:9009',
+                        help="Destino: tcp://host:puerto, udp://host:puerto o file://ruta")
+    parser.add_argument('--file', default=DEFAULT_FILE, help="CSV de lecturas a reproducir")
+    parser.add_argument('--format', choices=('csv', 'ndjson'), default='ndjson', help="Formato de las líneas")
+    parser.add_argument('--rate', type=float, default=10000, help="Lecturas por segundo (0 = sin límite)")
+    parser.add_argument('--loops', type=int, default=1, help="Veces que se repite el archivo")
+    parser.add_argument('--live-timestamps', action='store_true',
+                        help="Desplazar los timestamps para que empiecen en la hora actual")
+    args = parser.parse_args()
+
+    lines = load_lines(args.file, args.format, args.live_timestamps)
+    header = ''
+    if args.format == 'csv':
+        header, lines = lines[0], lines[1:]
+
+    sender = Sender(args.target, header)
+    if header and sender.scheme != 'udp':
+        sender.send([header])
+
+    start = time.perf_counter()
+    sent = 0
+    last_report = start
+    try:
+        for batch in paced_batches(lines, args.rate, args.loops):
+            sender.send(batch)
+            sent += len(batch)
+            now = time.perf_counter()
+            if now - last_report >= 1.0:
+                print(f"  {sent} lecturas enviadas ({sent / (now - start):,.0f}/s)")
+                last_report = now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sender.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ {sent} lecturas en {elapsed:.2f} s ({sent / elapsed:,.0f} lecturas/s sostenidas)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
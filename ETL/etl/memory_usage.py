@@ -0,0 +1,37 @@
+# memory_usage.py
+import logging
+import sys
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    Pico de memoria residente (RSS) del proceso actual en MB
+
+    Usa resource.getrusage en Linux/macOS y psutil (si está instalado) en
+    el resto de plataformas. Devuelve None si no hay forma de medirlo.
+    """
+    try:
+        import resource
+    except ImportError:
+        resource = None
+
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss está en KB en Linux y en bytes en macOS
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+    try:
+        import psutil
+    except ImportError:
+        logger.debug("Sin resource ni psutil: no se puede medir la memoria")
+        return None
+
+    info = psutil.Process().memory_info()
+    # En Windows peak_wset es el pico del working set; en otros, el RSS actual
+    return getattr(info, 'peak_wset', info.rss) / (1024 * 1024)
+
+def format_mb(value: Optional[float]) -> str:
+    """Texto para los logs: '123.4 MB' o 'n/d' si no se pudo medir"""
+    return f"{value:.1f} MB" if value is not None else "n/d"
@@ -0,0 +1,288 @@
+# online_stats.py
+import math
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from Transform import voltage_array
+
+STATISTICS_COLUMNS = ['count', 'mean', 'median', 'std', 'min', 'max', 'q25', 'q75', 'outliers_count']
+
+class TDigest:
+    """
+    Sketch de cuantiles t-digest (variante "merging"), combinable y con
+    memoria acotada.
+
+    El estado son dos arreglos NumPy (medias y pesos de los centroides).
+    Mientras haya hasta buffer_size valores (5 · compression por defecto)
+    se guardan tal cual, así que los cuantiles son exactos (misma
+    interpolación lineal que Series.quantile). Al pasar ese tamaño se
+    comprimen a unos compression / 2 centroides con la función de escala
+    k1, que deja centroides chicos en las colas y grandes en el centro; los
+    valores y digests que llegan después se acumulan de nuevo hasta
+    buffer_size, así que la memoria llega a unas 5 · compression entradas.
+    Antes de responder cuantiles o conteos se comprime lo acumulado:
+    interpolar entre centroides superpuestos de distintos digests da
+    bastante más error.
+    """
+
+    __slots__ = ('compression', 'buffer_size', 'means', 'weights', 'count', 'min', 'max', '_sorted',
+                 '_compressed')
+
+    def __init__(self, compression: float = 200, buffer_size: Optional[int] = None):
+        self.compression = compression
+        self.buffer_size = buffer_size or int(5 * compression)
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._sorted = True
+        self._compressed = True
+
+    def update(self, values: np.ndarray):
+        """Agrega un lote de valores (sin NaN)"""
+        values = np.asarray(values, dtype='float64')
+        if len(values) == 0:
+            return
+        self.means = np.concatenate((self.means, values))
+        self.weights = np.concatenate((self.weights, np.ones(len(values))))
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._sorted = False
+        self._compressed = False
+        if len(self.means) > self.buffer_size:
+            self._compress()
+
+    def merge(self, other: 'TDigest'):
+        """Combina otro digest en este"""
+        if other.count == 0:
+            return
+        self.means = np.concatenate((self.means, other.means))
+        self.weights = np.concatenate((self.weights, other.weights))
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._sorted = False
+        self._compressed = False
+        if len(self.means) > self.buffer_size:
+            self._compress()
+
+    def _sort(self):
+        if not self._sorted:
+            order = np.argsort(self.means, kind='mergesort')
+            self.means = self.means[order]
+            self.weights = self.weights[order]
+            self._sorted = True
+
+    def _compress(self):
+        """Une centroides vecinos mientras abarquen menos de una unidad de k1"""
+        self._sort()
+        weights = self.weights
+        q_left = (np.cumsum(weights) - weights) / self.count
+        k = self.compression / (2 * math.pi) * np.arcsin(2 * q_left - 1)
+        group = np.floor(k - k[0]).astype('int64')
+
+        starts = np.flatnonzero(np.concatenate(([True], group[1:] != group[:-1])))
+        merged_weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(self.means * weights, starts) / merged_weights
+        self.weights = merged_weights
+        self._compressed = True
+
+    def _prepare(self):
+        """Ordena y, si ya no es exacto, comprime lo acumulado desde la última compresión"""
+        if not self.exact and not self._compressed:
+            self._compress()
+        self._sort()
+
+    @property
+    def exact(self) -> bool:
+        """True mientras todos los centroides sean valores individuales"""
+        return len(self.weights) == self.count
+
+    def quantile(self, q: float) -> float:
+        """Cuantil q (interpolación lineal entre centros de centroides)"""
+        if self.count == 0:
+            return math.nan
+        self._prepare()
+        position = q * (self.count - 1)
+        if self.exact:
+            return float(np.interp(position, np.arange(self.count), self.means))
+
+        # Posición (rango base 0) del centro de cada centroide
+        centers = np.cumsum(self.weights) - self.weights + (self.weights - 1) / 2
+        xp, fp = self._with_extremes(centers, self.means)
+        return float(np.interp(position, xp, fp))
+
+    def count_below(self, value: float) -> float:
+        """Cantidad (estimada) de valores estrictamente menores que value"""
+        if self.count == 0 or value <= self.min:
+            return 0.0
+        if value > self.max:
+            return float(self.count)
+        self._prepare()
+        if self.exact:
+            return float(np.searchsorted(self.means, value, side='left'))
+
+        centers = np.cumsum(self.weights) - self.weights / 2
+        fp, xp = self._with_extremes(centers, self.means, low=0.0, high=float(self.count))
+        return float(np.interp(value, xp, fp))
+
+    def count_above(self, value: float) -> float:
+        """Cantidad (estimada) de valores estrictamente mayores que value"""
+        if self.count == 0 or value >= self.max:
+            return 0.0
+        if value < self.min:
+            return float(self.count)
+        self._prepare()
+        if self.exact:
+            return float(self.count - np.searchsorted(self.means, value, side='right'))
+        return self.count - self.count_below(value)
+
+    def _with_extremes(self, positions: np.ndarray, values: np.ndarray, low: float = 0.0,
+                       high: Optional[float] = None):
+        """Agrega (low, min) y (high, max) en los extremos para interpolar"""
+        high = self.count - 1 if high is None else high
+        if positions[0] > low:
+            positions = np.concatenate(([low], positions))
+            values = np.concatenate(([self.min], values))
+        if positions[-1] < high:
+            positions = np.concatenate((positions, [high]))
+            values = np.concatenate((values, [self.max]))
+        return positions, values
+
+    @property
+    def nbytes(self) -> int:
+        return self.means.nbytes + self.weights.nbytes
+
+class SensorAccumulator:
+    """
+    Estadísticas en línea de un sensor: media y varianza con Welford
+    (combinando lotes con la fórmula de Chan), mínimo, máximo y un t-digest
+    para mediana, q25, q75 y outliers IQR.
+
+    Dos acumuladores de distintos fragmentos, hojas o procesos se combinan
+    con merge y dan el mismo resultado que si se hubieran procesado juntos
+    (exacto mientras el digest no se comprima).
+    """
+
+    __slots__ = ('count', 'mean', 'm2', 'min', 'max', 'digest')
+
+    def __init__(self, compression: float = 200):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.digest = TDigest(compression)
+
+    def update(self, values: np.ndarray):
+        """Agrega un lote de voltajes (los NaN se ignoran)"""
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        batch_mean = float(values.mean())
+        batch_m2 = float(np.square(values - batch_mean).sum())
+        self._combine(len(values), batch_mean, batch_m2, float(values.min()), float(values.max()))
+        self.digest.update(values)
+
+    def merge(self, other: 'SensorAccumulator'):
+        """Combina otro acumulador en este"""
+        if other.count == 0:
+            return
+        self._combine(other.count, other.mean, other.m2, other.min, other.max)
+        self.digest.merge(other.digest)
+
+    def _combine(self, count: int, mean: float, m2: float, v_min: float, v_max: float):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = min(self.min, v_min)
+        self.max = max(self.max, v_max)
+
+    def statistics(self) -> Dict:
+        """Mismas claves que una fila de sensor_statistics"""
+        q25 = self.digest.quantile(0.25)
+        q75 = self.digest.quantile(0.75)
+
+        # Outliers IQR (sensores con menos de 4 lecturas no cuentan)
+        outliers = 0
+        if self.count >= 4:
+            iqr = q75 - q25
+            outliers = int(round(self.digest.count_below(q25 - 1.5 * iqr)
+                                 + self.digest.count_above(q75 + 1.5 * iqr)))
+
+        return {
+            'count': self.count,
+            'mean': self.mean if self.count else math.nan,
+            'median': self.digest.quantile(0.5),
+            'std': math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else math.nan,
+            'min': self.min if self.count else math.nan,
+            'max': self.max if self.count else math.nan,
+            'q25': q25,
+            'q75': q75,
+            'outliers_count': outliers
+        }
+
+    @property
+    def nbytes(self) -> int:
+        """Memoria del estado variable (arreglos del digest)"""
+        return self.digest.nbytes
+
+class StatisticsAccumulator:
+    """
+    Acumuladores por sensor_id. Se alimenta con lotes de (sensor_id, voltage)
+    y produce el mismo diccionario que DataTransformer._calculate_statistics.
+    """
+
+    def __init__(self, compression: float = 200):
+        self.compression = compression
+        self.sensors: Dict[str, SensorAccumulator] = {}
+
+    def update(self, keys: pd.Series, values: pd.Series):
+        """Agrega un lote de lecturas agrupándolas por sensor en una sola pasada"""
+        valid = values.notna().to_numpy()
+        codes, sensor_ids = pd.factorize(keys[valid])
+        if len(sensor_ids) == 0:
+            return
+        voltages = voltage_array(values[valid])
+
+        order = np.argsort(codes, kind='stable')
+        bounds = np.cumsum(np.bincount(codes, minlength=len(sensor_ids)))[:-1]
+        for sensor_id, group in zip(sensor_ids, np.split(voltages[order], bounds)):
+            accumulator = self.sensors.get(sensor_id)
+            if accumulator is None:
+                accumulator = self.sensors[sensor_id] = SensorAccumulator(self.compression)
+            accumulator.update(group)
+
+    def update_frame(self, df: pd.DataFrame):
+        """Agrega las lecturas de un DataFrame con columnas sensor_id y voltage"""
+        if not df.empty:
+            self.update(df['sensor_id'], df['voltage'])
+
+    def merge(self, other: 'StatisticsAccumulator'):
+        """Combina los acumuladores de otro fragmento, hoja o proceso"""
+        for sensor_id, accumulator in other.sensors.items():
+            own = self.sensors.get(sensor_id)
+            if own is None:
+                own = self.sensors[sensor_id] = SensorAccumulator(self.compression)
+            own.merge(accumulator)
+
+    def to_frame(self) -> pd.DataFrame:
+        """DataFrame indexado por sensor_id (orden alfabético, como _grouped_statistics)"""
+        sensor_ids = sorted(self.sensors)
+        return pd.DataFrame([self.sensors[sensor_id].statistics() for sensor_id in sensor_ids],
+                            index=pd.Index(sensor_ids, name='sensor_id'), columns=STATISTICS_COLUMNS)
+
+    def to_dict(self) -> Dict:
+        """Mismo formato que DataTransformer._calculate_statistics"""
+        return self.to_frame().to_dict('index')
+
+    @property
+    def nbytes(self) -> int:
+        return sum(accumulator.nbytes for accumulator in self.sensors.values())
@@ -0,0 +1,63 @@
+# parallel.py
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Tuple
+
+from extract import DataExtractor
+from Transform import DataTransformer
+
+logger = logging.getLogger(__name__)
+
+def process_sheet(file_path: str, sheet_name: str, compact: bool = False,
+                  online_stats: bool = False) -> Tuple[str, Dict, Dict]:
+    """
+    Extrae y transforma una hoja en un proceso independiente
+
+    Returns:
+        Tupla (nombre de hoja, datos transformados, reporte de parseo)
+    """
+    extractor = DataExtractor()
+    transformer = DataTransformer(compact=compact, online_stats=online_stats)
+
+    sheet_data = extractor.extract_sheet(file_path, sheet_name)
+    transformed = transformer.transform_sheet(sheet_name, sheet_data)
+
+    return sheet_name, transformed, transformer.parse_report.get(sheet_name, {})
+
+def extract_and_transform_parallel(file_path: str, workers: int, compact: bool = False,
+                                   online_stats: bool = False) -> DataTransformer:
+    """
+    Reparte extracción + limpieza + estructura + estadísticas de cada hoja en
+    un pool de procesos y une los resultados para el análisis cruzado.
+
+    El resultado es idéntico a la ejecución en serie: las hojas se unen en el
+    mismo orden del libro antes de llamar a finalize_transformation.
+
+    Args:
+        file_path: Ruta al archivo Excel
+        workers: Número de procesos
+        compact: Estructurar las hojas con tipos compactos (además de ocupar
+            menos memoria, reduce lo que se serializa entre procesos)
+        online_stats: Estadísticas por sensor con acumuladores en línea
+            (ver DataTransformer)
+
+    Returns:
+        DataTransformer con transformed_data y analysis_results completos
+    """
+    extractor = DataExtractor()
+    sheet_names = extractor.list_sheets(file_path)
+    logger.info(f"Procesando {len(sheet_names)} hojas con {workers} procesos")
+
+    transformer = DataTransformer(compact=compact, online_stats=online_stats)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(process_sheet, [file_path] * len(sheet_names), sheet_names,
+                               [compact] * len(sheet_names), [online_stats] * len(sheet_names))
+
+        for sheet_name, transformed, parse_failures in results:
+            transformer.transformed_data[sheet_name] = transformed
+            transformer.parse_report[sheet_name] = parse_failures
+
+    transformer.finalize_transformation()
+    logger.info("Transformación paralela completada")
+    return transformer
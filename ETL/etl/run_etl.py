@@ -3,6 +3,8 @@ import logging
 import sys
 import os
 import sqlite3
+import argparse
+from datetime import datetime
 
 # Configurar logging detallado
 logging.basicConfig(
@@ -15,7 +17,100 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def run_etl_pipeline():
+def run_streaming_pipeline(file_path: str, db_path: str, streaming: bool = False,
+                           use_cache: bool = True, normalized: bool = False, metrics=None,
+                           compact: bool = False, online_stats: bool = False) -> bool:
+    """
+    Extracción, transformación y carga hoja por hoja con memoria acotada
+    
+    Las hojas fluyen por un generador: se extrae una, se transforma, se
+    inserta en SQLite y se libera antes de leer la siguiente. El pico de
+    memoria depende de la hoja más grande y no del tamaño del libro.
+    La unidad de streaming es la hoja porque la detección de filas de
+    sensores y los timestamps necesitan la hoja completa.
+    
+    El análisis cruzado entre hojas se calcula al final desde los agregados
+    parciales guardados en sheet_partials.
+    """
+    from extract import DataExtractor
+    from Transform import DataTransformer
+    from load import DataLoader
+    from memory_usage import peak_rss_mb, format_mb
+    
+    logger.info("=== FASES 1-3: EXTRACCIÓN, TRANSFORMACIÓN Y CARGA POR HOJA ===")
+    logger.info(f"🪶 Modo baja memoria (pico inicial: {format_mb(peak_rss_mb())})")
+    
+    cache_dir = os.path.join(os.path.dirname(file_path), '.extract_cache') if use_cache else None
+    extractor = DataExtractor(cache_dir=cache_dir, metrics=metrics)
+    transformer = DataTransformer(metrics=metrics, compact=compact, online_stats=online_stats)
+    loader = DataLoader(metrics=metrics)
+    
+    def transformed_sheets():
+        for sheet_name, sheet_data in extractor.iter_excel(file_path, streaming=streaming):
+            transformed = transformer.transform_sheet(sheet_name, sheet_data)
+            del sheet_data
+            yield sheet_name, transformed
+            del transformed
+            logger.info(f"  📏 Pico de memoria tras {sheet_name}: {format_mb(peak_rss_mb())}")
+    
+    logger.info(f"💾 Guardando en base de datos: {db_path}")
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    load_metrics = loader.load_stream(transformed_sheets(), db_path, normalized=normalized)
+    
+    if not load_metrics['rows']:
+        logger.error("❌ No se pudieron extraer datos")
+        return False
+    
+    summary = loader.get_cross_sheet_summary(db_path)
+    logger.info(f"📈 Resumen global: {summary.get('total_readings', 0)} lecturas, "
+                f"{summary.get('total_sensors', 0)} sensores")
+    logger.info(f"📏 Pico de memoria del proceso: {format_mb(peak_rss_mb())}")
+    return True
+
+def run_etl_pipeline(workers: int = 1, streaming: bool = False, use_cache: bool = True,
+                     incremental: bool = False, normalized: bool = False, low_memory: bool = False,
+                     metrics_file: str = None, profile: bool = False, trace_memory: bool = False,
+                     compact: bool = False, anomalies: bool = False, online_stats: bool = False):
+    """
+    Ejecuta el pipeline completo de extracción, transformación y carga
+    
+    Args:
+        workers: Número de procesos para extraer y transformar las hojas.
+            Con 1 (por defecto) todo se ejecuta en serie.
+        streaming: Leer el Excel con openpyxl en modo read-only (solo en serie)
+        use_cache: Reutilizar las hojas ya extraídas de la caché en disco
+            (carpeta .extract_cache junto al Excel)
+        incremental: Procesar y recargar solo las hojas cuyo contenido cambió
+            desde la última carga incremental (siempre en serie)
+        normalized: Cargar las lecturas en el esquema normalizado
+            (sheets, sensors, readings + vista sensor_readings)
+        low_memory: Extraer, transformar y cargar hoja por hoja sin tener
+            el libro completo en memoria (siempre en serie)
+        metrics_file: JSON donde guardar las métricas por etapa de esta
+            ejecución. Por defecto metrics/etl_run_<fecha>.json junto a la base.
+        profile: Capturar además un perfil cProfile (.prof junto al JSON)
+        trace_memory: Medir la memoria asignada por etapa con tracemalloc
+            (agrega sobrecarga)
+        compact: Usar tipos compactos en las lecturas transformadas
+            (categóricos, enteros chicos y voltage float32; ver DataTransformer)
+        anomalies: Al terminar la carga, detectar anomalías en todas las
+            lecturas y guardarlas en la tabla anomalies (ver anomalies.py)
+        online_stats: Calcular las estadísticas por sensor con acumuladores
+            en línea por lotes (media/std exactas, cuantiles con t-digest;
+            ver online_stats.py)
+    """
+    from instrumentation import PipelineMetrics
+    
+    metrics = PipelineMetrics(trace_memory=trace_memory, profile=profile)
+    metrics.info.update({'workers': workers, 'streaming': streaming, 'use_cache': use_cache,
+                         'incremental': incremental, 'normalized': normalized, 'low_memory': low_memory,
+                         'compact': compact, 'anomalies': anomalies, 'online_stats': online_stats,
+                         'success': False})
+    metrics.start()
+    
+    file_path = r"C:\Users\LENOVO\Downloads\ETL\data\BD_SENSORES.xlsx"
+    db_path = r"C:\Users\LENOVO\Downloads\ETL\data\sensor_data.db"
+    
     try:
         logger.info("🚀 Iniciando pipeline de procesamiento de sensores")
         
@@ -27,37 +122,109 @@ def run_etl_pipeline():
         # 1. EXTRACCIÓN
         logger.info("=== FASE 1: EXTRACCIÓN ===")
         
-        file_path = r"C:\Users\LENOVO\Downloads\ETL\data\BD_SENSORES.xlsx"
         logger.info(f"📁 Leyendo archivo: {file_path}")
         
         if not os.path.exists(file_path):
             logger.error(f"❌ Archivo no encontrado: {file_path}")
             return False
         
-        extractor = DataExtractor()
-        raw_data = extractor.extract_from_excel(file_path)
-        
-        if not raw_data:
-            logger.error("❌ No se pudieron extraer datos")
-            return False
+        if incremental and low_memory:
+            logger.warning("⚠️ --low-memory no aplica al modo incremental; se ignora")
+            low_memory = False
         
-        # 2. TRANSFORMACIÓN
-        logger.info("=== FASE 2: TRANSFORMACIÓN ===")
-        transformer = DataTransformer()
-        transformed_data = transformer.transform_sensor_data(raw_data)
+        if (incremental or low_memory) and workers > 1:
+            logger.warning("⚠️ Los modos incremental y de baja memoria se ejecutan en serie; se ignora --workers")
         
-        # 3. CARGA
-        logger.info("=== FASE 3: CARGA ===")
-        loader = DataLoader()
-        
-        # Cargar a SQLite
-        db_path = r"C:\Users\LENOVO\Downloads\ETL\data\sensor_data.db"
-        logger.info(f"💾 Guardando en base de datos: {db_path}")
+        if low_memory:
+            if not run_streaming_pipeline(file_path, db_path, streaming, use_cache, normalized, metrics, compact,
+                                          online_stats):
+                return False
+        elif workers > 1 and not incremental:
+            # Extracción y transformación por hoja en un pool de procesos
+            from parallel import extract_and_transform_parallel
+            
+            logger.info(f"⚡ Modo paralelo con {workers} procesos")
+            # Los procesos hijos no comparten las métricas: solo se mide la fase completa
+            with metrics.stage("extract_transform") as record:
+                transformer = extract_and_transform_parallel(file_path, workers, compact, online_stats)
+                record['rows'] = sum(len(data['data']) for data in transformer.transformed_data.values())
+            
+            if not transformer.transformed_data:
+                logger.error("❌ No se pudieron extraer datos")
+                return False
+            
+            logger.info("=== FASE 2: TRANSFORMACIÓN ===")
+            transformed_data = transformer.transformed_data
+        else:
+            cache_dir = os.path.join(os.path.dirname(file_path), '.extract_cache') if use_cache else None
+            extractor = DataExtractor(cache_dir=cache_dir, metrics=metrics)
+            with metrics.stage("extract") as record:
+                raw_data = extractor.extract_from_excel(file_path, streaming=streaming)
+                record['rows'] = sum(len(data['data']) for data in raw_data.values())
+            
+            if not raw_data:
+                logger.error("❌ No se pudieron extraer datos")
+                return False
+            
+            # 2. TRANSFORMACIÓN
+            logger.info("=== FASE 2: TRANSFORMACIÓN ===")
+            transformer = DataTransformer(metrics=metrics, compact=compact, online_stats=online_stats)
+            
+            if incremental:
+                # Comparar la huella de cada hoja con la de la última carga
+                fingerprints = {name: extractor.fingerprint_sheet(data['data']) for name, data in raw_data.items()}
+                stored_fingerprints = DataLoader().get_sheet_fingerprints(db_path)
+                
+                changed_sheets = [name for name in raw_data if stored_fingerprints.get(name) != fingerprints[name]]
+                removed_sheets = [name for name in stored_fingerprints if name not in raw_data]
+                logger.info(f"🔁 Modo incremental: {len(changed_sheets)} hojas modificadas, "
+                            f"{len(raw_data) - len(changed_sheets)} sin cambios, {len(removed_sheets)} eliminadas")
+                
+                with metrics.stage("transform") as record:
+                    transformed_data = {
+                        name: transformer.transform_sheet(name, raw_data[name])
+                        for name in changed_sheets
+                    }
+                    record['rows'] = sum(len(data['data']) for data in transformed_data.values())
+            else:
+                with metrics.stage("transform") as record:
+                    transformed_data = transformer.transform_sensor_data(raw_data)
+                    record['rows'] = sum(len(data['data']) for data in transformed_data.values())
         
-        # Asegurar que el directorio existe
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        # 3. CARGA (en modo baja memoria ya se cargó hoja por hoja)
+        if not low_memory:
+            logger.info("=== FASE 3: CARGA ===")
+            loader = DataLoader(metrics=metrics)
+            
+            # Cargar a SQLite
+            logger.info(f"💾 Guardando en base de datos: {db_path}")
+            
+            # Asegurar que el directorio existe
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            
+            load_stage = metrics.stage("load", rows=sum(len(data['data']) for data in transformed_data.values()))
+            if incremental:
+                changed_fingerprints = {name: fingerprints[name] for name in transformed_data}
+                with load_stage:
+                    loader.load_incremental(transformed_data, db_path, changed_fingerprints, removed_sheets)
+                
+                # Resumen global a partir de los agregados parciales por hoja
+                summary = loader.get_cross_sheet_summary(db_path)
+                logger.info(f"📈 Resumen global: {summary.get('total_readings', 0)} lecturas, "
+                            f"{summary.get('total_sensors', 0)} sensores")
+            else:
+                with load_stage:
+                    loader.bulk_load_to_sqlite(transformed_data, db_path, normalized=normalized)
         
-        loader.load_to_sqlite(transformed_data, db_path)
+        # 4. ANOMALÍAS (sobre toda la base, después de cualquier modo de carga)
+        if anomalies:
+            from anomalies import detect_anomalies
+            
+            logger.info("=== FASE 4: DETECCIÓN DE ANOMALÍAS ===")
+            with metrics.stage("anomalies") as record:
+                result = detect_anomalies(db_path)
+                record['rows'] = result['readings']
+            metrics.info['anomalies_found'] = result['events']
         
         # VERIFICACIÓN FINAL
         logger.info("🔍 Verificando resultados...")
@@ -65,7 +232,7 @@ def run_etl_pipeline():
             conn = sqlite3.connect(db_path)
             cursor = conn.cursor()
             
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
+            cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view');")
             tables = cursor.fetchall()
             table_names = [table[0] for table in tables]
             
@@ -84,6 +251,7 @@ def run_etl_pipeline():
                 return False
             
             conn.close()
+            metrics.info['success'] = True
             logger.info("🎉 Pipeline ETL completado exitosamente")
             return True
         else:
@@ -94,11 +262,66 @@ def run_etl_pipeline():
         logger.error(f"💥 Error en el pipeline: {str(e)}")
         import traceback
         logger.error(traceback.format_exc())
+        metrics.info['error'] = str(e)
         return False
+    
+    finally:
+        write_metrics(metrics, metrics_file or default_metrics_file(db_path, metrics.started_at))
+
+def default_metrics_file(db_path: str, started_at: datetime) -> str:
+    """metrics/etl_run_<fecha>.json en la carpeta de la base de datos"""
+    return os.path.join(os.path.dirname(db_path), 'metrics', f"etl_run_{started_at:%Y%m%d_%H%M%S}.json")
+
+def write_metrics(metrics, path: str):
+    """Guarda las métricas y resume en el log las etapas más lentas"""
+    try:
+        metrics.write(path)
+    except OSError as e:
+        logger.warning(f"⚠️ No se pudieron guardar las métricas en {path}: {e}")
+        return
+    
+    # Solo etapas hoja (sin sub-etapas): así no se cuenta dos veces el mismo tiempo
+    names = [record['name'] for record in metrics.stages]
+    leaves = [record for record in metrics.stages
+              if not any(name.startswith(record['name'] + '/') for name in names)]
+    for record in sorted(leaves, key=lambda record: record['wall_s'], reverse=True)[:5]:
+        throughput = f", {record['rows_per_s']:,.0f} filas/s" if record['rows_per_s'] else ""
+        logger.info(f"  ⏱️ {record['name']}: {record['wall_s']:.3f} s (CPU {record['cpu_s']:.3f} s{throughput})")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pipeline ETL de sensores")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Número de procesos para extraer y transformar hojas en paralelo (por defecto 1)")
+    parser.add_argument('--streaming', action='store_true',
+                        help="Leer el Excel fila por fila con openpyxl en modo read-only")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Ignorar la caché de hojas extraídas y volver a leer el Excel")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Recargar solo las hojas que cambiaron desde la última ejecución incremental")
+    parser.add_argument('--normalized', action='store_true',
+                        help="Guardar las lecturas en el esquema normalizado con la vista sensor_readings")
+    parser.add_argument('--low-memory', action='store_true',
+                        help="Procesar y cargar hoja por hoja para acotar el uso de memoria")
+    parser.add_argument('--metrics-file',
+                        help="JSON de métricas por etapa (por defecto metrics/etl_run_<fecha>.json junto a la base)")
+    parser.add_argument('--profile', action='store_true',
+                        help="Guardar además un perfil cProfile de la ejecución (.prof junto al JSON de métricas)")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="Medir la memoria asignada por etapa con tracemalloc (más lento)")
+    parser.add_argument('--compact', action='store_true',
+                        help="Usar tipos compactos (categóricos, enteros chicos, float32) en las lecturas transformadas")
+    parser.add_argument('--anomalies', action='store_true',
+                        help="Detectar anomalías (z-score móvil, EWMA y CUSUM) y guardarlas en la tabla anomalies")
+    parser.add_argument('--online-stats', action='store_true',
+                        help="Estadísticas por sensor con acumuladores en línea (Welford + t-digest) por lotes")
+    args = parser.parse_args()
+    
     print("🚀 Iniciando Pipeline ETL...")
-    success = run_etl_pipeline()
+    success = run_etl_pipeline(workers=args.workers, streaming=args.streaming, use_cache=not args.no_cache,
+                               incremental=args.incremental, normalized=args.normalized,
+                               low_memory=args.low_memory, metrics_file=args.metrics_file,
+                               profile=args.profile, trace_memory=args.trace_memory, compact=args.compact,
+                               anomalies=args.anomalies, online_stats=args.online_stats)
     if success:
         print("✅ Pipeline ejecutado correctamente. Ahora puedes ejecutar Streamlit.")
     else:
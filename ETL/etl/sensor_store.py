@@ -0,0 +1,221 @@
+# sensor_store.py
+import logging
+import sqlite3
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from load import NORMALIZED_SCHEMA_VERSION, SCHEMA_VERSION, pick_rollup, to_epoch
+
+logger = logging.getLogger(__name__)
+
+# Una fila de (timestamp, voltage) tal como la devuelve SQLite
+SERIES_DTYPE = np.dtype([('timestamp', 'int64'), ('voltage', 'float64')])
+
+class SensorStore:
+    """
+    API de consultas sobre la base del ETL que devuelve arreglos NumPy
+
+    Todas las consultas van por los índices del esquema tipado:
+    (sensor_id, timestamp) en sensor_readings, sheet_name para recorrer una
+    hoja, la clave primaria de readings en el esquema normalizado y la de
+    sensor_rollups para las series agregadas.
+
+    Los resultados se leen en bloques con fetchmany y se vuelcan con
+    np.fromiter directamente a arreglos int64/float64 contiguos, sin pasar
+    por un DataFrame ni por listas de valores por fila. Los timestamps son
+    segundos desde epoch.
+
+    Solo funciona sobre bases con el esquema tipado o normalizado (las bases
+    creadas con DataFrame.to_sql guardan el timestamp como texto).
+    """
+
+    def __init__(self, db_path: str, chunk_size: int = 50000):
+        """
+        Args:
+            db_path: Ruta a la base SQLite creada por DataLoader
+            chunk_size: Filas por llamada a fetchmany
+        """
+        self.db_path = db_path
+        self.chunk_size = chunk_size
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+
+        version = self._conn.execute('PRAGMA user_version').fetchone()[0]
+        if version not in (SCHEMA_VERSION, NORMALIZED_SCHEMA_VERSION):
+            self._conn.close()
+            raise ValueError(f"{db_path} no tiene el esquema tipado (user_version {version}); "
+                             f"vuelva a cargarla con bulk_load_to_sqlite")
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get_series(self, sensor_ids: Iterable[str], start=None, end=None,
+                   resolution: Optional[int] = None) -> Dict[str, Dict[str, np.ndarray]]:
+        """
+        Serie de tiempo de cada sensor dentro de [start, end)
+
+        Args:
+            sensor_ids: Sensores a consultar
+            start: Inicio del rango (incluido), datetime, texto o epoch; None = sin límite
+            end: Fin del rango (excluido); None = sin límite
+            resolution: Si se indica, promedio por bucket de `resolution` segundos
+                (desde sensor_rollups cuando el rango está alineado a un rollup)
+
+        Returns:
+            {sensor_id: {'timestamp': int64[n], 'voltage': float64[n]}} ordenado por
+            timestamp. Con resolution, timestamp es el inicio de cada bucket.
+        """
+        start = to_epoch(start) if start is not None else None
+        end = to_epoch(end) if end is not None else None
+        range_sql, params = self._range_filter('"timestamp"', start, end)
+
+        if resolution is None:
+            sql = ('SELECT "timestamp", voltage FROM sensor_readings '
+                   f'WHERE sensor_id = :sensor_id{range_sql} ORDER BY "timestamp"')
+        else:
+            resolution = int(resolution)
+            bucket_seconds = pick_rollup(start, end, resolution)
+            params.update({'resolution': resolution, 'bucket_seconds': bucket_seconds})
+            if bucket_seconds is not None:
+                range_sql, range_params = self._range_filter('bucket_start', start, end)
+                params.update(range_params)
+                sql = ('SELECT bucket_start / :resolution * :resolution AS bucket, '
+                       'SUM(voltage_sum) / SUM(readings) FROM sensor_rollups '
+                       f'WHERE bucket_seconds = :bucket_seconds AND sensor_id = :sensor_id{range_sql} '
+                       'GROUP BY bucket ORDER BY bucket')
+            else:
+                sql = ('SELECT "timestamp" / :resolution * :resolution AS bucket, AVG(voltage) '
+                       f'FROM sensor_readings WHERE sensor_id = :sensor_id{range_sql} '
+                       'GROUP BY bucket ORDER BY bucket')
+
+        # Una búsqueda por sensor: cada una es un rango contiguo del índice
+        # y evita traer el sensor_id como texto en cada fila
+        result = {}
+        with self._lock:
+            for sensor_id in dict.fromkeys(sensor_ids):
+                params['sensor_id'] = sensor_id
+                result[sensor_id] = self._fetch_series(self._conn.execute(sql, params))
+        return result
+
+    def latest(self, sensor_ids: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+        """
+        Última lectura de cada sensor
+
+        Args:
+            sensor_ids: Sensores a consultar (por defecto todos)
+
+        Returns:
+            {'sensor_id': str[n], 'timestamp': int64[n], 'voltage': float64[n]};
+            los sensores sin lecturas no aparecen
+        """
+        with self._lock:
+            # Una búsqueda en el índice (sensor_id, timestamp) por sensor: mucho
+            # más rápido que GROUP BY sensor_id, que recorre todas las lecturas
+            rows = []
+            for sensor_id in (self.sensors() if sensor_ids is None else dict.fromkeys(sensor_ids)):
+                row = self._conn.execute(
+                    'SELECT sensor_id, "timestamp", voltage FROM sensor_readings '
+                    'WHERE sensor_id = ? ORDER BY "timestamp" DESC LIMIT 1', (sensor_id,)
+                ).fetchone()
+                if row is not None:
+                    rows.append(row)
+
+        return {
+            'sensor_id': np.array([row[0] for row in rows], dtype=str),
+            'timestamp': np.fromiter((row[1] for row in rows), dtype='int64', count=len(rows)),
+            'voltage': np.fromiter((row[2] for row in rows), dtype='float64', count=len(rows)),
+        }
+
+    def scan_sheet(self, sheet_name: str) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        Recorre las lecturas de una hoja en bloques de chunk_size filas
+
+        Yields:
+            {'sensor_number': int64[k], 'timestamp': int64[k], 'voltage': float64[k]}
+        """
+        dtype = np.dtype([('sensor_number', 'int64'), ('timestamp', 'int64'), ('voltage', 'float64')])
+        with self._lock:
+            cursor = self._conn.execute(
+                'SELECT sensor_number, "timestamp", voltage FROM sensor_readings WHERE sheet_name = ?',
+                (sheet_name,)
+            )
+        try:
+            while True:
+                # El lock no se retiene entre bloques: quien consume puede tardar
+                with self._lock:
+                    rows = cursor.fetchmany(self.chunk_size)
+                if not rows:
+                    return
+                block = np.fromiter(rows, dtype=dtype, count=len(rows))
+                del rows
+                yield {name: np.ascontiguousarray(block[name]) for name in dtype.names}
+        finally:
+            cursor.close()
+
+    def sensors(self, sheet_name: Optional[str] = None) -> List[str]:
+        """Sensores con lecturas (todos o los de una hoja), ordenados por sensor_id"""
+        with self._lock:
+            if sheet_name is not None:
+                rows = self._conn.execute('SELECT DISTINCT sensor_id FROM sensor_statistics '
+                                          'WHERE sheet_name = ? ORDER BY sensor_id', (sheet_name,))
+            else:
+                # Skip-scan del índice (sensor_id, timestamp): una búsqueda por
+                # sensor distinto en lugar de recorrer todas las lecturas
+                rows = self._conn.execute(
+                    'WITH RECURSIVE ids(sensor_id) AS ('
+                    '  SELECT MIN(sensor_id) FROM sensor_readings'
+                    '  UNION ALL'
+                    '  SELECT (SELECT MIN(sensor_id) FROM sensor_readings WHERE sensor_id > ids.sensor_id)'
+                    '  FROM ids WHERE ids.sensor_id IS NOT NULL'
+                    ') SELECT sensor_id FROM ids WHERE sensor_id IS NOT NULL'
+                )
+            return [row[0] for row in rows]
+
+    def sensor_sheets(self, sensor_ids: Iterable[str]) -> Dict[str, str]:
+        """Hoja de cada sensor (una búsqueda en el índice por sensor)"""
+        with self._lock:
+            sheets = {}
+            for sensor_id in dict.fromkeys(sensor_ids):
+                row = self._conn.execute('SELECT sheet_name FROM sensor_readings WHERE sensor_id = ? LIMIT 1',
+                                         (sensor_id,)).fetchone()
+                if row is not None:
+                    sheets[sensor_id] = row[0]
+            return sheets
+
+    def _fetch_series(self, cursor: sqlite3.Cursor) -> Dict[str, np.ndarray]:
+        """Vuelca un cursor de (timestamp, voltage) en dos arreglos contiguos"""
+        blocks = []
+        while True:
+            rows = cursor.fetchmany(self.chunk_size)
+            if not rows:
+                break
+            blocks.append(np.fromiter(rows, dtype=SERIES_DTYPE, count=len(rows)))
+
+        if not blocks:
+            series = np.empty(0, dtype=SERIES_DTYPE)
+        else:
+            series = blocks[0] if len(blocks) == 1 else np.concatenate(blocks)
+        return {
+            'timestamp': np.ascontiguousarray(series['timestamp']),
+            'voltage': np.ascontiguousarray(series['voltage']),
+        }
+
+    @staticmethod
+    def _range_filter(column: str, start: Optional[int], end: Optional[int]):
+        """Condición SQL y parámetros para [start, end) sobre column"""
+        sql, params = '', {}
+        if start is not None:
+            sql += f' AND {column} >= :start'
+            params['start'] = start
+        if end is not None:
+            sql += f' AND {column} < :end'
+            params['end'] = end
+        return sql, params
@@ -0,0 +1,100 @@
+# synthetic_data.py
+import argparse
+import csv
+import os
+from typing import List
+
+import numpy as np
+from openpyxl import Workbook
+
+def sheet_rows(sensors: int, readings: int, noise: float, outlier_rate: float,
+               rng: np.random.Generator) -> List[list]:
+    """
+    Filas de una hoja con la forma de BD_SENSORES.xlsx
+
+    - fila 0: 'Usuario', 1, 2, ..., sensors
+    - fila 1: vacía
+    - filas siguientes: primera columna vacía y un voltaje por sensor en
+      texto ("0.42 V"), con una fracción `noise` de celdas problemáticas
+      (vacías, coma decimal, sin unidad o texto no numérico) y una fracción
+      `outlier_rate` de picos fuera del rango normal
+    """
+    base = rng.uniform(0.0, 2.0, sensors)
+    drift = rng.normal(0.0, 0.002, sensors)
+    steps = np.arange(readings)[:, None]
+    values = base + drift * steps + rng.normal(0.0, 0.05, (readings, sensors))
+    values = np.round(np.clip(values, 0.0, None), 2)
+
+    outliers = rng.random(values.shape) < outlier_rate
+    values[outliers] = np.round(rng.uniform(5.0, 50.0, outliers.sum()), 2)
+
+    cells = np.char.add(values.astype(str), ' V').astype(object)
+    noisy = rng.random(values.shape) < noise
+    kinds = rng.integers(0, 4, values.shape)
+    cells[noisy & (kinds == 0)] = None
+    comma = noisy & (kinds == 1)
+    cells[comma] = [f"{value} V".replace('.', ',') for value in values[comma].tolist()]
+    cells[noisy & (kinds == 2)] = values[noisy & (kinds == 2)]
+    cells[noisy & (kinds == 3)] = 'ERR'
+
+    rows = [['Usuario'] + list(range(1, sensors + 1)), [None] * (sensors + 1)]
+    rows.extend([None] + row for row in cells.tolist())
+    return rows
+
+def generate_workbook(path: str, sheets: int = 17, sensors: int = 60, readings: int = 30,
+                      noise: float = 0.02, outlier_rate: float = 0.01, seed: int = 0,
+                      fmt: str = 'xlsx') -> str:
+    """
+    Genera un libro sintético con la forma de BD_SENSORES.xlsx
+
+    Args:
+        path: Archivo .xlsx de salida, o carpeta de salida si fmt='csv'
+            (un CSV por hoja con la misma disposición de celdas)
+        sheets: Número de hojas
+        sensors: Sensores (columnas) por hoja
+        readings: Lecturas (filas) por sensor
+        noise: Fracción de celdas con formato problemático
+        outlier_rate: Fracción de lecturas fuera de rango
+        seed: Semilla para que el libro sea reproducible
+        fmt: 'xlsx' o 'csv'
+
+    Returns:
+        Ruta generada
+    """
+    rng = np.random.default_rng(seed)
+    names = [f"SYN{i + 1}" for i in range(sheets)]
+
+    if fmt == 'csv':
+        os.makedirs(path, exist_ok=True)
+        for name in names:
+            with open(os.path.join(path, f"{name}.csv"), 'w', newline='', encoding='utf-8') as f:
+                csv.writer(f).writerows(sheet_rows(sensors, readings, noise, outlier_rate, rng))
+        return path
+
+    if fmt != 'xlsx':
+        raise ValueError(f"Formato no soportado: {fmt}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    workbook = Workbook(write_only=True)
+    for name in names:
+        worksheet = workbook.create_sheet(name)
+        for row in sheet_rows(sensors, readings, noise, outlier_rate, rng):
+            worksheet.append(row)
+    workbook.save(path)
+    return path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera libros sintéticos con la forma de BD_SENSORES.xlsx")
+    parser.add_argument('output', help="Archivo .xlsx (o carpeta con --format csv)")
+    parser.add_argument('--sheets', type=int, default=17)
+    parser.add_argument('--sensors', type=int, default=60, help="Sensores por hoja")
+    parser.add_argument('--readings', type=int, default=30, help="Lecturas por sensor")
+    parser.add_argument('--noise', type=float, default=0.02, help="Fracción de celdas con formato problemático")
+    parser.add_argument('--outlier-rate', type=float, default=0.01, help="Fracción de lecturas fuera de rango")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--format', choices=('xlsx', 'csv'), default='xlsx')
+    args = parser.parse_args()
+
+    output = generate_workbook(args.output, args.sheets, args.sensors, args.readings,
+                               args.noise, args.outlier_rate, args.seed, args.format)
+    print(f"✅ Libro sintético generado en {output}")
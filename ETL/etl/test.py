@@ -16,7 +16,7 @@ def check_database():
             cursor = conn.cursor()
             
             # Listar todas las tablas
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
+            cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view');")
             tables = cursor.fetchall()
             
             print(f"📊 Tablas en la base de datos: {tables}")
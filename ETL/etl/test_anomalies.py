@@ -0,0 +1,27 @@
+# test_anomalies.py
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from anomalies import AnomalyDetector
+
+logging.disable(logging.CRITICAL)
+
+def step_readings(first_nan: bool) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    voltage = 100 + rng.normal(0, 1, 400)
+    voltage[200:] += 5
+    if first_nan:
+        voltage[:3] = np.nan
+    return pd.DataFrame({'sensor_id': 'A_S1', 'timestamp': np.arange(400) * 300, 'voltage': voltage,
+                         'sheet_name': 'A'})
+
+@pytest.mark.parametrize('first_nan', [False, True])
+@pytest.mark.parametrize('batch_size', [400, 2, 57])
+def test_step_is_detected_when_first_readings_are_nan(first_nan, batch_size):
+    df = step_readings(first_nan)
+    detector = AnomalyDetector()
+    events = pd.concat([detector.update(df.iloc[i:i + batch_size]) for i in range(0, len(df), batch_size)])
+    assert {'ewma', 'cusum'} <= set(events['detector'])
@@ -0,0 +1,37 @@
+# test_ingest.py
+import logging
+import socket
+import sqlite3
+import time
+
+import pytest
+
+from ingest import IngestionService
+from load import NORMALIZED_SCHEMA_VERSION
+
+logging.disable(logging.CRITICAL)
+
+def test_writer_refuses_normalized_database(tmp_path):
+    path = str(tmp_path / 'normalized.db')
+    conn = sqlite3.connect(path)
+    conn.execute(f'PRAGMA user_version = {NORMALIZED_SCHEMA_VERSION}')
+    conn.close()
+
+    with pytest.raises(ValueError, match='normalizado'):
+        IngestionService(path).start_writer()
+
+def test_stop_with_idle_tcp_client_writes_pending_lines(tmp_path):
+    service = IngestionService(str(tmp_path / 'live.db'), batch_interval=0.05)
+    service.start_writer()
+    service.serve_tcp('127.0.0.1', 0)
+    client = socket.create_connection(service.servers[0].server_address)
+    try:
+        # La última línea no termina en \n: se escribe recién al cerrar la conexión
+        client.sendall(b'SENP1_S1,2024-01-01T00:00:00Z,1.2\nSENP1_S1,2024-01-01 00:05:00,1.3')
+        time.sleep(0.2)
+        start = time.monotonic()
+        service.stop()
+        assert time.monotonic() - start < 2
+    finally:
+        client.close()
+    assert service.metrics['written'] == 2
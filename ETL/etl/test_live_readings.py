@@ -0,0 +1,25 @@
+# test_live_readings.py
+import logging
+
+import pandas as pd
+
+from Transform import DataTransformer
+
+logging.disable(logging.CRITICAL)
+
+def clean(timestamps):
+    df = pd.DataFrame({'sensor_id': 'SENP1_S1', 'timestamp': timestamps, 'voltage': '1.2'})
+    return DataTransformer().clean_live_readings(df)
+
+def test_timestamps_with_zone_are_naive_utc():
+    readings, rejected = clean(['2024-01-01T00:00:00Z', '2024-01-01T02:00:00+02:00',
+                                '2023-12-31T21:00:00-03:00'])
+    assert rejected == 0
+    assert readings['timestamp'].dtype == 'datetime64[s]'
+    assert (readings['timestamp'] == pd.Timestamp('2024-01-01')).all()
+
+def test_zone_text_mixed_with_epoch_and_naive_text():
+    readings, rejected = clean(['1704067200', '2024-01-01T01:00:00+01:00', '2024-01-01 00:00:00',
+                                'no es una fecha', None])
+    assert rejected == 2
+    assert (readings['timestamp'] == pd.Timestamp('2024-01-01')).all()
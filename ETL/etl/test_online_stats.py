@@ -0,0 +1,38 @@
+# test_online_stats.py
+import logging
+
+import numpy as np
+import pandas as pd
+
+from online_stats import StatisticsAccumulator, TDigest
+from Transform import DataTransformer
+
+logging.disable(logging.CRITICAL)
+
+def test_merged_chunks_match_pandas_while_exact():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'sensor_id': rng.choice(['A_S1', 'A_S2', 'B_S1'], 600), 'voltage': rng.normal(5, 1, 600)})
+    df.loc[::37, 'voltage'] = np.nan
+    exact = DataTransformer()._grouped_statistics(df['sensor_id'], df['voltage'])
+
+    total = StatisticsAccumulator()
+    for offset in range(0, len(df), 50):
+        partial = StatisticsAccumulator()
+        partial.update_frame(df.iloc[offset:offset + 50])
+        total.merge(partial)
+    pd.testing.assert_frame_equal(total.to_frame(), exact, check_dtype=False, rtol=1e-12)
+
+def test_merged_digests_stay_within_rank_bound():
+    rng = np.random.default_rng(1)
+    values = rng.lognormal(0.5, 0.4, 200_000)
+    digest = TDigest(200)
+    for chunk in np.array_split(values, 40):
+        partial = TDigest(200)
+        partial.update(chunk)
+        digest.merge(partial)
+
+    sorted_values = np.sort(values)
+    for q in (0.01, 0.25, 0.5, 0.75, 0.99):
+        rank = np.searchsorted(sorted_values, digest.quantile(q)) / len(values)
+        assert abs(rank - q) <= 1 / 200
+    assert len(digest.means) <= digest.buffer_size